@@ -0,0 +1,299 @@
+"""
+Measures fitting, model construction, big-M transformation, balances, solving and result extraction of synthetic
+topologies (see benchmarks/synthetic_topology.py) across scaling sweeps.
+
+Each case is run in a fresh process, such that the peak memory of each phase can be compared. Wall time, CPU time,
+peak memory (resident set size at the end of each phase) and model size are taken from the instrumentation of the
+EnergyHub (see src/instrumentation.py) and appended to a history file (one JSON object per run and case). Each run
+is compared to the median of previous runs of the same case on the same machine, with the thresholds in
+benchmarks/thresholds.json. The benchmark exits with 1, if a phase regressed, and needs to be executed from the root
+directory of the repository:
+
+    python -m benchmarks.benchmark_scaling --sweep quick
+    python -m benchmarks.benchmark_scaling --sweep nodes timesteps --repeat 3
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_topology import create_synthetic_data
+
+HISTORY_PATH = './benchmarks/history.jsonl'
+THRESHOLDS_PATH = './benchmarks/thresholds.json'
+
+# Phases of the instrumentation, the times of repeated phases (e.g. big-M transformations) are summed
+PHASES = ['data_fit', 'network_fit', 'construct_model', 'big_m', 'balances', 'solve', 'result_extraction']
+
+DEFAULT_CASE = {'nr_nodes': 2,
+                'nr_carriers': 3,
+                'nr_timesteps': 168,
+                'technologies': {'RES': 1, 'CONV2': 1, 'STOR': 1},
+                'mesh_degree': 1}
+
+SWEEPS = {'quick': [{'nr_timesteps': 24}, {}],
+          'timesteps': [{'nr_timesteps': nr_timesteps} for nr_timesteps in [168, 720, 2190, 8760]],
+          'nodes': [{'nr_nodes': nr_nodes} for nr_nodes in [2, 4, 8, 16]],
+          'carriers': [{'nr_nodes': 4, 'nr_carriers': nr_carriers} for nr_carriers in [2, 3, 6, 12]],
+          'technologies': [{'technologies': {'RES': 1}},
+                           {'technologies': {'RES': 2, 'STOR': 1}},
+                           {'technologies': {'RES': 2, 'CONV2': 2, 'STOR': 1}}],
+          'mesh': [{'nr_nodes': 8, 'mesh_degree': mesh_degree} for mesh_degree in [1, 2, 4]]}
+
+
+def get_case(parameters):
+    """
+    Returns the parameters of a case, missing parameters are taken from DEFAULT_CASE
+
+    :param dict parameters: parameters of the case
+    :return: dict of all parameters
+    """
+    case = dict(DEFAULT_CASE)
+    case.update(parameters)
+    return case
+
+
+def get_case_name(case):
+    """
+    Returns the name of a case, which identifies it in the history
+
+    :param dict case: parameters of the case
+    :return: name of the case
+    """
+    technologies = '_'.join(tec_type + str(case['technologies'][tec_type]) for tec_type in case['technologies'])
+    return 'n' + str(case['nr_nodes']) + '_c' + str(case['nr_carriers']) + '_t' + str(case['nr_timesteps']) + \
+           '_' + technologies + '_m' + str(case['mesh_degree'])
+
+
+def run_case(case, solver, solve):
+    """
+    Builds, solves and reads the results of a synthetic topology and returns the metrics of each phase
+
+    :param dict case: parameters of the case
+    :param str solver: solver
+    :param bool solve: if the model is solved and results are read
+    :return: dict of metrics for each phase and the model size
+    """
+    import src.config_model as m_config
+    from src.energyhub import EnergyHub
+    from src.instrumentation import get_instrumentation
+
+    m_config.solver.solver = solver
+    # Fits and fitting resources are not cached, such that runs are isolated
+    m_config.fitting.cache = 0
+    m_config.fitting.resource_cache_path = ''
+    m_config.instrumentation.enabled = 1
+    m_config.instrumentation.count_components = 1
+
+    data = create_synthetic_data(**case)
+    data.read_technology_data()
+    data.read_network_data()
+    energyhub = EnergyHub(data)
+    energyhub.construct_model()
+    energyhub.construct_balances()
+    if solve:
+        energyhub.solve_model()
+        results = energyhub.write_results()
+
+    metrics = {}
+    for record in get_instrumentation().records:
+        if record['name'] in PHASES:
+            if record['name'] not in metrics:
+                metrics[record['name']] = {'wall_time': 0, 'cpu_time': 0, 'memory': 0}
+            metrics[record['name']]['wall_time'] += record['wall_time']
+            metrics[record['name']]['cpu_time'] += record['cpu_time']
+            metrics[record['name']]['memory'] = max(metrics[record['name']]['memory'], record['memory'] or 0)
+        if record['name'] == 'balances':
+            metrics['size'] = {'variables': record['variables'],
+                               'constraints': record['constraints'],
+                               'binaries': record['binaries']}
+    if solve:
+        metrics['solution'] = {'total_cost': float(results.economics['Total_Cost'].iloc[0])}
+    return metrics
+
+
+def run_case_in_process(case, solver, solve):
+    """
+    Runs a case (see :func:`~run_case`) in a fresh process
+
+    :param dict case: parameters of the case
+    :param str solver: solver
+    :param bool solve: if the model is solved and results are read
+    :return: dict of metrics
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_case, case, solver, solve).result()
+
+
+def get_environment():
+    """
+    Returns the machine, the versions of python and pyomo and the current git commit
+
+    :return: dict describing the environment
+    """
+    import pyomo.version
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'machine': platform.node(),
+            'processor': platform.processor(),
+            'python': platform.python_version(),
+            'pyomo': pyomo.version.version,
+            'commit': commit}
+
+
+def read_history(path):
+    """
+    Reads the history of benchmarks
+
+    :param str path: path of the history file
+    :return: list of entries (one per run and case)
+    """
+    if not os.path.isfile(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def append_history(path, entries):
+    """
+    Appends entries to the history of benchmarks
+
+    :param str path: path of the history file
+    :param list entries: entries to append
+    """
+    with open(path, 'a') as file:
+        for entry in entries:
+            file.write(json.dumps(entry) + '\n')
+
+
+def check_regressions(entry, history, thresholds):
+    """
+    Compares the metrics of a case with the median of previous runs of the same case on the same machine.
+
+    Times and memory regressed, if they exceed the median by more than the relative threshold (and the time by more
+    than 'min_time'). The number of variables, constraints and binaries regressed, if it changed by more than their
+    threshold (i.e. any change with a threshold of 1). Only the last 'window' runs without regressions are used.
+
+    :param dict entry: entry of the case
+    :param list history: previous entries
+    :param dict thresholds: thresholds (see benchmarks/thresholds.json)
+    :return: list of regressions (dicts with phase, metric, value, baseline and ratio)
+    """
+    previous = [previous_entry for previous_entry in history
+                if previous_entry['case_name'] == entry['case_name'] and
+                previous_entry['environment']['machine'] == entry['environment']['machine'] and
+                previous_entry['solve'] == entry['solve'] and
+                not previous_entry['regressions']][-thresholds['window']:]
+    regressions = []
+    if not previous:
+        return regressions
+
+    for phase in entry['metrics']:
+        for metric in entry['metrics'][phase]:
+            if metric not in thresholds:
+                continue
+            values = [previous_entry['metrics'][phase][metric] for previous_entry in previous
+                      if metric in previous_entry['metrics'].get(phase, {})]
+            if not values:
+                continue
+            baseline = float(np.median(values))
+            value = entry['metrics'][phase][metric]
+            if metric in ['wall_time', 'cpu_time']:
+                regressed = value > baseline * thresholds[metric] and value - baseline > thresholds['min_time']
+            elif phase == 'size':
+                regressed = abs(value - baseline) > baseline * (thresholds[metric] - 1)
+            else:
+                regressed = value > baseline * thresholds[metric]
+            if regressed:
+                regressions.append({'phase': phase, 'metric': metric, 'value': value, 'baseline': baseline,
+                                    'ratio': value / baseline if baseline else np.inf})
+    return regressions
+
+
+def run_benchmarks(sweeps, repeat=1, solver='appsi_highs', solve=True, history_path=HISTORY_PATH,
+                   thresholds_path=THRESHOLDS_PATH, record=True):
+    """
+    Runs all cases of the sweeps, compares them with the history and appends them to the history.
+
+    With repeat > 1, each case is run several times and the minimum of each metric is used.
+
+    :param list sweeps: names of sweeps (see SWEEPS)
+    :param int repeat: number of runs of each case
+    :param str solver: solver
+    :param bool solve: if the models are solved and results are read
+    :param str history_path: path of the history file
+    :param str thresholds_path: path of the thresholds
+    :param bool record: if the runs are appended to the history
+    :return: data frame of metrics and list of regressions
+    """
+    with open(thresholds_path) as file:
+        thresholds = json.load(file)
+    history = read_history(history_path)
+    environment = get_environment()
+
+    cases = {}
+    for sweep in sweeps:
+        if sweep not in SWEEPS:
+            raise Exception('The sweep ' + sweep + ' is not defined, available sweeps are ' + str(list(SWEEPS)) + '.')
+        for parameters in SWEEPS[sweep]:
+            case = get_case(parameters)
+            cases[get_case_name(case)] = case
+
+    entries = []
+    regressions = []
+    rows = []
+    for case_name in cases:
+        print('Benchmarking ' + case_name + '...')
+        runs = [run_case_in_process(cases[case_name], solver, solve) for run in range(repeat)]
+        metrics = {phase: {metric: min(run[phase][metric] for run in runs) for metric in runs[0][phase]}
+                   for phase in runs[0]}
+        entry = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'case_name': case_name,
+                 'case': cases[case_name],
+                 'solver': solver,
+                 'solve': solve,
+                 'repeat': repeat,
+                 'environment': environment,
+                 'metrics': metrics}
+        entry['regressions'] = check_regressions(entry, history, thresholds)
+        entries.append(entry)
+        regressions.extend([dict(regression, case_name=case_name) for regression in entry['regressions']])
+        for phase in metrics:
+            rows.append(dict(metrics[phase], case_name=case_name, phase=phase))
+
+    if record:
+        append_history(history_path, entries)
+
+    table = pd.DataFrame(rows).set_index(['case_name', 'phase'])
+    return table, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks synthetic topologies across scaling sweeps')
+    parser.add_argument('--sweep', nargs='+', default=['quick'], help='sweeps to run: ' + ', '.join(SWEEPS))
+    parser.add_argument('--repeat', type=int, default=1, help='number of runs of each case (minimum is used)')
+    parser.add_argument('--solver', default='appsi_highs', help='solver')
+    parser.add_argument('--no-solve', action='store_true', help='only fit and construct the models')
+    parser.add_argument('--history', default=HISTORY_PATH, help='path of the history file')
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH, help='path of the regression thresholds')
+    parser.add_argument('--no-record', action='store_true', help='do not append the runs to the history')
+    args = parser.parse_args()
+
+    table, regressions = run_benchmarks(args.sweep, args.repeat, args.solver, not args.no_solve, args.history,
+                                        args.thresholds, not args.no_record)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(table)
+        if regressions:
+            print('Regressions:')
+            print(pd.DataFrame(regressions).set_index(['case_name', 'phase', 'metric']))
+    if regressions:
+        raise SystemExit(1)
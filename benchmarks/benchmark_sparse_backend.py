@@ -0,0 +1,97 @@
+"""
+Compares model construction (and optionally solving) of the pyomo model and the sparse model.
+
+The benchmark uses the topology of main.py (onshore node with PV and battery, offshore node, electricity network)
+and needs to be executed from the root directory of the repository:
+
+    python -m benchmarks.benchmark_sparse_backend --timesteps 8760 --solve
+"""
+import argparse
+import copy
+import time
+import numpy as np
+import pandas as pd
+
+import src.data_management as dm
+import src.config_model as m_config
+from src.energyhub import EnergyHub
+from src.energyhub_sparse import EnergyHubSparse
+
+
+def create_data(nr_timesteps):
+    """
+    Creates a DataHandle with the topology of main.py for the first nr_timesteps hours of a year
+
+    :param int nr_timesteps: number of time steps
+    :return: instance of a DataHandle
+    """
+    topology = dm.create_empty_topology()
+    topology['timesteps'] = pd.date_range(start='2001-01-01 00:00', freq='1h', periods=nr_timesteps)
+    topology['timestep_length_h'] = 1
+    topology['carriers'] = ['electricity']
+    topology['nodes'] = ['onshore', 'offshore']
+    topology['technologies']['onshore'] = ['PV', 'battery']
+    topology['technologies']['offshore'] = []
+
+    network_data = dm.create_empty_network_data(topology['nodes'])
+    network_data['distance'].at['onshore', 'offshore'] = 100
+    network_data['distance'].at['offshore', 'onshore'] = 100
+    network_data['connection'].at['onshore', 'offshore'] = 1
+    network_data['connection'].at['offshore', 'onshore'] = 1
+    topology['networks']['electricitySimple'] = network_data
+
+    data = dm.DataHandle(topology)
+    data.read_climate_data_from_file('onshore', './data/climate_data_onshore.txt')
+    data.read_climate_data_from_file('offshore', './data/climate_data_offshore.txt')
+    data.read_demand_data('onshore', 'electricity', np.ones(nr_timesteps) * 10)
+    data.read_import_price_data('onshore', 'electricity', np.ones(nr_timesteps) * 100)
+    data.read_import_limit_data('onshore', 'electricity', np.ones(nr_timesteps) * 5)
+    data.read_technology_data()
+    data.read_network_data()
+    return data
+
+
+def run_benchmark(energyhub_class, data, solve):
+    """
+    Constructs (and solves) a model and measures the time of each step
+
+    :param energyhub_class: EnergyHub or EnergyHubSparse
+    :param DataHandle data: instance of a DataHandle
+    :param bool solve: if the model is solved
+    :return: dict with timings (in s) and the total cost (if solved)
+    """
+    timing = {}
+    start = time.perf_counter()
+    energyhub = energyhub_class(copy.deepcopy(data))
+    energyhub.construct_model()
+    timing['construct_model'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    energyhub.construct_balances()
+    timing['construct_balances'] = time.perf_counter() - start
+
+    if solve:
+        start = time.perf_counter()
+        energyhub.solve_model()
+        timing['solve_model'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = energyhub.write_results()
+        timing['write_results'] = time.perf_counter() - start
+        timing['total_cost'] = results.economics['Total_Cost'].iloc[0]
+    return timing
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compares the pyomo and the sparse construction backend')
+    parser.add_argument('--timesteps', type=int, default=8760, help='number of time steps')
+    parser.add_argument('--solve', action='store_true', help='also solve the models and write results')
+    parser.add_argument('--solver', default='appsi_highs', help='solver used for the pyomo model')
+    args = parser.parse_args()
+
+    m_config.solver.solver = args.solver
+    data = create_data(args.timesteps)
+
+    benchmark = pd.DataFrame({'pyomo': run_benchmark(EnergyHub, data, args.solve),
+                              'sparse': run_benchmark(EnergyHubSparse, data, args.solve)})
+    print(benchmark)
@@ -0,0 +1,139 @@
+"""
+Generator of synthetic topologies for benchmarks.
+
+Topologies are scaled by the number of nodes, carriers and time steps, the mix of technologies at each node and the
+degree of the electricity network mesh. Technologies and networks are taken from ./data/technology_data and
+./data/network_data and climate data from ./data/climate_data_onshore.txt and ./data/climate_data_offshore.txt
+(alternating between nodes), i.e. at most 8760 time steps can be modeled and the generator needs to be used from the
+root directory of the repository.
+"""
+import numpy as np
+import pandas as pd
+
+import src.data_management as dm
+
+# Carriers of the technology data, further carriers only have a demand and can be imported
+CARRIERS = ['electricity', 'heat', 'gas']
+
+# Technologies of each type, with their input and output carriers
+TECHNOLOGIES = {'RES': {'PV': ['electricity'], 'WT_4000': ['electricity']},
+                'CONV2': {'HP': ['electricity', 'heat'], 'boiler': ['gas', 'heat']},
+                'STOR': {'battery': ['electricity']}}
+
+CLIMATE_DATA = ['./data/climate_data_onshore.txt', './data/climate_data_offshore.txt']
+
+
+def get_carriers(nr_carriers):
+    """
+    Returns the carriers of a synthetic topology
+
+    :param int nr_carriers: number of carriers
+    :return: list of carriers
+    """
+    return CARRIERS[:nr_carriers] + ['carrier' + str(nr) for nr in range(len(CARRIERS), nr_carriers)]
+
+
+def get_technologies(technologies, carriers):
+    """
+    Returns the technologies installed at each node of a synthetic topology
+
+    :param dict technologies: number of technologies of each type (RES, CONV2, STOR)
+    :param list carriers: carriers of the topology
+    :return: list of technologies
+    """
+    node_technologies = []
+    for tec_type in technologies:
+        available = [tec for tec in TECHNOLOGIES[tec_type]
+                     if all(car in carriers for car in TECHNOLOGIES[tec_type][tec])]
+        if technologies[tec_type] > len(available):
+            raise Exception('Only ' + str(len(available)) + ' technologies of type ' + tec_type +
+                            ' are available with the carriers ' + str(carriers) + '.')
+        node_technologies.extend(available[:technologies[tec_type]])
+    return node_technologies
+
+
+def create_synthetic_topology(nr_nodes=2, nr_carriers=3, nr_timesteps=168, technologies=None, mesh_degree=1):
+    """
+    Creates a synthetic topology.
+
+    All nodes have the same technologies. Each node is connected to the next mesh_degree nodes (in both directions)
+    by an electricity network, i.e. with mesh_degree = 1 the nodes form a ring and with mesh_degree >= nr_nodes / 2
+    all nodes are connected.
+
+    :param int nr_nodes: number of nodes
+    :param int nr_carriers: number of carriers (electricity, heat, gas and further carriers)
+    :param int nr_timesteps: number of hourly time steps (at most 8760)
+    :param dict technologies: number of technologies of each type at each node, e.g. {'RES': 1, 'CONV2': 1, \
+    'STOR': 1} (default)
+    :param int mesh_degree: number of nodes each node is connected to in each direction, no network with 0
+    :return: topology
+    """
+    if technologies is None:
+        technologies = {'RES': 1, 'CONV2': 1, 'STOR': 1}
+
+    topology = dm.create_empty_topology()
+    topology['timesteps'] = pd.date_range(start='2001-01-01 00:00', freq='1h', periods=nr_timesteps)
+    topology['timestep_length_h'] = 1
+    topology['carriers'] = get_carriers(nr_carriers)
+    topology['nodes'] = ['node' + str(nr) for nr in range(nr_nodes)]
+    node_technologies = get_technologies(technologies, topology['carriers'])
+    for node in topology['nodes']:
+        topology['technologies'][node] = list(node_technologies)
+
+    if mesh_degree > 0 and nr_nodes > 1:
+        network_data = dm.create_empty_network_data(topology['nodes'])
+        for node_nr, node in enumerate(topology['nodes']):
+            for step in range(1, mesh_degree + 1):
+                other_node = topology['nodes'][(node_nr + step) % nr_nodes]
+                if not other_node == node:
+                    for from_node, to_node in [(node, other_node), (other_node, node)]:
+                        network_data['distance'].at[from_node, to_node] = 100 * step
+                        network_data['connection'].at[from_node, to_node] = 1
+        topology['networks']['electricitySimple'] = network_data
+    return topology
+
+
+def create_synthetic_data(nr_nodes=2, nr_carriers=3, nr_timesteps=168, technologies=None, mesh_degree=1):
+    """
+    Creates a DataHandle of a synthetic topology (see :func:`~create_synthetic_topology`) with climate data, demands,
+    import prices, limits and emission factors. Technology and network data is not read (to be able to measure
+    fitting separately).
+
+    Each node has a daily electricity demand profile, a heat demand (if a technology supplies heat) and a constant
+    demand of further carriers. Electricity, gas and further carriers can be imported, such that all topologies are
+    feasible.
+
+    :param int nr_nodes: number of nodes
+    :param int nr_carriers: number of carriers
+    :param int nr_timesteps: number of hourly time steps (at most 8760)
+    :param dict technologies: number of technologies of each type at each node
+    :param int mesh_degree: number of nodes each node is connected to in each direction
+    :return: instance of a DataHandle
+    """
+    topology = create_synthetic_topology(nr_nodes, nr_carriers, nr_timesteps, technologies, mesh_degree)
+    data = dm.DataHandle(topology)
+
+    hours = np.arange(nr_timesteps)
+    tec_carriers = [car for tec_type in TECHNOLOGIES for tec in TECHNOLOGIES[tec_type]
+                    if tec in topology['technologies'][topology['nodes'][0]]
+                    for car in TECHNOLOGIES[tec_type][tec]]
+    for node_nr, node in enumerate(topology['nodes']):
+        data.read_climate_data_from_file(node, CLIMATE_DATA[node_nr % len(CLIMATE_DATA)])
+        for car in topology['carriers']:
+            if car == 'electricity':
+                demand = 10 + 5 * np.sin(2 * np.pi * (hours + node_nr) / 24)
+                data.read_demand_data(node, car, demand)
+                data.read_import_price_data(node, car, np.ones(nr_timesteps) * 100)
+                data.read_import_limit_data(node, car, np.ones(nr_timesteps) * 20)
+                data.read_import_emissionfactor_data(node, car, np.ones(nr_timesteps) * 0.4)
+            elif car == 'heat' and car in tec_carriers:
+                data.read_demand_data(node, car, np.ones(nr_timesteps) * 5)
+            elif car == 'gas':
+                data.read_import_price_data(node, car, np.ones(nr_timesteps) * 40)
+                data.read_import_limit_data(node, car, np.ones(nr_timesteps) * 20)
+                data.read_import_emissionfactor_data(node, car, np.ones(nr_timesteps) * 0.2)
+            elif car not in CARRIERS:
+                data.read_demand_data(node, car, np.ones(nr_timesteps))
+                data.read_import_price_data(node, car, np.ones(nr_timesteps) * 50)
+                data.read_import_limit_data(node, car, np.ones(nr_timesteps) * 2)
+    return data
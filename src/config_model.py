@@ -1,7 +1,61 @@
+import os
 from types import SimpleNamespace
 
+# Directory of caches (fits, fitting resources and climate data), outside of the repository
+cache_dir = os.path.join(os.path.expanduser('~'), '.cache', 'energyhub')
+
 presolve = SimpleNamespace()
 presolve.big_m_transformation_required = 0
 
 solver = SimpleNamespace()
 solver.solver = 'gurobi'
+solver.persistent = 0 # 1 keeps the solver in memory between solves (persistent interface of the solver)
+
+storage = SimpleNamespace()
+storage.inter_period_linking = 1
+
+rolling_horizon = SimpleNamespace()
+rolling_horizon.horizon = 168
+rolling_horizon.lookahead = 24
+
+pareto = SimpleNamespace()
+pareto.nr_points = 10
+pareto.emissions = 'emissions_net'
+pareto.nr_processes = 0 # 0 uses all available cores
+
+construction = SimpleNamespace()
+construction.low_memory = 0 # 1 releases input time series once copied into the model (no rolling horizon)
+construction.units = 1 # 0 builds components without units (faster), validate units with src.unit_validation
+
+results = SimpleNamespace()
+results.lazy = 0 # 1 builds time series of results on first access
+
+instrumentation = SimpleNamespace()
+instrumentation.enabled = 1
+instrumentation.count_components = 0 # 1 counts variables and constraints of constructed blocks (slow)
+instrumentation.max_records = 10000 # number of records kept
+instrumentation.trace_memory = 0 # 1 traces memory allocated in each phase (slow)
+instrumentation.profile_rules = 0 # 1 profiles the rules of pyomo components during construction
+instrumentation.profile_rules_top = 20 # number of rules printed
+instrumentation.memory_report = 0 # 1 prints memory and size of each block after construction
+
+fitting = SimpleNamespace()
+fitting.cache = 1
+fitting.cache_path = os.path.join(cache_dir, 'fit_cache')
+fitting.cache_max_size = 500 # MB
+fitting.resource_cache_path = os.path.join(cache_dir, 'resources.p')
+fitting.nr_processes = 1 # 0 uses all available cores
+
+climate_api = SimpleNamespace()
+climate_api.jrc_endpoint = 'https://re.jrc.ec.europa.eu/api/tmy?'
+climate_api.resolution = 0.01 # rounding of coordinates in degree
+climate_api.retries = 3
+climate_api.timeout = 60 # s
+climate_api.max_connections = 8
+climate_api.era5_endpoint = '' # empty: CDS api (cdsapi), or directory with netCDF files
+climate_api.era5_max_extent = 2 # degree, nearby nodes are imported with one request
+climate_api.offline = 0
+climate_api.cache = 1
+climate_api.cache_path = os.path.join(cache_dir, 'api_cache')
+climate_api.cache_ttl = 365 # days
+climate_api.cache_max_size = 500 # MB
@@ -1,4 +1,9 @@
 from .create_templates import *
 from .data_handling import *
 from .import_data import *
-from .result_handling import *
\ No newline at end of file
+from .result_handling import *
+from .time_series_aggregation import *
+from .fit_cache import *
+from .climate_store import *
+from .response_cache import *
+from .climate_grid import *
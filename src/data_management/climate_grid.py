@@ -0,0 +1,100 @@
+import json
+import os
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class ClimateGridIndex:
+    """
+    Spatial index of climate cells (e.g. grid points of ERA5 or climate stores on disk).
+
+    Node coordinates are mapped to the nearest cell with a KD-tree in one vectorized query, i.e. thousands of nodes \
+    can be assigned at once. Distances are measured in degree (longitude and latitude), as for the grids of the \
+    climate data sources.
+    """
+    def __init__(self, lons, lats, paths=None):
+        """
+        Constructor
+
+        :param lons: longitudes of the cells
+        :param lats: latitudes of the cells
+        :param list paths: (optional) paths of the climate stores of the cells
+        """
+        self.lons = np.asarray(lons, dtype=float)
+        self.lats = np.asarray(lats, dtype=float)
+        self.paths = paths
+        self._tree = cKDTree(np.column_stack([self.lons, self.lats])) if len(self.lons) > 0 else None
+
+    def __len__(self):
+        return len(self.lons)
+
+    def query(self, lons, lats, max_distance=np.inf):
+        """
+        Returns the nearest cell of each location
+
+        :param lons: longitudes of the locations
+        :param lats: latitudes of the locations
+        :param float max_distance: (optional) maximal distance to the cell in degree
+        :return: array of cell numbers, -1 for locations without a cell within max_distance
+        """
+        points = np.column_stack([np.asarray(lons, dtype=float).ravel(), np.asarray(lats, dtype=float).ravel()])
+        if self._tree is None:
+            return np.full(len(points), -1)
+        distances, cells = self._tree.query(points, distance_upper_bound=max_distance)
+        cells[np.isinf(distances)] = -1
+        return cells
+
+
+def index_climate_stores(path):
+    """
+    Returns the spatial index of all climate stores in a directory (see \
+    :func:`~src.data_management.climate_store.save_climate_data`), located by their longitude and latitude
+
+    :param str path: directory containing climate stores
+    :return: instance of :class:`~ClimateGridIndex` with the paths of the climate stores
+    """
+    lons = []
+    lats = []
+    paths = []
+    if os.path.isdir(path):
+        for store in sorted(os.listdir(path)):
+            meta_file = os.path.join(path, store, 'meta.json')
+            if os.path.isfile(meta_file):
+                with open(meta_file) as handle:
+                    meta = json.load(handle)
+                lons.append(meta['longitude'])
+                lats.append(meta['latitude'])
+                paths.append(os.path.join(path, store))
+    return ClimateGridIndex(lons, lats, paths)
+
+
+def snap_to_grid(lons, lats, resolution):
+    """
+    Snaps coordinates to the nearest points of a regular grid (vectorized version of \
+    :func:`~src.data_management.import_data.roundPartial`)
+
+    :param lons: longitudes
+    :param lats: latitudes
+    :param float resolution: resolution of the grid in degree
+    :return: arrays of the longitudes and latitudes of the grid points
+    """
+    lons = np.round(np.round(np.asarray(lons, dtype=float) / resolution) * resolution, 6)
+    lats = np.round(np.round(np.asarray(lats, dtype=float) / resolution) * resolution, 6)
+    return lons, lats
+
+
+def group_locations(lons, lats, resolution, alts=None):
+    """
+    Groups locations by the cell of a regular grid they fall into (and their altitude, if supplied)
+
+    :param lons: longitudes
+    :param lats: latitudes
+    :param float resolution: resolution of the grid in degree
+    :param alts: (optional) altitudes
+    :return: array of cells (longitude, latitude and altitude, if supplied, per row) and array of the cell number \
+    of each location
+    """
+    lons, lats = snap_to_grid(lons, lats, resolution)
+    columns = [lons, lats] if alts is None else [lons, lats, np.asarray(alts, dtype=float)]
+    cells, cell_of_location = np.unique(np.column_stack(columns), axis=0, return_inverse=True)
+    return cells, cell_of_location.ravel()
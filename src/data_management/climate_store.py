@@ -0,0 +1,172 @@
+import collections
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from .fit_cache import _to_json
+
+# Climate data loaded from stores, shared between nodes (see load_climate_data). One entry is kept per store, the
+# least recently used stores are released first.
+_loaded_climate_data = collections.OrderedDict()
+MAX_LOADED_STORES = 64
+
+
+def save_climate_data(climate_data, path):
+    """
+    Saves climate data to a climate store.
+
+    A climate store is a directory containing one ``.npy`` file per climate variable (e.g. ``ghi.npy``, \
+    ``ws10.npy``), the time index in ``index.npy`` and the location and the variable names in ``meta.json``. \
+    Variables are read by column and memory-mapped, and no code is executed when loading (as opposed to pickle).
+
+    :param dict climate_data: climate data as imported with \
+    :func:`~src.data_management.import_data.import_jrc_climate_data`
+    :param str path: directory of the climate store
+    :return: None
+    """
+    dataframe = climate_data['dataframe']
+    os.makedirs(path, exist_ok=True)
+
+    # The meta data is removed first and written last, such that incomplete stores are not read
+    meta_file = os.path.join(path, 'meta.json')
+    if os.path.isfile(meta_file):
+        os.remove(meta_file)
+    _loaded_climate_data.pop(os.path.realpath(path), None)
+
+    meta = {key: climate_data[key] for key in climate_data if not key == 'dataframe'}
+    meta['columns'] = [str(column) for column in dataframe.columns]
+    if isinstance(dataframe.index, pd.DatetimeIndex):
+        meta['index'] = {'type': 'datetime',
+                         'tz': None if dataframe.index.tz is None else str(dataframe.index.tz),
+                         'freq': dataframe.index.freqstr}
+        _save_array(os.path.join(path, 'index.npy'), dataframe.index.asi8)
+    else:
+        meta['index'] = {'type': 'array'}
+        _save_array(os.path.join(path, 'index.npy'), dataframe.index.to_numpy())
+
+    for column in dataframe.columns:
+        _save_array(os.path.join(path, str(column) + '.npy'), dataframe[column].to_numpy())
+
+    with open(meta_file + '.tmp', 'w') as handle:
+        json.dump(meta, handle, default=_to_json)
+    os.replace(meta_file + '.tmp', meta_file)
+
+    # A store replaces a link at the same path (see link_climate_data)
+    if os.path.isfile(os.path.join(path, 'link.json')):
+        os.remove(os.path.join(path, 'link.json'))
+
+
+def _save_array(file, array):
+    """
+    Saves an array to a ``.npy`` file. The array is written to a temporary file, which then replaces the file, such \
+    that climate data loaded before (memory-mapping the previous file) remains valid.
+
+    :param str file: path of the file
+    :param array: numpy array
+    """
+    with open(file + '.tmp', 'wb') as handle:
+        np.save(handle, array, allow_pickle=False)
+    os.replace(file + '.tmp', file)
+
+
+def link_climate_data(store_path, path):
+    """
+    Links a directory to a climate store, such that the climate data of the store is loaded from the directory \
+    (see :func:`~load_climate_data`). Used to save climate data shared by several nodes only once.
+
+    :param str store_path: directory of the climate store
+    :param str path: directory of the link
+    :return: None
+    """
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'link.json'), 'w') as handle:
+        json.dump({'store': os.path.relpath(store_path, path)}, handle)
+
+    # A link replaces a store at the same path
+    if os.path.isfile(os.path.join(path, 'meta.json')):
+        os.remove(os.path.join(path, 'meta.json'))
+    _loaded_climate_data.pop(os.path.realpath(path), None)
+
+
+def load_climate_data(path, columns=None):
+    """
+    Loads climate data from a climate store (see :func:`~save_climate_data`).
+
+    Only the requested variables are read. The columns of the dataframe are backed by the memory-mapped files of \
+    the store (they are not copied into one block), i.e. values are only read from disk when accessed and the \
+    dataframe is read-only. Climate data of the same store and variables is loaded once and shared, i.e. nodes at \
+    the same location share one dict of climate data. It should therefore not be modified in place. The climate data \
+    of at most ``MAX_LOADED_STORES`` stores is kept (one set of variables per store).
+
+    :param str path: directory of the climate store (or of a link to it, see :func:`~link_climate_data`)
+    :param list columns: (optional) climate variables to load, all variables if not supplied
+    :return: dict containing the location (longitude, latitude, altitude) and a dataframe with the climate variables
+    """
+    link_file = os.path.join(path, 'link.json')
+    if os.path.isfile(link_file):
+        with open(link_file) as handle:
+            path = os.path.normpath(os.path.join(path, json.load(handle)['store']))
+    meta_file = os.path.join(path, 'meta.json')
+    if not os.path.isfile(meta_file):
+        raise Exception('The directory ' + path + ' is not a climate store.')
+    version = os.path.getmtime(meta_file)
+    key = os.path.realpath(path)
+    requested_columns = None if columns is None else list(columns)
+    if key in _loaded_climate_data and _loaded_climate_data[key][0:2] == (version, requested_columns):
+        _loaded_climate_data.move_to_end(key)
+        return _loaded_climate_data[key][2]
+
+    with open(meta_file) as handle:
+        meta = json.load(handle)
+    if columns is None:
+        columns = meta['columns']
+    for column in columns:
+        if column not in meta['columns']:
+            raise Exception('The climate store ' + path + ' does not contain the variable ' + column + '.')
+
+    index = np.load(os.path.join(path, 'index.npy'), mmap_mode='r', allow_pickle=False)
+    if meta['index']['type'] == 'datetime':
+        values = np.asarray(index)
+        index = None
+        if meta['index']['freq'] is not None and len(values) > 0:
+            # Regular time indices are generated (much faster than setting the frequency of the stored values)
+            start = pd.Timestamp(int(values[0]), tz='UTC')
+            start = start.tz_localize(None) if meta['index']['tz'] is None else start.tz_convert(meta['index']['tz'])
+            index = pd.date_range(start=start, periods=len(values), freq=meta['index']['freq'])
+            if not np.array_equal(index.asi8, values):
+                index = None
+        if index is None:
+            index = pd.DatetimeIndex(values.view('datetime64[ns]'))
+            if meta['index']['tz'] is not None:
+                index = index.tz_localize('UTC').tz_convert(meta['index']['tz'])
+    else:
+        index = pd.Index(np.asarray(index))
+
+    climate_data = {key: meta[key] for key in meta if key not in ['columns', 'index']}
+    # With copy=False, each column keeps its memory-mapped array
+    climate_data['dataframe'] = pd.DataFrame(
+        {column: np.load(os.path.join(path, column + '.npy'), mmap_mode='r', allow_pickle=False)
+         for column in columns}, index=index, copy=False)
+
+    _loaded_climate_data[key] = (version, requested_columns, climate_data)
+    _loaded_climate_data.move_to_end(key)
+    while len(_loaded_climate_data) > MAX_LOADED_STORES:
+        _loaded_climate_data.popitem(last=False)
+    return climate_data
+
+
+def convert_climate_data_file(file, path):
+    """
+    Converts climate data saved as pickle (with earlier versions of \
+    :func:`~src.data_management.data_handling.DataHandle.read_climate_data_from_api`) to a climate store. Only \
+    convert files from trusted sources, as loading pickle files can execute arbitrary code.
+
+    :param str file: path of the pickled climate data
+    :param str path: directory of the climate store
+    :return: None
+    """
+    with open(file, 'rb') as handle:
+        climate_data = pickle.load(handle)
+    save_climate_data(climate_data, path)
+
@@ -1,9 +1,18 @@
+import copy
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import src.model_construction as mc
 import src.data_management as dm
+import src.config_model as m_config
+from src.instrumentation import phase
 import pickle
+import numpy as np
 import pandas as pd
 
+# Fitted performance parameters of technologies that are time series
+TIME_SERIES_FITS = ['capacity_factor', 'ambient_loss_factor']
+
 
 class DataHandle:
     """
@@ -28,6 +37,7 @@ class DataHandle:
         self.node_data = {}
         self.technology_data = {}
         self.network_data = {}
+        self.released_nodes = []
 
         # init. demand, prices, emission factors = 0 for all timesteps, carriers and nodes
 
@@ -65,33 +75,107 @@ class DataHandle:
         :param str dataset: dataset to import from, can be JRC (only onshore) or ERA5 (global)
         :param int year: optional, needs to be in range of data available. If nothing is specified, a typical year \
         will be loaded
-        :param str save_path: Can save climate data for later use to the specified path
+        :param str save_path: Can save climate data for later use to the specified path (directory of a climate \
+        store, see :func:`~src.data_management.climate_store.save_climate_data`)
         :return: self at ``self.node_data[nodename]['climate_data']``
         """
         if dataset == 'JRC':
             data = dm.import_jrc_climate_data(lon, lat, year, alt)
         elif dataset == 'ERA5':
-            data = dm.import_era5_climate_data(lon, lat, year)
+            data = dm.import_era5_climate_data(lon, lat, year, alt)
 
         if not save_path==0:
-            with open(save_path, 'wb') as handle:
-                pickle.dump(data, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            dm.save_climate_data(data, save_path)
 
         self.node_data[nodename]['climate_data'] = data
 
-    def read_climate_data_from_file(self, nodename, file):
+    def read_climate_data_for_nodes(self, locations, dataset='JRC', year='typical_year', save_path=0):
+        """
+        Reads in climate data for a full year for several nodes at once from \
+        `JRC PVGIS <https://re.jrc.ec.europa.eu/pvg_tools/en/>`_ or \
+        `ERA5 <https://cds.climate.copernicus.eu/cdsapp#!/home>`_
+
+        Nodes are grouped by the grid cell of the dataset they fall into (``m_config.climate_api.resolution`` for \
+        JRC, 0.25 degree for ERA5) and their altitude. Nodes in the same group share one dict of climate data (by \
+        reference, located at the grid cell), i.e. climate data is imported, held in memory and fitted to only \
+        once per group. It should therefore not be modified in place.
+
+        For JRC, cells are imported concurrently with up to ``m_config.climate_api.max_connections`` requests at \
+        once (see :func:`~src.data_management.import_data.get_jrc_response` for caching and retries). For ERA5, \
+        nearby locations are imported with one request (see \
+        :func:`~src.data_management.import_data.import_era5_climate_data_for_nodes`).
+
+        :param dict locations: location of each node, given as tuple (lon, lat) or (lon, lat, alt) with node names \
+        as keys (the default altitude is 10)
+        :param str dataset: dataset to import from, can be JRC (only onshore) or ERA5 (global)
+        :param int year: optional, needs to be in range of data available. If nothing is specified, a typical year \
+        will be loaded
+        :param str save_path: Can save climate data for later use. The climate data of each group is saved once as \
+        climate store in the directory save_path/cells (see \
+        :func:`~src.data_management.climate_store.save_climate_data`), the directory save_path/nodename links to it \
+        (see :func:`~src.data_management.climate_store.link_climate_data`) and can be read with \
+        :func:`~read_climate_data_from_file`
+        :return: self at ``self.node_data[nodename]['climate_data']``
+        """
+        nodenames = list(locations)
+        if dataset == 'JRC':
+            resolution = m_config.climate_api.resolution
+        elif dataset == 'ERA5':
+            resolution = dm.ERA5_RESOLUTION
+        else:
+            raise Exception('The dataset ' + str(dataset) + ' is not available, use JRC or ERA5.')
+        cells, cell_of_node = dm.group_locations([locations[nodename][0] for nodename in nodenames],
+                                                 [locations[nodename][1] for nodename in nodenames],
+                                                 resolution,
+                                                 [locations[nodename][2] if len(locations[nodename]) > 2 else 10
+                                                  for nodename in nodenames])
+        cell_locations = {cell_nr: tuple(float(coordinate) for coordinate in cells[cell_nr])
+                          for cell_nr in range(len(cells))}
+
+        if dataset == 'JRC':
+            with ThreadPoolExecutor(max_workers=m_config.climate_api.max_connections) as executor:
+                futures = {cell_nr: executor.submit(dm.import_jrc_climate_data, *cell_locations[cell_nr][0:2], year,
+                                                    cell_locations[cell_nr][2])
+                           for cell_nr in cell_locations}
+                climate_data = {cell_nr: futures[cell_nr].result() for cell_nr in futures}
+        elif dataset == 'ERA5':
+            climate_data = dm.import_era5_climate_data_for_nodes(cell_locations, year)
+
+        if not save_path == 0:
+            cell_paths = {cell_nr: os.path.join(save_path, 'cells', 'lon' + format(cell_locations[cell_nr][0], '.4f') +
+                                                '_lat' + format(cell_locations[cell_nr][1], '.4f') +
+                                                '_alt' + format(cell_locations[cell_nr][2], 'g'))
+                          for cell_nr in cell_locations}
+            for cell_nr in cell_locations:
+                dm.save_climate_data(climate_data[cell_nr], cell_paths[cell_nr])
+            for node_nr, nodename in enumerate(nodenames):
+                dm.link_climate_data(cell_paths[cell_of_node[node_nr]], os.path.join(save_path, nodename))
+
+        for node_nr, nodename in enumerate(nodenames):
+            self.node_data[nodename]['climate_data'] = climate_data[cell_of_node[node_nr]]
+
+    def read_climate_data_from_file(self, nodename, file, columns=None):
         """
         Reads climate data from file
 
         Reads previously saved climate data (imported and saved with :func:`~read_climate_data_from_api`) from a file to \
         the respective node. This can save time, if api imports take too long
 
+        Climate data is read from climate stores (see :func:`~src.data_management.climate_store.load_climate_data`). \
+        Nodes reading the same climate store share their climate data. Files saved as pickle by earlier versions are \
+        still read, they can be converted with \
+        :func:`~src.data_management.climate_store.convert_climate_data_file`.
+
         :param str nodename: nodename as specified in the topology
-        :param str file: path of climate data file
+        :param str file: path of climate store or climate data file
+        :param list columns: (optional, climate stores only) climate variables to read, all if not supplied
         :return: self at ``self.node_data[nodename]['climate_data']``
         """
-        with open(file, 'rb') as handle:
-            data = pickle.load(handle)
+        if os.path.isdir(file):
+            data = dm.load_climate_data(file, columns)
+        else:
+            with open(file, 'rb') as handle:
+                data = pickle.load(handle)
 
         self.node_data[nodename]['climate_data'] = data
 
@@ -200,6 +284,56 @@ class DataHandle:
 
         self.node_data[nodename]['import_emissionfactors'][carrier] = import_emissionfactor_data
 
+    def get_timestep_weights(self):
+        """
+        Returns the weight of each time step in the cost and emission balances. For a DataHandle at full \
+        resolution, all weights are one.
+
+        :return: array of weights
+        """
+        return np.ones(len(self.topology['timesteps']))
+
+    def slice_timesteps(self, start, end):
+        """
+        Returns a copy of the DataHandle containing only the time steps from start to end (e.g. to solve a model in \
+        several time windows). Node data, climate data and fitted time series of technologies are sliced, all other \
+        data is shared with this instance.
+
+        :param int start: index of the first time step (starting at 0)
+        :param int end: index after the last time step
+        :return: instance of :class:`~DataHandle`
+        """
+        self._check_time_series()
+        data = copy.copy(self)
+        data.topology = dict(self.topology)
+        data.topology['timesteps'] = self.topology['timesteps'][start:end]
+
+        data.node_data = {}
+        for nodename in self.node_data:
+            data.node_data[nodename] = {}
+            for key in self.node_data[nodename]:
+                if key == 'climate_data':
+                    data.node_data[nodename][key] = dict(self.node_data[nodename][key])
+                    data.node_data[nodename][key]['dataframe'] = \
+                        self.node_data[nodename][key]['dataframe'].iloc[start:end]
+                else:
+                    data.node_data[nodename][key] = self.node_data[nodename][key].iloc[start:end]
+
+        data.technology_data = {}
+        for nodename in self.technology_data:
+            data.technology_data[nodename] = {}
+            for tec in self.technology_data[nodename]:
+                technology_data = dict(self.technology_data[nodename][tec])
+                technology_data['fit'] = dict(technology_data['fit'])
+                for key in TIME_SERIES_FITS:
+                    if key in technology_data['fit']:
+                        if isinstance(technology_data['fit'][key], pd.Series):
+                            technology_data['fit'][key] = technology_data['fit'][key].iloc[start:end]
+                        else:
+                            technology_data['fit'][key] = technology_data['fit'][key][start:end]
+                data.technology_data[nodename][tec] = technology_data
+        return data
+
     def read_technology_data(self):
         """
         Writes technologies to self and fits performance functions
@@ -207,49 +341,99 @@ class DataHandle:
         Reads in technology data from JSON files located at ``./data/technology_data`` for all technologies specified in \
         the topology.
 
+        Technologies that are identical at several nodes (same technology and, for RES and STOR technologies, same \
+        climate data) are fitted only once. Fits are loaded from the fit cache if possible (see \
+        :class:`~src.data_management.fit_cache.FitCache`). With ``m_config.fitting.nr_processes`` > 1 (0 uses all \
+        available cores), the remaining fits are performed in parallel processes. Note that on Windows, scripts using \
+        parallel processes need to be guarded by ``if __name__ == '__main__':``.
+
         :return: self at ``self.technology_data[nodename][tec]``
         """
-        # get all used technologies
-        tecs_used = dict()
-        for nodename in self.topology['technologies']:
-            tecs_used[nodename] = self.topology['technologies'][nodename]
-            self.technology_data[nodename] = dict()
-            # read in data to Data Handle and fit performance functions
-            for tec in tecs_used[nodename]:
-                # Read in JSON files
-                with open('./data/technology_data/' + tec + '.json') as json_file:
-                    technology_data = json.load(json_file)
-                # Fit performance function
-                if (technology_data['TechnologyPerf']['tec_type'] == 'RES') or \
-                        (technology_data['TechnologyPerf']['tec_type'] == 'STOR'):
-                    technology_data = mc.fit_tec_performance(technology_data, tec=tec,
-                                                          climate_data=self.node_data[nodename]['climate_data'])
-                else:
-                    technology_data = mc.fit_tec_performance(technology_data)
-
-                self.technology_data[nodename][tec] = technology_data
+        with phase('data_fit'):
+            self.technology_data.update(self._fit_technologies(self.topology['technologies']))
 
     def read_single_technology_data(self, nodename, technologies):
         """
         Reads technologies to DataHandle after it has been initialized.
 
         This function is only required if technologies are added to the model after the DataHandle has been initialized.
+
+        :param str nodename: node name as specified in the topology
+        :param list technologies: list of technologies to add to the node
         """
+        with phase('data_fit', node=nodename):
+            self.technology_data[nodename].update(self._fit_technologies({nodename: technologies})[nodename])
 
-        for tec in technologies:
-            # Read in JSON files
-            with open('./data/technology_data/' + tec + '.json') as json_file:
-                technology_data = json.load(json_file)
-            # Fit performance function
-            if (technology_data['TechnologyPerf']['tec_type'] == 'RES') or \
-                    (technology_data['TechnologyPerf']['tec_type'] == 'STOR'):
-                technology_data = mc.fit_tec_performance(technology_data, tec=tec,
-                                                         climate_data=self.node_data[nodename]['climate_data'])
-            else:
-                technology_data = mc.fit_tec_performance(technology_data)
+    def _fit_technologies(self, technologies):
+        """
+        Reads in the JSON files of technologies and fits their performance functions.
 
-            self.technology_data[nodename][tec] = technology_data
+        :param dict technologies: list of technologies for each node name
+        :return: dict of technology data with fitted performance parameters for each node name and technology
+        """
+        fit_cache = dm.get_fit_cache()
+        json_data = {}
+        climate_hashes = {}
+        tec_keys = {}
+        fits = {}
+        fits_required = {}
+        for nodename in technologies:
+            tec_keys[nodename] = {}
+            for tec in technologies[nodename]:
+                # Read in JSON files
+                if tec not in json_data:
+                    with open('./data/technology_data/' + tec + '.json') as json_file:
+                        json_data[tec] = json.load(json_file)
+                technology_data = json_data[tec]
 
+                if (technology_data['TechnologyPerf']['tec_type'] == 'RES') or \
+                        (technology_data['TechnologyPerf']['tec_type'] == 'STOR'):
+                    # Nodes sharing climate data (see read_climate_data_for_nodes) are hashed once
+                    climate_data = self.node_data[nodename]['climate_data']
+                    if id(climate_data) not in climate_hashes:
+                        climate_hashes[id(climate_data)] = dm.hash_climate_data(climate_data)
+                    key = (tec, climate_hashes[id(climate_data)])
+                else:
+                    climate_data = None
+                    key = (tec, None)
+                tec_keys[nodename][tec] = key
+                if key in fits or key in fits_required:
+                    continue
+
+                # Load fit from cache
+                if fit_cache is not None:
+                    fit = fit_cache.load(fit_cache.get_key(technology_data, tec, climate_hash=key[1]))
+                    if fit is not None:
+                        fits[key] = {'fit': fit,
+                                     'TechnologyPerf': technology_data['TechnologyPerf'],
+                                     'Economics': technology_data['Economics']}
+                        continue
+                fits_required[key] = (technology_data, tec, climate_data)
+
+        # Fit performance functions
+        nr_processes = m_config.fitting.nr_processes
+        if nr_processes == 0:
+            nr_processes = os.cpu_count()
+        nr_processes = min(nr_processes, len(fits_required))
+        if nr_processes > 1:
+            with ProcessPoolExecutor(max_workers=nr_processes) as executor:
+                futures = {key: executor.submit(mc.fit_tec_performance, *fits_required[key])
+                           for key in fits_required}
+                for key in futures:
+                    fits[key] = futures[key].result()
+        else:
+            for key in fits_required:
+                fits[key] = mc.fit_tec_performance(*fits_required[key])
+
+        if fit_cache is not None:
+            for key in fits_required:
+                if 'fit' in fits[key]:
+                    technology_data, tec, climate_data = fits_required[key]
+                    fit_cache.save(fit_cache.get_key(technology_data, tec, climate_hash=key[1]), fits[key]['fit'])
+
+        # Each node gets its own copy of the technology data
+        return {nodename: {tec: copy.deepcopy(fits[tec_keys[nodename][tec]]) for tec in tec_keys[nodename]}
+                for nodename in tec_keys}
 
     def read_network_data(self):
         """
@@ -260,13 +444,14 @@ class DataHandle:
 
         :return: self at ``self.technology_data[nodename][tec]``
         """
-        for netw in self.topology['networks']:
-            with open('./data/network_data/' + netw + '.json') as json_file:
-                network_data = json.load(json_file)
-            network_data['distance'] = self.topology['networks'][netw]['distance']
-            network_data['connection'] = self.topology['networks'][netw]['connection']
-            network_data = mc.fit_netw_performance(network_data)
-            self.network_data[netw] = network_data
+        with phase('network_fit'):
+            for netw in self.topology['networks']:
+                with open('./data/network_data/' + netw + '.json') as json_file:
+                    network_data = json.load(json_file)
+                network_data['distance'] = self.topology['networks'][netw]['distance']
+                network_data['connection'] = self.topology['networks'][netw]['connection']
+                network_data = mc.fit_netw_performance(network_data)
+                self.network_data[netw] = network_data
 
     def pprint(self):
         """
@@ -274,6 +459,7 @@ class DataHandle:
 
         :return: None
         """
+        self._check_time_series()
         for nodename in self.topology['nodes']:
             print('----- NODE '+ nodename +' -----')
             for inst in self.node_data[nodename]:
@@ -286,6 +472,37 @@ class DataHandle:
                                        f"{str(round(self.node_data[nodename][inst][carrier].min(), 2)):>10}"
                                        f"{str(round(self.node_data[nodename][inst][carrier].max(), 2)):>10}")
 
+    def release_time_series(self, nodename):
+        """
+        Releases the time series of a node, once they are copied into the model (with \
+        ``m_config.construction.low_memory = 1``).
+
+        Demands, prices, limits and emission factors of the node and fitted time series of its technologies \
+        (capacity factors, ambient loss factors) are removed. Climate data is kept, as it is shared between nodes \
+        and needed to add technologies. Afterwards, the time steps cannot be sliced anymore (e.g. for a rolling \
+        horizon).
+
+        :param str nodename: node name as specified in the topology
+        """
+        for key in list(self.node_data[nodename]):
+            if not key == 'climate_data':
+                del self.node_data[nodename][key]
+        for tec in self.technology_data.get(nodename, {}):
+            fit = self.technology_data[nodename][tec]['fit']
+            for key in TIME_SERIES_FITS:
+                fit.pop(key, None)
+        if nodename not in self.released_nodes:
+            self.released_nodes.append(nodename)
+
+    def _check_time_series(self):
+        """
+        Raises an exception, if time series have been released (see :func:`~release_time_series`)
+        """
+        if getattr(self, 'released_nodes', []):
+            raise Exception('The time series of the nodes ' + str(self.released_nodes) + ' have been released after '
+                            'constructing the model (m_config.construction.low_memory = 1). Construct the model '
+                            'without low_memory to use them.')
+
     def save(self, path):
         """
         Saves instance of DataHandle to path.
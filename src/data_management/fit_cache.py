@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+import pvlib
+import src.config_model as m_config
+import src.model_construction.technology_performance_fitting as technology_performance_fitting
+import src.model_construction.fitting_resources as fitting_resources
+
+# Files the fits depend on: source code of the fitting and the wind turbine data
+FIT_SOURCES = [technology_performance_fitting.__file__, fitting_resources.__file__, fitting_resources.WT_DATA_PATH]
+
+# Fit caches by path (see get_fit_cache)
+_fit_caches = {}
+
+
+class FitCache:
+    """
+    Content-addressed on-disk cache of fitted technology performance parameters.
+
+    The fit of a technology is identified by a key hashed from the technology data (as read from its JSON file), the \
+    climate data it is fitted to (RES and STOR technologies only), the files in ``FIT_SOURCES`` (source code of \
+    :mod:`~src.model_construction.technology_performance_fitting` and \
+    :mod:`~src.model_construction.fitting_resources` and the wind turbine data) and the version of pvlib (including \
+    the SAM module database), i.e. fits are invalidated when any of them changes.
+
+    Each fit is stored in two files: time series (numpy arrays and pandas series, e.g. capacity factors) in a \
+    ``<key>.npz`` file and all other parameters in a ``<key>.json`` file. If the size of the cache exceeds the \
+    maximum size, the least recently used fits are removed. Hits, misses and evictions are counted in \
+    ``self.hits``, ``self.misses`` and ``self.evictions``.
+    """
+    def __init__(self, path, max_size=500):
+        """
+        Constructor
+
+        :param str path: directory of the cache
+        :param float max_size: maximum size of the cache in MB
+        """
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._code_version = _get_code_version()
+
+    def get_key(self, technology, tec, climate_data=None, climate_hash=None):
+        """
+        Returns the key of a fit
+
+        :param dict technology: technology data as read from the JSON file
+        :param str tec: name of the technology
+        :param dict climate_data: (optional) climate data the technology is fitted to
+        :param str climate_hash: (optional) hash of the climate data, as returned by :func:`~hash_climate_data` \
+        (instead of the climate data)
+        :return: key as hex string
+        """
+        key = hashlib.sha256()
+        key.update(self._code_version.encode())
+        key.update(json.dumps([tec, technology], sort_keys=True, default=str).encode())
+        if climate_hash is None and climate_data is not None:
+            climate_hash = hash_climate_data(climate_data)
+        if climate_hash is not None:
+            key.update(climate_hash.encode())
+        return key.hexdigest()
+
+    def load(self, key):
+        """
+        Loads a fit from the cache
+
+        :param str key: key of the fit
+        :return: dict of fitted parameters or None, if the fit is not cached
+        """
+        json_file = os.path.join(self.path, key + '.json')
+        npz_file = os.path.join(self.path, key + '.npz')
+        try:
+            with open(json_file) as handle:
+                cached = json.load(handle)
+            fit = cached['fit']
+            with np.load(npz_file, allow_pickle=False) as arrays:
+                for name, info in cached['arrays'].items():
+                    if info['type'] == 'series':
+                        index = pd.to_datetime(arrays[name + '/index'], utc=True)
+                        if info['tz'] is not None:
+                            index = index.tz_convert(info['tz'])
+                        fit[name] = pd.Series(arrays[name], index=index, name=info['name'])
+                    else:
+                        fit[name] = arrays[name]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+        # Mark as recently used
+        os.utime(json_file)
+        self.hits += 1
+        return fit
+
+    def save(self, key, fit):
+        """
+        Saves a fit to the cache and evicts the least recently used fits, if the cache is too large. Fits that cannot \
+        be stored (e.g. series with an index that is not a time index) are not cached.
+
+        :param str key: key of the fit
+        :param dict fit: dict of fitted parameters
+        """
+        cached = {'fit': {}, 'arrays': {}}
+        arrays = {}
+        for name, par in fit.items():
+            if isinstance(par, pd.Series):
+                if not isinstance(par.index, pd.DatetimeIndex):
+                    return
+                arrays[name] = par.to_numpy(dtype=float)
+                arrays[name + '/index'] = par.index.asi8
+                cached['arrays'][name] = {'type': 'series',
+                                          'tz': None if par.index.tz is None else str(par.index.tz),
+                                          'name': par.name}
+            elif isinstance(par, np.ndarray):
+                arrays[name] = par
+                cached['arrays'][name] = {'type': 'array'}
+            else:
+                cached['fit'][name] = par
+
+        try:
+            cached = json.dumps(cached, default=_to_json)
+        except TypeError:
+            return
+
+        # Write to temporary files first, such that other processes never read incomplete files
+        os.makedirs(self.path, exist_ok=True)
+        json_file = os.path.join(self.path, key + '.json')
+        npz_file = os.path.join(self.path, key + '.npz')
+        with open(npz_file + '.tmp', 'wb') as handle:
+            np.savez_compressed(handle, **arrays)
+        with open(json_file + '.tmp', 'w') as handle:
+            handle.write(cached)
+        os.replace(npz_file + '.tmp', npz_file)
+        os.replace(json_file + '.tmp', json_file)
+
+        self._evict()
+
+    def clear(self):
+        """
+        Removes all fits from the cache
+        """
+        for key in self._get_keys():
+            self._remove(key)
+
+    def get_size(self):
+        """
+        Returns the size of the cache
+
+        :return: size in MB
+        """
+        return sum(self._get_entry_size(key) for key in self._get_keys()) / 1e6
+
+    def get_statistics(self):
+        """
+        Returns hits, misses, evictions, number of cached fits and size of the cache
+
+        :return: dict of statistics
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._get_keys()),
+                'size': self.get_size()}
+
+    def _evict(self):
+        """
+        Removes the least recently used fits until the cache is smaller than its maximum size
+        """
+        entries = []
+        for key in self._get_keys():
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.path, key + '.json')), key,
+                                self._get_entry_size(key)))
+            except OSError:
+                pass
+        size = sum(entry[2] for entry in entries)
+        for last_used, key, entry_size in sorted(entries):
+            if size <= self.max_size * 1e6:
+                break
+            self._remove(key)
+            size = size - entry_size
+            self.evictions += 1
+
+    def _get_keys(self):
+        """
+        Returns the keys of all cached fits
+
+        :return: list of keys
+        """
+        if not os.path.isdir(self.path):
+            return []
+        return [file[:-5] for file in os.listdir(self.path) if file.endswith('.json')]
+
+    def _get_entry_size(self, key):
+        """
+        Returns the size of a cached fit in bytes
+
+        :param str key: key of the fit
+        :return: size in bytes
+        """
+        size = 0
+        for extension in ['.json', '.npz']:
+            try:
+                size += os.path.getsize(os.path.join(self.path, key + extension))
+            except OSError:
+                pass
+        return size
+
+    def _remove(self, key):
+        """
+        Removes a fit from the cache
+
+        :param str key: key of the fit
+        """
+        for extension in ['.json', '.npz']:
+            try:
+                os.remove(os.path.join(self.path, key + extension))
+            except OSError:
+                pass
+
+
+def get_fit_cache():
+    """
+    Returns the fit cache as configured in ``m_config.fitting``
+
+    :return: instance of :class:`~FitCache` or None, if caching is disabled
+    """
+    if not m_config.fitting.cache:
+        return None
+    path = m_config.fitting.cache_path
+    if path not in _fit_caches:
+        _fit_caches[path] = FitCache(path, m_config.fitting.cache_max_size)
+    _fit_caches[path].max_size = m_config.fitting.cache_max_size
+    return _fit_caches[path]
+
+
+def hash_climate_data(climate_data):
+    """
+    Returns a hash of climate data (data frame and all other entries, e.g. the location)
+
+    :param dict climate_data: climate data as imported with :func:`~src.data_management.import_data.import_jrc_climate_data`
+    :return: hash as hex string
+    """
+    climate_hash = hashlib.sha256()
+    climate_hash.update(json.dumps({key: climate_data[key] for key in climate_data if not key == 'dataframe'},
+                                   sort_keys=True, default=str).encode())
+    dataframe = climate_data['dataframe']
+    climate_hash.update(json.dumps([str(column) for column in dataframe.columns]).encode())
+    climate_hash.update(pd.util.hash_pandas_object(dataframe, index=True).to_numpy().tobytes())
+    return climate_hash.hexdigest()
+
+
+def _get_code_version():
+    """
+    Returns a hash of the files in FIT_SOURCES and the version of pvlib
+
+    :return: hash as hex string
+    """
+    code_version = hashlib.sha256(pvlib.__version__.encode())
+    for file in FIT_SOURCES:
+        code_version.update(_hash_file(file).encode())
+    return code_version.hexdigest()
+
+
+def _hash_file(file):
+    """
+    Returns a hash of the content of a file
+
+    :param str file: path of the file
+    :return: hash as hex string (empty, if the file does not exist)
+    """
+    try:
+        with open(file, 'rb') as handle:
+            return hashlib.sha256(handle.read()).hexdigest()
+    except OSError:
+        return ''
+
+
+def _to_json(par):
+    """
+    Converts numpy types to types that can be written to JSON
+
+    :param par: parameter
+    :return: converted parameter
+    """
+    if isinstance(par, np.generic):
+        return par.item()
+    if isinstance(par, np.ndarray):
+        return par.tolist()
+    raise TypeError('Parameter of type ' + type(par).__name__ + ' cannot be written to JSON.')
@@ -1,9 +1,41 @@
 import requests
 import cdsapi
-from timezonefinder import TimezoneFinder
+import pvlib
+import xarray as xr
+from src.model_construction.fitting_resources import get_resource_registry
 import pandas as pd
 import pickle
 import numpy as np
+import json
+import os
+import threading
+import time
+import src.config_model as m_config
+import src.data_management as dm
+
+# Variables of the JRC PVGIS api and their names in the climate data
+JRC_VARIABLES = {'G(h)': 'ghi',
+                 'Gb(n)': 'dni',
+                 'Gd(h)': 'dhi',
+                 'T2m': 'temp_air',
+                 'RH': 'rh',
+                 'WS10m': 'ws10'}
+
+# ERA5 grid resolution in degree and variables (names in requests and in netCDF files)
+ERA5_RESOLUTION = 0.25
+ERA5_VARIABLES = {'surface_solar_radiation_downwards': 'ssrd',
+                  'total_sky_direct_solar_radiation_at_surface': 'fdir',
+                  '2m_temperature': 't2m',
+                  '2m_dewpoint_temperature': 'd2m',
+                  '10m_u_component_of_wind': 'u10',
+                  '10m_v_component_of_wind': 'v10',
+                  '100m_u_component_of_wind': 'u100',
+                  '100m_v_component_of_wind': 'v100'}
+
+# HTTP session (see _get_session) and locks of requests in progress (see get_jrc_response)
+_session = None
+_request_locks = {}
+_request_locks_lock = threading.Lock()
 
 def roundPartial (value, resolution):
     """
@@ -34,8 +66,7 @@ def import_jrc_climate_data(lon, lat, year, alt):
     specified hight. Wind speed is returned as a dict for different heights.
     """
     # get time zone
-    tf = TimezoneFinder()
-    tz = tf.timezone_at(lng=lon, lat=lat)
+    tz = get_resource_registry().get_timezone(lon, lat)
 
     # Specify year import, lon, lat
     if year == 'typical_year':
@@ -57,12 +88,8 @@ def import_jrc_climate_data(lon, lat, year, alt):
     # Get data from JRC dataset
     answer = dict()
     print('Importing Climate Data...')
-    response = requests.get('https://re.jrc.ec.europa.eu/api/tmy?', params=parameters)
-    if response.status_code == 200:
-        print('Importing Climate Data successful')
-    else:
-        print(response)
-    data = response.json()
+    data = get_jrc_response(parameters)
+    print('Importing Climate Data successful')
     climate_data = data['outputs']['tmy_hourly']
 
 
@@ -70,97 +97,335 @@ def import_jrc_climate_data(lon, lat, year, alt):
     answer['longitude'] = lon
     answer['latitude'] = lat
     answer['altitude'] = alt
+    answer['dataframe'] = pd.DataFrame.from_records(climate_data, columns=list(JRC_VARIABLES))\
+        .rename(columns=JRC_VARIABLES).astype(float)
+    answer['dataframe'].index = time_index
+
+    return answer
+
+def get_jrc_response(parameters):
+    """
+    Returns the response of the JRC PVGIS api, using the response cache if possible.
+
+    The coordinates are rounded to ``m_config.climate_api.resolution``, such that nodes in the same grid cell share \
+    one cached response (see :class:`~src.data_management.response_cache.ResponseCache`). The altitude is not part \
+    of the request. With ``m_config.climate_api.offline = 1``, responses are only read from the cache. Requests \
+    failing with connection errors, timeouts or server errors (5xx) are repeated ``m_config.climate_api.retries`` \
+    times, other errors (e.g. locations outside of the coverage of PVGIS) are raised immediately with the response.
+
+    The endpoint ``m_config.climate_api.jrc_endpoint`` can also be a local server or a directory with responses \
+    saved as ``<key>.json`` (e.g. for tests), with keys as ``jrc_lon5.1600_lat52.0000_typical_year``.
+
+    :param dict parameters: parameters of the request (lon, lat and optionally year)
+    :return: response as dict
+    """
+    config = m_config.climate_api
+    parameters = dict(parameters)
+    parameters['lon'] = round(roundPartial(parameters['lon'], config.resolution), 6)
+    parameters['lat'] = round(roundPartial(parameters['lat'], config.resolution), 6)
+    key = 'jrc_lon' + format(parameters['lon'], '.4f') + '_lat' + format(parameters['lat'], '.4f') + '_' + \
+          str(parameters.get('year', 'typical_year'))
+
+    # Concurrent requests of the same data wait for the first one (and then read it from the cache)
+    with _request_locks_lock:
+        if key not in _request_locks:
+            _request_locks[key] = threading.Lock()
+    with _request_locks[key]:
+        response_cache = dm.get_response_cache()
+        if response_cache is not None:
+            data = response_cache.load(key)
+            if data is not None:
+                return data
+        if config.offline:
+            raise Exception('The climate data ' + key + ' is not cached and the climate api is in offline mode.')
+
+        if os.path.isdir(config.jrc_endpoint):
+            with open(os.path.join(config.jrc_endpoint, key + '.json')) as handle:
+                data = json.load(handle)
+        else:
+            for attempt in range(config.retries + 1):
+                try:
+                    response = _get_session().get(config.jrc_endpoint, params=parameters, timeout=config.timeout)
+                except requests.RequestException as exception:
+                    error = str(exception)
+                else:
+                    if response.status_code == 200:
+                        break
+                    error = 'status ' + str(response.status_code) + ', ' + response.text
+                    if response.status_code < 500:
+                        # Client errors are permanent (e.g. PVGIS returns 400 for locations at sea)
+                        raise Exception('Importing Climate Data failed (' + error + ')')
+                if attempt < config.retries:
+                    time.sleep(2 ** attempt)
+            else:
+                raise Exception('Importing Climate Data failed after ' + str(config.retries + 1) + ' attempts (' +
+                                error + ')')
+            data = response.json()
+
+        if response_cache is not None:
+            response_cache.save(key, data)
+        return data
+
+
+def _get_session():
+    """
+    Returns the HTTP session of the process, which keeps up to ``m_config.climate_api.max_connections`` connections \
+    open for reuse
+
+    :return: requests session
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=m_config.climate_api.max_connections,
+                                                pool_maxsize=m_config.climate_api.max_connections)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
+
+
+def import_era5_climate_data(lon, lat, year, alt=10):
+    """
+    Reads in climate data for a full year from `ERA5 <https://cds.climate.copernicus.eu/cdsapp#!/home>`_ (see \
+    :func:`~import_era5_climate_data_for_nodes`).
+
+    :param float lon: longitude of node - the api will read data for the nearest grid point
+    :param float lat: latitude of node - the api will read data for the nearest grid point
+    :param int year: year to import
+    :param float alt: altitude of location specified
+    :return: dict containing information on the location and a dataframe containing climate data (as returned by \
+    :func:`~import_jrc_climate_data`)
+    """
+    return import_era5_climate_data_for_nodes({'node': (lon, lat, alt)}, year)['node']
 
-    ghi=[]
-    dni=[]
-    dhi=[]
-    rh=[]
-    temp_air=[]
-    wind_speed=dict()
-    wind_speed['10'] = []
-
-    for t_interval in climate_data:
-        ghi.append(t_interval['G(h)'])
-        dni.append(t_interval['Gb(n)'])
-        dhi.append(t_interval['Gd(h)'])
-        rh.append(t_interval['RH'])
-        temp_air.append(t_interval['T2m'])
-        wind_speed['10'].append(t_interval['WS10m'])
-
-    answer['dataframe'] = pd.DataFrame(
-        np.array([
-            ghi,
-            dni,
-            dhi,
-            temp_air,
-            rh
-        ]).T,
-        columns=['ghi', 'dni', 'dhi', 'temp_air', 'rh'],
-        index=time_index)
-    for ws in wind_speed:
-        answer['dataframe']['ws'+str(ws)] = wind_speed[ws]
 
+def import_era5_climate_data_for_nodes(locations, year):
+    """
+    Reads in climate data for a full year for several nodes from \
+    `ERA5 <https://cds.climate.copernicus.eu/cdsapp#!/home>`_. For access to the ERA5 api, an api key is required. \
+    Refer to `<https://cds.climate.copernicus.eu/api-how-to>`_
+
+    Each node is assigned to the nearest grid point of ERA5 (0.25 degree), nodes at the same grid point (and in the \
+    same time zone) share one dataframe. Nearby grid points are imported with one \
+    request for their bounding box (spanning at most ``m_config.climate_api.era5_max_extent`` degrees). The data is \
+    requested and parsed month by month, i.e. only one month of the bounding box is held in memory at a time. \
+    Parsed grid points are saved as climate stores in ``m_config.climate_api.cache_path`` (if caching is enabled) \
+    and are not requested again.
+
+    The endpoint ``m_config.climate_api.era5_endpoint`` can also be a directory with netCDF files saved as \
+    ``era5_<year>_<month>.nc`` (e.g. for tests), covering the bounding boxes of all requests.
+
+    The climate data is converted to the format of :func:`~import_jrc_climate_data`: irradiances are averaged \
+    over the previous hour, the direct normal irradiance is derived from the direct horizontal irradiance with the \
+    solar position, the relative humidity from the dewpoint temperature and wind speeds at 10 m (ws10) and 100 m \
+    (ws100) from their u/v components. The wind shear exponent of each node is estimated from the mean wind speeds \
+    at both heights (``climate_data['wind_shear_exponent']``).
+
+    :param dict locations: location of each node, given as tuple (lon, lat) or (lon, lat, alt) with node names \
+    as keys (the default altitude is 10)
+    :param int year: year to import
+    :return: dict of climate data (as returned by :func:`~import_jrc_climate_data`) with node names as keys
+    """
+    config = m_config.climate_api
+    if year == 'typical_year':
+        raise Exception('ERA5 data is only available for single years, please specify a year.')
+    year = int(year)
+
+    # Assign nodes to grid points
+    nodenames = list(locations)
+    lons, lats = dm.snap_to_grid([locations[nodename][0] for nodename in nodenames],
+                                 [locations[nodename][1] for nodename in nodenames], ERA5_RESOLUTION)
+    grid_points = {nodename: (lons[node_nr], lats[node_nr]) for node_nr, nodename in enumerate(nodenames)}
+    points = sorted(set(grid_points.values()))
+
+    # Read parsed grid points and import missing grid points in batches
+    grid_data = {}
+    missing_points = []
+    if config.cache:
+        stores = dm.index_climate_stores(os.path.join(config.cache_path, 'era5', str(year)))
+        cells = stores.query([point[0] for point in points], [point[1] for point in points],
+                             max_distance=ERA5_RESOLUTION / 10)
+    else:
+        cells = [-1] * len(points)
+    for point, cell in zip(points, cells):
+        if cell >= 0:
+            grid_data[point] = dm.load_climate_data(stores.paths[cell])
+        else:
+            missing_points.append(point)
+    if missing_points and config.offline:
+        raise Exception('The ERA5 climate data of ' + str(len(missing_points)) + ' grid points is not cached and '
+                        'the climate api is in offline mode.')
+    for batch in _get_era5_batches(missing_points, config.era5_max_extent):
+        grid_data.update(_import_era5_batch(batch, year))
+
+    # Compile return dicts, nodes at the same grid point and in the same time zone share one dataframe
+    answer = {}
+    dataframes = {}
+    for nodename in locations:
+        lon, lat = locations[nodename][0], locations[nodename][1]
+        point_data = grid_data[grid_points[nodename]]
+        tz = get_resource_registry().get_timezone(lon, lat)
+        if (grid_points[nodename], tz) not in dataframes:
+            dataframe = point_data['dataframe'].copy()
+            dataframe.index = dataframe.index.tz_convert(tz)
+            dataframes[grid_points[nodename], tz] = dataframe
+        answer[nodename] = {'longitude': lon,
+                            'latitude': lat,
+                            'altitude': locations[nodename][2] if len(locations[nodename]) > 2 else 10,
+                            'wind_shear_exponent': point_data['wind_shear_exponent'],
+                            'dataframe': dataframes[grid_points[nodename], tz]}
     return answer
 
-def import_era5_climate_data(lon, lat, year):
-    # TODO: Code this properly
-    lat = roundPartial(lat, 0.25)
-    lon = roundPartial(lon, 0.25)
 
-    area = [lat + 0.1, lon - 0.1, lat - 0.1, lon + 0.1]
+def _get_era5_batches(points, max_extent):
+    """
+    Groups grid points into batches, of which the bounding box spans at most max_extent degrees in longitude and \
+    latitude
 
-    cds_client = cdsapi.Client()
+    :param list points: grid points as tuples (lon, lat)
+    :param float max_extent: maximal extent of the bounding box in degree
+    :return: list of batches (lists of grid points)
+    """
+    batches = []
+    bounds = []
+    for point in sorted(points):
+        for batch, bound in zip(batches, bounds):
+            new_bound = [min(bound[0], point[0]), max(bound[1], point[0]),
+                         min(bound[2], point[1]), max(bound[3], point[1])]
+            if new_bound[1] - new_bound[0] <= max_extent and new_bound[3] - new_bound[2] <= max_extent:
+                batch.append(point)
+                bound[:] = new_bound
+                break
+        else:
+            batches.append([point])
+            bounds.append([point[0], point[0], point[1], point[1]])
+    return batches
+
+
+def _import_era5_batch(points, year):
+    """
+    Imports the climate data of a batch of grid points month by month
 
-    print('Retrieving ERA5 data, this might take a wile!')
+    :param list points: grid points as tuples (lon, lat)
+    :param int year: year to import
+    :return: dict of climate data (location, wind shear exponent and dataframe in UTC) with grid points as keys
+    """
+    area = [max(point[1] for point in points), min(point[0] for point in points),
+            min(point[1] for point in points), max(point[0] for point in points)]
+
+    print('Importing ERA5 Climate Data for ' + str(len(points)) + ' grid points...')
+    monthly_data = []
+    for month in range(1, 13):
+        file, downloaded = _retrieve_era5_month(area, year, month)
+        monthly_data.append(_parse_era5_file(file, points))
+        if downloaded:
+            os.remove(file)
+    print('Importing ERA5 Climate Data successful')
+
+    grid_data = {}
+    for point_nr, point in enumerate(points):
+        dataframe = pd.concat([month_data[point_nr] for month_data in monthly_data])
+        dataframe = dataframe[dataframe.index.year == year]
+        grid_data[point] = {'longitude': point[0],
+                            'latitude': point[1],
+                            'wind_shear_exponent': float(np.log(dataframe['ws100'].mean() / dataframe['ws10'].mean())
+                                                         / np.log(100 / 10)),
+                            'dataframe': dataframe}
+        if m_config.climate_api.cache:
+            dm.save_climate_data(grid_data[point], _get_era5_store_path(point, year))
+    return grid_data
+
+
+def _retrieve_era5_month(area, year, month):
+    """
+    Retrieves one month of ERA5 data for a bounding box as netCDF file
+
+    :param list area: bounding box as [north, west, south, east]
+    :param int year: year to import
+    :param int month: month to import
+    :return: path of the netCDF file and whether it has been downloaded (and can be removed after parsing)
+    """
+    endpoint = m_config.climate_api.era5_endpoint
+    if os.path.isdir(endpoint):
+        return os.path.join(endpoint, 'era5_' + str(year) + '_' + format(month, '02d') + '.nc'), False
+
+    download_path = os.path.join(m_config.climate_api.cache_path, 'era5', 'download')
+    os.makedirs(download_path, exist_ok=True)
+    file = os.path.join(download_path, 'era5_' + str(year) + '_' + format(month, '02d') + '_' +
+                        '_'.join(format(bound, '.2f') for bound in area) + '.nc')
+
+    # Grid points on the boundary are included by extending the bounding box slightly
+    cds_client = cdsapi.Client()
     cds_client.retrieve(
         'reanalysis-era5-single-levels',
         {
             'product_type': 'reanalysis',
-            'format': 'grib',
-            'variable': [
-                "100u",  # 100m_u-component_of_wind
-                "100v",  # 100m_v-component_of_wind
-                "fsr",  # forecast_surface_roughness
-                "sp",  # surface_pressure
-                "fdir",  # total_sky_direct_solar_radiation_at_surface
-                "ssrd",  # surface_solar_radiation_downwards
-                "2t",  # 2m_temperature
-                "2d", # 2m_dewpoint_temperature
-                "10u",  # 10m_u-component_of_wind
-                "10v",  # 10m_v-component_of_wind
-            ],
-            'year': year,
-            'month': [
-                '01', '02', '03',
-                '04', '05', '06',
-                '07', '08', '09',
-                '10', '11', '12',
-            ],
-            'day': [
-                '01', '02', '03',
-                '04', '05', '06',
-                '07', '08', '09',
-                '10', '11', '12',
-                '13', '14', '15',
-                '16', '17', '18',
-                '19', '20', '21',
-                '22', '23', '24',
-                '25', '26', '27',
-                '28', '29', '30',
-                '31',
-            ],
-            'time': [
-                '00:00', '01:00', '02:00',
-                '03:00', '04:00', '05:00',
-                '06:00', '07:00', '08:00',
-                '09:00', '10:00', '11:00',
-                '12:00', '13:00', '14:00',
-                '15:00', '16:00', '17:00',
-                '18:00', '19:00', '20:00',
-                '21:00', '22:00', '23:00',
-            ],
-            'area': area,
+            'format': 'netcdf',
+            'variable': list(ERA5_VARIABLES),
+            'year': str(year),
+            'month': format(month, '02d'),
+            'day': [format(day, '02d') for day in range(1, 32)],
+            'time': [format(hour, '02d') + ':00' for hour in range(0, 24)],
+            'area': [area[0] + 0.1, area[1] - 0.1, area[2] - 0.1, area[3] + 0.1],
         },
-        'download.grib')
+        file + '.tmp')
+    os.replace(file + '.tmp', file)
+    return file, True
+
+
+def _parse_era5_file(file, points):
+    """
+    Parses a netCDF file of ERA5 data to the climate data format, reading one variable at a time
+
+    :param str file: path of the netCDF file
+    :param list points: grid points as tuples (lon, lat)
+    :return: list of dataframes (one per grid point, in UTC)
+    """
+    with xr.open_dataset(file) as dataset:
+        if 'valid_time' in dataset.dims:
+            dataset = dataset.rename({'valid_time': 'time'})
+        selection = {'longitude': xr.DataArray([point[0] for point in points], dims='point'),
+                     'latitude': xr.DataArray([point[1] for point in points], dims='point')}
+        time_index = pd.DatetimeIndex(dataset['time'].values).tz_localize('UTC')
+
+        values = {}
+        for variable in ERA5_VARIABLES.values():
+            data_array = dataset[variable].sel(selection, method='nearest')
+            if 'expver' in data_array.dims:
+                data_array = data_array.max('expver')
+            values[variable] = data_array.transpose('time', 'point').values.astype(float)
+
+    # Irradiances are accumulated over the previous hour (J/m2), the solar position is taken at its middle
+    ghi = np.maximum(values['ssrd'] / 3600, 0)
+    bhi = np.minimum(np.maximum(values['fdir'] / 3600, 0), ghi)
+    temp_air = values['t2m'] - 273.15
+    temp_dew = values['d2m'] - 273.15
+    rh = np.minimum(100 * np.exp(17.625 * temp_dew / (243.04 + temp_dew) - 17.625 * temp_air / (243.04 + temp_air)),
+                    100)
+
+    dataframes = []
+    for point_nr, point in enumerate(points):
+        zenith = pvlib.solarposition.get_solarposition(time_index - pd.Timedelta(minutes=30),
+                                                       point[1], point[0])['zenith'].to_numpy()
+        dni = pvlib.irradiance.dni(ghi[:, point_nr], ghi[:, point_nr] - bhi[:, point_nr], zenith)
+        dataframes.append(pd.DataFrame({'ghi': ghi[:, point_nr],
+                                        'dni': np.nan_to_num(dni),
+                                        'dhi': ghi[:, point_nr] - bhi[:, point_nr],
+                                        'temp_air': temp_air[:, point_nr],
+                                        'rh': rh[:, point_nr],
+                                        'ws10': np.hypot(values['u10'][:, point_nr], values['v10'][:, point_nr]),
+                                        'ws100': np.hypot(values['u100'][:, point_nr], values['v100'][:, point_nr])},
+                                       index=time_index))
+    return dataframes
 
-    print(cds_client.retrieve)
+
+def _get_era5_store_path(point, year):
+    """
+    Returns the path of the climate store of a parsed ERA5 grid point
+
+    :param tuple point: grid point (lon, lat)
+    :param int year: year
+    :return: path
+    """
+    return os.path.join(m_config.climate_api.cache_path, 'era5', str(year),
+                        'lon' + format(point[0], '.2f') + '_lat' + format(point[1], '.2f'))
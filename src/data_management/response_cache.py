@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+import time
+import src.config_model as m_config
+
+# Response caches by path (see get_response_cache)
+_response_caches = {}
+
+
+class ResponseCache:
+    """
+    On-disk cache of JSON responses of web APIs (e.g. climate data from JRC PVGIS).
+
+    Each response is stored in a ``<key>.json`` file. Responses older than the time to live are not used. If the \
+    size of the cache exceeds the maximum size, the least recently used responses are removed. Hits and misses are \
+    counted in ``self.hits`` and ``self.misses``.
+    """
+    def __init__(self, path, ttl=365, max_size=500):
+        """
+        Constructor
+
+        :param str path: directory of the cache
+        :param float ttl: time to live of responses in days
+        :param float max_size: maximum size of the cache in MB
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, key):
+        """
+        Loads a response from the cache
+
+        :param str key: key of the response
+        :return: response or None, if the response is not cached or expired
+        """
+        file = os.path.join(self.path, key + '.json')
+        try:
+            with open(file) as handle:
+                cached = json.load(handle)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if time.time() - cached['time'] > self.ttl * 24 * 3600:
+            self.misses += 1
+            return None
+
+        # Mark as recently used (the response may have been evicted by another thread in the meantime)
+        try:
+            os.utime(file)
+        except OSError:
+            pass
+        self.hits += 1
+        return cached['response']
+
+    def save(self, key, response):
+        """
+        Saves a response to the cache and evicts the least recently used responses, if the cache is too large
+
+        :param str key: key of the response
+        :param response: response (JSON serializable)
+        """
+        os.makedirs(self.path, exist_ok=True)
+        file = os.path.join(self.path, key + '.json')
+        tmp_file = file + '.' + str(threading.get_ident()) + '.tmp'
+        with open(tmp_file, 'w') as handle:
+            json.dump({'time': time.time(), 'response': response}, handle)
+        os.replace(tmp_file, file)
+
+        # Evict least recently used responses. Several threads can evict at the same time, responses removed by
+        # another thread are skipped.
+        entries = []
+        for cached_file in os.listdir(self.path):
+            if cached_file.endswith('.json'):
+                cached_file = os.path.join(self.path, cached_file)
+                try:
+                    entries.append((os.path.getmtime(cached_file), os.path.getsize(cached_file), cached_file))
+                except OSError:
+                    pass
+        size = sum(entry[1] for entry in entries)
+        for last_used, entry_size, cached_file in sorted(entries):
+            if size <= self.max_size * 1e6:
+                break
+            try:
+                os.remove(cached_file)
+            except OSError:
+                pass
+            size = size - entry_size
+
+    def clear(self):
+        """
+        Removes all responses from the cache
+        """
+        if os.path.isdir(self.path):
+            for cached_file in os.listdir(self.path):
+                if cached_file.endswith('.json'):
+                    os.remove(os.path.join(self.path, cached_file))
+
+
+def get_response_cache():
+    """
+    Returns the response cache as configured in ``m_config.climate_api``
+
+    :return: instance of :class:`~ResponseCache` or None, if caching is disabled
+    """
+    if not m_config.climate_api.cache:
+        return None
+    path = m_config.climate_api.cache_path
+    if path not in _response_caches:
+        _response_caches[path] = ResponseCache(path)
+    _response_caches[path].ttl = m_config.climate_api.cache_ttl
+    _response_caches[path].max_size = m_config.climate_api.cache_max_size
+    return _response_caches[path]
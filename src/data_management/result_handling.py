@@ -1,5 +1,27 @@
+import os
+import shutil
+from collections.abc import MutableMapping
+from functools import partial
 from types import SimpleNamespace
+import numpy as np
 import pandas as pd
+from src.instrumentation import phase
+
+# Columns of energy balances
+BALANCE_COLUMNS = ['Technology_inputs',
+                   'Technology_outputs',
+                   'Network_inflow',
+                   'Network_outflow',
+                   'Network_consumption',
+                   'Import',
+                   'Export',
+                   'Demand']
+
+# Tables of results written with ResultsHandle.write_parquet and ResultsHandle.write_hdf
+SUMMARY_TABLES = ['economics', 'emissions', 'technologies', 'networks']
+TIME_SERIES_TABLES = {'energybalance': ['node', 'carrier'],
+                      'technology_operation': ['node', 'technology'],
+                      'network_operation': ['network', 'arc']}
 
 class ResultsHandle:
     """
@@ -38,39 +60,50 @@ class ResultsHandle:
         self.detailed_results.nodes = {}
         self.detailed_results.networks = {}
 
-    def read_results(self, energyhub):
+    def read_results(self, energyhub, lazy=0):
         """
         Reads results to ResultHandle for viewing or export
 
+        The values of each indexed variable and parameter are extracted in one pass into a numpy array (time steps \
+        x carriers), economics and balances are computed as array operations and each data frame is built once.
+
+        With lazy results, economics, emissions, technologies and networks are read as usual, while the time series \
+        are only kept as arrays. The data frames in ``self.energybalance[car][node]`` and \
+        ``self.detailed_results.nodes[node][tec]`` (and networks) are built on first access and memoized.
+
         :param EnergyHub energyhub: instance the EnergyHub Class
+        :param int lazy: build time series data frames on first access (1) or immediately (0)
         :return: self
         """
         m = energyhub.model
+        values = _ValueExtractor(m.set_t)
+        weights = values.get(m.para_timestep_weight)
 
         # Economics
         total_cost = m.var_total_cost.value
         # emission_cost = m.var_emission_cost.value
         # Todo: Add this here, if it is done
         emission_cost = 0
-        tec_cost = sum(sum(m.node_blocks[node].tech_blocks_active[tec].var_CAPEX.value
-                           for tec in m.node_blocks[node].set_tecsAtNode) + \
-                       sum(sum(m.node_blocks[node].tech_blocks_active[tec].var_OPEX_variable[t].value
-                               for tec in m.node_blocks[node].set_tecsAtNode)
-                           for t in m.set_t) + \
-                       sum(m.node_blocks[node].tech_blocks_active[tec].var_OPEX_fixed.value
-                           for tec in m.node_blocks[node].set_tecsAtNode) \
-                       for node in m.set_nodes)
+        tec_cost = 0
+        import_cost = 0
+        export_revenue = 0
+        technologies = []
+        for node_name in m.set_nodes:
+            node_data = m.node_blocks[node_name]
+            import_cost += np.sum(values.get(node_data.var_import_flow, m.set_carriers) *
+                                  values.get(node_data.para_import_price, m.set_carriers) * weights[:, np.newaxis])
+            export_revenue += np.sum(values.get(node_data.var_export_flow, m.set_carriers) *
+                                     values.get(node_data.para_export_price, m.set_carriers) * weights[:, np.newaxis])
+
+            # Technology Sizes
+            for tec_name in node_data.set_tecsAtNode:
+                tec_data = node_data.tech_blocks_active[tec_name]
+                capex = tec_data.var_CAPEX.value
+                opex_fix = tec_data.var_OPEX_fixed.value
+                opex_var = np.sum(values.get(tec_data.var_OPEX_variable) * weights)
+                tec_cost += capex + opex_var + opex_fix
+                technologies.append([node_name, tec_name, tec_data.var_size.value, capex, opex_fix, opex_var])
         netw_cost = m.var_netw_cost.value
-        import_cost = sum(sum(sum(m.node_blocks[node].var_import_flow[t, car].value * \
-                                   m.node_blocks[node].para_import_price[t, car].value
-                                for car in m.set_carriers)
-                              for t in m.set_t) \
-                            for node in m.set_nodes)
-        export_revenue = sum(sum(sum(m.node_blocks[node].var_export_flow[t, car].value * \
-                                   m.node_blocks[node].para_export_price[t, car].value
-                                for car in m.set_carriers)
-                              for t in m.set_t) \
-                            for node in m.set_nodes)
         self.economics.loc[len(self.economics.index)] = \
             [total_cost, emission_cost, tec_cost, netw_cost, import_cost, export_revenue]
 
@@ -81,112 +114,204 @@ class ResultsHandle:
         self.emissions.loc[len(self.emissions.index)] = \
             [net_emissions, positive_emissions, negative_emissions]
 
+        self.technologies = pd.concat([self.technologies,
+                                       pd.DataFrame(technologies, columns=self.technologies.columns)],
+                                      ignore_index=True)
 
+        # Network Sizes and detailed results for networks
+        networks = []
+        for netw_name in m.set_networks:
+            netw_data = m.network_block[netw_name]
+            arc_frames = {}
+            for arc in netw_data.set_arcs:
+                arc_data = netw_data.arc_block[arc]
+                capex = arc_data.var_CAPEX.value
+                flow = values.get(arc_data.var_flow)
+                networks.append([netw_name, arc[0], arc[1], arc_data.var_size.value, capex,
+                                 capex * netw_data.para_OPEX_fixed.value, arc_data.var_OPEX_variable.value,
+                                 np.sum(flow * weights)])
 
-        # Technology Sizes
+                columns = ['flow', 'losses']
+                arrays = [flow, values.get(arc_data.var_losses)]
+                if arc_data.find_component('var_consumption_send'):
+                    consumption_send = values.get(arc_data.var_consumption_send, netw_data.set_consumed_carriers)
+                    consumption_receive = values.get(arc_data.var_consumption_receive,
+                                                     netw_data.set_consumed_carriers)
+                    for car_nr, car in enumerate(netw_data.set_consumed_carriers):
+                        columns.extend(['consumption_send' + car, 'consumption_receive' + car])
+                        arrays.extend([consumption_send[:, car_nr], consumption_receive[:, car_nr]])
+                arc_frames['_'.join(arc)] = partial(pd.DataFrame, np.column_stack(arrays), columns=columns)
+            self.detailed_results.networks[netw_name] = _get_frames(arc_frames, lazy)
+        self.networks = pd.concat([self.networks, pd.DataFrame(networks, columns=self.networks.columns)],
+                                  ignore_index=True)
+
+        # Energy Balance @ each node and detailed results for technologies
+        carriers = list(m.set_carriers)
+        balance_frames = {car: {} for car in carriers}
         for node_name in m.set_nodes:
             node_data = m.node_blocks[node_name]
+            tec_inputs = np.zeros((len(values.set_t), len(carriers)))
+            tec_outputs = np.zeros((len(values.set_t), len(carriers)))
+            tec_frames = {}
             for tec_name in node_data.set_tecsAtNode:
                 tec_data = node_data.tech_blocks_active[tec_name]
-                s = tec_data.var_size.value
-                capex = tec_data.var_CAPEX.value
-                opex_fix = tec_data.var_OPEX_fixed.value
-                opex_var = sum(tec_data.var_OPEX_variable[t].value for t in m.set_t)
+                columns = []
+                arrays = []
+
+                if tec_data.find_component('var_input'):
+                    tec_input = values.get(tec_data.var_input, tec_data.set_input_carriers)
+                    for car_nr, car in enumerate(tec_data.set_input_carriers):
+                        columns.append('input_' + car)
+                        arrays.append(tec_input[:, car_nr])
+                        tec_inputs[:, carriers.index(car)] += tec_input[:, car_nr]
+
+                tec_output = values.get(tec_data.var_output, tec_data.set_output_carriers)
+                for car_nr, car in enumerate(tec_data.set_output_carriers):
+                    columns.append('output_' + car)
+                    arrays.append(tec_output[:, car_nr])
+                    tec_outputs[:, carriers.index(car)] += tec_output[:, car_nr]
+
+                if tec_data.find_component('var_storage_level'):
+                    # for clustered data with inter-period linking, this is the intra-period storage level
+                    if tec_data.find_component('var_storage_level_inter'):
+                        prefix = 'storage_level_intra_'
+                    else:
+                        prefix = 'storage_level_'
+                    storage_level = values.get(tec_data.var_storage_level, tec_data.set_input_carriers)
+                    for car_nr, car in enumerate(tec_data.set_input_carriers):
+                        columns.append(prefix + car)
+                        arrays.append(storage_level[:, car_nr])
+
+                tec_frames[tec_name] = partial(pd.DataFrame, np.column_stack(arrays), columns=columns)
+            self.detailed_results.nodes[node_name] = _get_frames(tec_frames, lazy)
+
+            # Balance terms of all carriers in one array (carriers x time steps x terms)
+            balance = np.stack([tec_inputs,
+                                tec_outputs,
+                                values.get(node_data.var_netw_inflow, carriers),
+                                values.get(node_data.var_netw_outflow, carriers),
+                                values.get(node_data.var_netw_consumption, carriers),
+                                values.get(node_data.var_import_flow, carriers),
+                                values.get(node_data.var_export_flow, carriers),
+                                values.get(node_data.para_demand, carriers)], axis=2).transpose(1, 0, 2).copy()
+            for car_nr, car in enumerate(carriers):
+                balance_frames[car][node_name] = partial(pd.DataFrame, balance[car_nr], columns=BALANCE_COLUMNS)
+        for car in carriers:
+            self.energybalance[car] = _get_frames(balance_frames[car], lazy)
+
+    def read_results_sparse(self, energyhub):
+        """
+        Reads results of a sparse model to ResultHandle for viewing or export
+
+        :param EnergyHubSparse energyhub: instance the EnergyHubSparse Class
+        :return: self
+        """
+        m = energyhub.model
+        global_vars = m.global_vars
+        weights = energyhub.data.get_timestep_weights()
+
+        # Economics
+        total_cost = m.value(global_vars['var_total_cost'])
+        emission_cost = 0
+        tec_cost = sum(sum(m.value(tec_data['var_CAPEX']) + m.value(tec_data['var_OPEX_variable']) +
+                           m.value(tec_data['var_OPEX_fixed'])
+                           for tec_data in m.node_blocks[node]['tech_blocks_active'].values())
+                       for node in m.set_nodes)
+        netw_cost = m.value(global_vars['var_netw_cost'])
+        import_cost = sum(np.sum(m.value(m.node_blocks[node]['var_import_flow']) *
+                                 m.node_blocks[node]['para_import_prices'] * weights[:, np.newaxis])
+                          for node in m.set_nodes)
+        export_revenue = sum(np.sum(m.value(m.node_blocks[node]['var_export_flow']) *
+                                    m.node_blocks[node]['para_export_prices'] * weights[:, np.newaxis])
+                             for node in m.set_nodes)
+        self.economics.loc[len(self.economics.index)] = \
+            [total_cost, emission_cost, tec_cost, netw_cost, import_cost, export_revenue]
+
+        # Emissions
+        self.emissions.loc[len(self.emissions.index)] = \
+            [m.value(global_vars['var_emissions_net']),
+             m.value(global_vars['var_emissions_pos']),
+             m.value(global_vars['var_emissions_neg'])]
+
+        # Technology Sizes
+        for node_name in m.set_nodes:
+            for tec_name, tec_data in m.node_blocks[node_name]['tech_blocks_active'].items():
                 self.technologies.loc[len(self.technologies.index)] = \
-                    [node_name, tec_name, s, capex, opex_fix, opex_var]
+                    [node_name, tec_name, m.value(tec_data['var_size']), m.value(tec_data['var_CAPEX']),
+                     m.value(tec_data['var_OPEX_fixed']), m.value(tec_data['var_OPEX_variable'])]
 
         # Network Sizes
         for netw_name in m.set_networks:
-            netw_data = m.network_block[netw_name]
-            for arc in netw_data.set_arcs:
-                arc_data = netw_data.arc_block[arc]
-                fromNode = arc[0]
-                toNode = arc[1]
-                s = arc_data.var_size.value
-                capex = arc_data.var_CAPEX.value
-                opex_var = arc_data.var_OPEX_variable.value
-                opex_fix = capex * netw_data.para_OPEX_fixed.value
-                total_flow = sum(arc_data.var_flow[t].value for t in m.set_t)
+            netw_data = m.network_blocks[netw_name]
+            for arc in netw_data['set_arcs']:
+                arc_data = netw_data['arc_block'][arc]
+                capex = m.value(arc_data['var_CAPEX'])
                 self.networks.loc[len(self.networks.index)] = \
-                    [netw_name, fromNode, toNode, s, capex, opex_fix, opex_var, total_flow]
+                    [netw_name, arc[0], arc[1], m.value(arc_data['var_size']), capex,
+                     capex * netw_data['para_OPEX_fixed'], m.value(arc_data['var_OPEX_variable']),
+                     np.sum(m.value(arc_data['var_flow']) * weights)]
 
         # Energy Balance @ each node
-        for car in m.set_carriers:
+        for car_idx, car in enumerate(m.set_carriers):
             self.energybalance[car] = {}
             for node_name in m.set_nodes:
-                self.energybalance[car][node_name] = pd.DataFrame(columns=[
-                                                                            'Technology_inputs',
-                                                                            'Technology_outputs',
-                                                                            'Network_inflow',
-                                                                            'Network_outflow',
-                                                                            'Network_consumption',
-                                                                            'Import',
-                                                                            'Export',
-                                                                            'Demand'
-                                                                            ])
                 node_data = m.node_blocks[node_name]
-                self.energybalance[car][node_name]['Technology_inputs'] = \
-                    [sum(node_data.tech_blocks_active[tec].var_input[t, car].value
-                         for tec in node_data.set_tecsAtNode
-                         if car in node_data.tech_blocks_active[tec].set_input_carriers)
-                     for t in m.set_t]
-                self.energybalance[car][node_name]['Technology_outputs'] = \
-                    [sum(node_data.tech_blocks_active[tec].var_output[t, car].value
-                         for tec in node_data.set_tecsAtNode
-                         if car in node_data.tech_blocks_active[tec].set_output_carriers)
-                     for t in m.set_t]
-                self.energybalance[car][node_name]['Network_inflow'] = \
-                    [node_data.var_netw_inflow[t, car].value for t in m.set_t]
-                self.energybalance[car][node_name]['Network_outflow'] = \
-                    [node_data.var_netw_outflow[t, car].value for t in m.set_t]
-                self.energybalance[car][node_name]['Network_consumption'] = \
-                    [node_data.var_netw_consumption[t, car].value for t in m.set_t]
-                self.energybalance[car][node_name]['Import'] = \
-                    [node_data.var_import_flow[t, car].value for t in m.set_t]
-                self.energybalance[car][node_name]['Export'] = \
-                    [node_data.var_export_flow[t, car].value for t in m.set_t]
-                self.energybalance[car][node_name]['Demand'] = \
-                    [node_data.para_demand[t, car].value for t in m.set_t]
+                tec_inputs = np.zeros(m.nr_timesteps)
+                tec_outputs = np.zeros(m.nr_timesteps)
+                for tec_data in node_data['tech_blocks_active'].values():
+                    if car in tec_data['set_input_carriers'] and 'var_input' in tec_data:
+                        tec_inputs += m.value(tec_data['var_input'][:, tec_data['set_input_carriers'].index(car)])
+                    if car in tec_data['set_output_carriers']:
+                        tec_outputs += m.value(tec_data['var_output'][:, tec_data['set_output_carriers'].index(car)])
+                netw_inflow = np.zeros(m.nr_timesteps)
+                netw_outflow = np.zeros(m.nr_timesteps)
+                for netw_data in m.network_blocks.values():
+                    if netw_data['carrier'] == car:
+                        for from_node, to_node in netw_data['set_arcs']:
+                            arc_data = netw_data['arc_block'][from_node, to_node]
+                            if to_node == node_name:
+                                netw_inflow += m.value(arc_data['var_flow']) - m.value(arc_data['var_losses'])
+                            if from_node == node_name:
+                                netw_outflow += m.value(arc_data['var_flow'])
+                self.energybalance[car][node_name] = pd.DataFrame({
+                    'Technology_inputs': tec_inputs,
+                    'Technology_outputs': tec_outputs,
+                    'Network_inflow': netw_inflow,
+                    'Network_outflow': netw_outflow,
+                    'Network_consumption': np.zeros(m.nr_timesteps),
+                    'Import': m.value(node_data['var_import_flow'][:, car_idx]),
+                    'Export': m.value(node_data['var_export_flow'][:, car_idx]),
+                    'Demand': node_data['para_demand'][:, car_idx]
+                })
 
         # Detailed results for technologies
         for node_name in m.set_nodes:
-            node_data = m.node_blocks[node_name]
             self.detailed_results.nodes[node_name] = {}
-            for tec_name in node_data.set_tecsAtNode:
-                tec_data = node_data.tech_blocks_active[tec_name]
-
+            for tec_name, tec_data in m.node_blocks[node_name]['tech_blocks_active'].items():
                 df = pd.DataFrame()
-
-                for car in tec_data.set_input_carriers:
-                    if tec_data.find_component('var_input'):
-                        df['input_' + car] = [tec_data.var_input[t, car].value for t in m.set_t]
-
-                for car in tec_data.set_output_carriers:
-                    df['output_' + car] = [tec_data.var_output[t, car].value for t in m.set_t]
-
-                if tec_data.find_component('var_storage_level'):
-                    for car in tec_data.set_input_carriers:
-                        df['storage_level_' + car] = [tec_data.var_storage_level[t, car].value for t in m.set_t]
-
+                if 'var_input' in tec_data:
+                    for car_idx, car in enumerate(tec_data['set_input_carriers']):
+                        df['input_' + car] = m.value(tec_data['var_input'][:, car_idx])
+                for car_idx, car in enumerate(tec_data['set_output_carriers']):
+                    df['output_' + car] = m.value(tec_data['var_output'][:, car_idx])
+                if 'var_storage_level' in tec_data:
+                    if 'var_storage_level_inter' in tec_data:
+                        prefix = 'storage_level_intra_'
+                    else:
+                        prefix = 'storage_level_'
+                    for car_idx, car in enumerate(tec_data['set_input_carriers']):
+                        df[prefix + car] = m.value(tec_data['var_storage_level'][:, car_idx])
                 self.detailed_results.nodes[node_name][tec_name] = df
 
         # Detailed results for networks
         for netw_name in m.set_networks:
-            netw_data = m.network_block[netw_name]
+            netw_data = m.network_blocks[netw_name]
             self.detailed_results.networks[netw_name] = {}
-            for arc in netw_data.set_arcs:
-                arc_data = netw_data.arc_block[arc]
+            for arc in netw_data['set_arcs']:
+                arc_data = netw_data['arc_block'][arc]
                 df = pd.DataFrame()
-
-                df['flow'] = [arc_data.var_flow[t].value for t in m.set_t]
-                df['losses'] = [arc_data.var_losses[t].value for t in m.set_t]
-                if tec_data.find_component('var_consumption_send'):
-                    for car in netw_data.set_consumed_carriers:
-                        df['consumption_send' + car] = \
-                            [arc_data.var_consumption_send[t, car].value for t in m.set_t]
-                        df['consumption_receive' + car] = \
-                            [arc_data.var_consumption_receive[t, car].value for t in m.set_t]
-
+                df['flow'] = m.value(arc_data['var_flow'])
+                df['losses'] = m.value(arc_data['var_losses'])
                 self.detailed_results.networks[netw_name]['_'.join(arc)] = df
 
     def write_excel(self, path):
@@ -197,7 +322,7 @@ class ResultsHandle:
         """
         file_name = path + '.xlsx'
 
-        with pd.ExcelWriter(file_name) as writer:
+        with phase('write', format='excel'), pd.ExcelWriter(file_name) as writer:
             self.economics.to_excel(writer, sheet_name='Economics')
             self.emissions.to_excel(writer, sheet_name='Emissions')
             self.technologies.to_excel(writer, sheet_name='TechnologySizes')
@@ -209,3 +334,334 @@ class ResultsHandle:
                 for tec_name in self.detailed_results.nodes[node_name]:
                     self.detailed_results.nodes[node_name][tec_name].to_excel(writer, sheet_name=
                                                                               'DetTec_' + node_name + '_' + tec_name)
+
+    def write_parquet(self, path, compression='zstd'):
+        """
+        Writes results to a directory of parquet files (requires pyarrow)
+
+        Summary tables (economics, emissions, technologies, networks) are written to one file each. Time series are \
+        written in a long layout with a column 'timestep', partitioned by node and carrier (energybalance), node and \
+        technology (technology_operation, columns 'variable' and 'value') and network and arc (network_operation, \
+        columns 'variable' and 'value'). Partitions are written one at a time. Results can be read back with \
+        :func:`~load_results` or selectively (columns, nodes, ...) with :func:`~read_result_table`.
+
+        :param str path: directory to write to
+        :param str compression: compression of the parquet files
+        """
+        with phase('write', format='parquet'):
+            os.makedirs(path, exist_ok=True)
+            for table in SUMMARY_TABLES:
+                getattr(self, table).infer_objects().to_parquet(os.path.join(path, table + '.parquet'),
+                                                                compression=compression, index=False)
+            for table in TIME_SERIES_TABLES:
+                shutil.rmtree(os.path.join(path, table), ignore_errors=True)
+            for table, partition, df in self._get_time_series_chunks():
+                partition_path = os.path.join(path, table, *[key + '=' + str(partition[key]) for key in partition])
+                os.makedirs(partition_path, exist_ok=True)
+                df.to_parquet(os.path.join(partition_path, 'part-0.parquet'), compression=compression, index=False)
+
+    def write_hdf(self, path, complevel=5, complib='blosc:zstd'):
+        """
+        Writes results to a HDF5 file (requires PyTables)
+
+        The file contains the same tables as written with :func:`~write_parquet`. Time series are appended \
+        partition by partition to one table each. Partition columns (e.g. node and carrier) and variable names are \
+        stored as integer codes (with their names in the table ``categories``), partition columns are indexed and \
+        can be queried with :func:`~read_result_table`.
+
+        :param str path: path to write HDF5 file to (without extension)
+        :param int complevel: compression level
+        :param str complib: compression library
+        """
+        file_name = path + '.h5'
+        with phase('write', format='hdf'):
+            categories = self._get_categories()
+
+            with pd.HDFStore(file_name, mode='w', complevel=complevel, complib=complib) as store:
+                for table in SUMMARY_TABLES:
+                    store.put(table, getattr(self, table).infer_objects(), format='table')
+                store.put('categories', pd.DataFrame([[table, column, name]
+                                                      for table in categories
+                                                      for column in categories[table]
+                                                      for name in categories[table][column]],
+                                                     columns=['table', 'column', 'name']), format='table')
+
+                for table, partition, df in self._get_time_series_chunks():
+                    for column_nr, column in enumerate(partition):
+                        code = categories[table][column].index(partition[column])
+                        df.insert(column_nr, column, np.full(len(df.index), code, dtype=np.int32))
+                    if 'variable' in df:
+                        codes = pd.Index(categories[table]['variable']).get_indexer(df['variable'].cat.categories)
+                        df['variable'] = codes[df['variable'].cat.codes.to_numpy()].astype(np.int32)
+                    store.append(table, df, format='table', index=False, data_columns=TIME_SERIES_TABLES[table])
+
+                for table in TIME_SERIES_TABLES:
+                    if table in store:
+                        store.create_table_index(table, columns=TIME_SERIES_TABLES[table])
+
+    def _get_categories(self):
+        """
+        Returns the names of all partitions and variables of the time series tables
+
+        :return: dict of lists of names for each table and column
+        """
+        categories = {'energybalance': {'node': [], 'carrier': list(self.energybalance)},
+                      'technology_operation': {'node': list(self.detailed_results.nodes), 'technology': [],
+                                               'variable': []},
+                      'network_operation': {'network': list(self.detailed_results.networks), 'arc': [],
+                                            'variable': []}}
+        names = {table: {column: set(categories[table][column]) for column in categories[table]}
+                 for table in categories}
+
+        def add(table, column, name):
+            if name not in names[table][column]:
+                names[table][column].add(name)
+                categories[table][column].append(name)
+
+        for car in self.energybalance:
+            for node_name in self.energybalance[car]:
+                add('energybalance', 'node', node_name)
+        for node_name in self.detailed_results.nodes:
+            for tec_name, df in self.detailed_results.nodes[node_name].items():
+                add('technology_operation', 'technology', tec_name)
+                for variable in df.columns:
+                    add('technology_operation', 'variable', variable)
+        for netw_name in self.detailed_results.networks:
+            for arc_name, df in self.detailed_results.networks[netw_name].items():
+                add('network_operation', 'arc', arc_name)
+                for variable in df.columns:
+                    add('network_operation', 'variable', variable)
+        return categories
+
+    def _get_time_series_chunks(self):
+        """
+        Iterates over the time series of the results in long layout
+
+        :return: generator of tuples (table, dict of partition columns, data frame)
+        """
+        for car in self.energybalance:
+            for node_name in self.energybalance[car]:
+                df = self.energybalance[car][node_name].reset_index(drop=True).astype(float)
+                df.insert(0, 'timestep', np.arange(len(df)))
+                yield 'energybalance', {'node': node_name, 'carrier': car}, df
+        for node_name in self.detailed_results.nodes:
+            for tec_name in self.detailed_results.nodes[node_name]:
+                yield 'technology_operation', {'node': node_name, 'technology': tec_name}, \
+                    _to_long(self.detailed_results.nodes[node_name][tec_name])
+        for netw_name in self.detailed_results.networks:
+            for arc_name in self.detailed_results.networks[netw_name]:
+                yield 'network_operation', {'network': netw_name, 'arc': arc_name}, \
+                    _to_long(self.detailed_results.networks[netw_name][arc_name])
+
+
+def load_results(path):
+    """
+    Loads results written with :func:`~ResultsHandle.write_parquet` or :func:`~ResultsHandle.write_hdf`
+
+    :param str path: directory of the parquet files or path of the HDF5 file (with or without extension)
+    :return: instance of :class:`~ResultsHandle`
+    """
+    results = ResultsHandle()
+    for table in SUMMARY_TABLES:
+        setattr(results, table, read_result_table(path, table))
+
+    energybalance = read_result_table(path, 'energybalance')
+    for (node_name, car), df in energybalance.groupby(['node', 'carrier'], sort=False, observed=True):
+        if car not in results.energybalance:
+            results.energybalance[car] = {}
+        results.energybalance[car][node_name] = \
+            df.drop(columns=['node', 'carrier']).set_index('timestep').sort_index().reset_index(drop=True)
+
+    technology_operation = read_result_table(path, 'technology_operation')
+    for (node_name, tec_name), df in technology_operation.groupby(['node', 'technology'], sort=False,
+                                                                  observed=True):
+        if node_name not in results.detailed_results.nodes:
+            results.detailed_results.nodes[node_name] = {}
+        results.detailed_results.nodes[node_name][tec_name] = _from_long(df)
+
+    network_operation = read_result_table(path, 'network_operation')
+    for (netw_name, arc_name), df in network_operation.groupby(['network', 'arc'], sort=False, observed=True):
+        if netw_name not in results.detailed_results.networks:
+            results.detailed_results.networks[netw_name] = {}
+        results.detailed_results.networks[netw_name][arc_name] = _from_long(df)
+
+    return results
+
+
+def read_result_table(path, table, columns=None, filters=None):
+    """
+    Reads a table of results written with :func:`~ResultsHandle.write_parquet` or \
+    :func:`~ResultsHandle.write_hdf`. Only the requested columns and partitions are read, e.g. \
+    ``read_result_table(path, 'energybalance', columns=['timestep', 'Import'], filters=[('node', '=', 'onshore')])``. \
+    Partition columns and variable names are returned as categories.
+
+    :param str path: directory of the parquet files or path of the HDF5 file (with or without extension)
+    :param str table: name of the table (economics, emissions, technologies, networks, energybalance, \
+    technology_operation or network_operation)
+    :param list columns: (optional) columns to read, all columns if not supplied
+    :param list filters: (optional) filters of partition columns as tuples (column, operator, value), with \
+    operators '=' and '!='
+    :return: data frame
+    """
+    if os.path.isdir(path):
+        if table in SUMMARY_TABLES:
+            return pd.read_parquet(os.path.join(path, table + '.parquet'), columns=columns)
+        if not os.path.isdir(os.path.join(path, table)):
+            return pd.DataFrame(columns=TIME_SERIES_TABLES[table] + ['timestep'])
+        return pd.read_parquet(os.path.join(path, table), columns=columns, filters=filters)
+    else:
+        file_name = path if path.endswith('.h5') else path + '.h5'
+        with pd.HDFStore(file_name, mode='r') as store:
+            if table in SUMMARY_TABLES:
+                return store.select(table, columns=columns)
+            if table not in store:
+                return pd.DataFrame(columns=TIME_SERIES_TABLES[table] + ['timestep'])
+
+            # Names are stored as codes (in the order of the table categories)
+            names = store.select('categories')
+            names = names[names['table'] == table]
+            categories = {column: pd.Index(names.loc[names['column'] == column, 'name'])
+                          for column in TIME_SERIES_TABLES[table] + ['variable']
+                          if (names['column'] == column).any()}
+            where = None
+            if filters:
+                terms = []
+                for column, operator, value in filters:
+                    code = categories[column].get_loc(value) if value in categories[column] else -1
+                    terms.append(column + ' ' + ('==' if operator == '=' else operator) + ' ' + str(code))
+                where = ' & '.join(terms)
+            df = store.select(table, where=where, columns=columns).reset_index(drop=True)
+
+        for column in categories:
+            if column in df:
+                df[column] = pd.Categorical.from_codes(df[column].to_numpy(), categories=categories[column])
+        return df
+
+
+def _to_long(df):
+    """
+    Converts a data frame of time series to long layout (columns timestep, variable and value)
+
+    :param df: data frame with one column per variable
+    :return: data frame in long layout
+    """
+    nr_timesteps = len(df.index)
+    return pd.DataFrame({'timestep': np.tile(np.arange(nr_timesteps), len(df.columns)),
+                         'variable': pd.Categorical.from_codes(np.repeat(np.arange(len(df.columns)), nr_timesteps),
+                                                               categories=list(df.columns)),
+                         'value': df.to_numpy(dtype=float).ravel(order='F')})
+
+
+def _from_long(df):
+    """
+    Converts a data frame of time series in long layout back to one column per variable (see :func:`~_to_long`)
+
+    :param df: data frame in long layout (with variables as categories)
+    :return: data frame with one column per variable
+    """
+    codes = df['variable'].cat.codes.to_numpy()
+    variable_codes = pd.unique(codes)
+    positions = np.zeros(len(df['variable'].cat.categories), dtype=int)
+    positions[variable_codes] = np.arange(len(variable_codes))
+    timesteps = df['timestep'].to_numpy()
+    values = np.full((timesteps.max() + 1 if len(timesteps) else 0, len(variable_codes)), np.nan)
+    values[timesteps, positions[codes]] = df['value'].to_numpy()
+    return pd.DataFrame(values, columns=list(df['variable'].cat.categories[variable_codes]))
+
+
+def _get_frames(builders, lazy):
+    """
+    Returns data frames from functions building them
+
+    :param dict builders: functions building the data frames (without arguments)
+    :param int lazy: build data frames on first access (1) or immediately (0)
+    :return: dict of data frames or instance of :class:`~_LazyFrames`
+    """
+    if lazy:
+        return _LazyFrames(builders)
+    return {key: builders[key]() for key in builders}
+
+
+class _LazyFrames(MutableMapping):
+    """
+    Dict of data frames, which are built on first access and memoized. Builders have to be picklable (e.g. \
+    functools.partial of pd.DataFrame), such that results can be pickled before all data frames are built.
+    """
+    def __init__(self, builders):
+        """
+        Constructor
+
+        :param dict builders: functions building the data frames (without arguments)
+        """
+        self._builders = dict(builders)
+        self._frames = {}
+
+    def __getitem__(self, key):
+        if key not in self._frames:
+            if key not in self._builders:
+                raise KeyError(key)
+            self._frames[key] = self._builders[key]()
+        return self._frames[key]
+
+    def __setitem__(self, key, frame):
+        if key not in self._builders:
+            self._builders[key] = None
+        self._frames[key] = frame
+
+    def __delitem__(self, key):
+        del self._builders[key]
+        self._frames.pop(key, None)
+
+    def __iter__(self):
+        return iter(self._builders)
+
+    def __len__(self):
+        return len(self._builders)
+
+    def __contains__(self, key):
+        return key in self._builders
+
+    def __repr__(self):
+        return '_LazyFrames(' + repr(list(self._builders)) + ', built: ' + repr(list(self._frames)) + ')'
+
+
+class _ValueExtractor:
+    """
+    Extracts the values of variables and parameters indexed by time steps (and carriers) of a pyomo model into \
+    numpy arrays. Values are read in one pass per component; extracted components are memoized.
+    """
+    def __init__(self, set_t):
+        """
+        Constructor
+
+        :param set_t: set of time steps of the model
+        """
+        self.set_t = list(set_t)
+        self._indices = {}
+        self._values = {}
+
+    def get(self, component, set_carriers=None):
+        """
+        Returns the values of a component as array, unavailable values (e.g. of unused variables) are nan
+
+        :param component: pyomo variable or parameter indexed by time steps (and carriers)
+        :param set_carriers: (optional) carriers of the second index
+        :return: numpy array of shape (time steps) or (time steps, carriers)
+        """
+        carriers = None if set_carriers is None else tuple(set_carriers)
+        if id(component) not in self._values:
+            if carriers is None:
+                index = self.set_t
+            else:
+                if carriers not in self._indices:
+                    self._indices[carriers] = [(t, car) for t in self.set_t for car in carriers]
+                index = self._indices[carriers]
+            data = component.extract_values()
+            if list(data) == index:
+                values = np.array(list(data.values()), dtype=float)
+            else:
+                values = np.array([data.get(key) for key in index], dtype=float)
+            if carriers is not None:
+                values = values.reshape(len(self.set_t), len(carriers))
+            self._values[id(component)] = (component, values)
+        return self._values[id(component)][1]
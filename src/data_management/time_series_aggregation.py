@@ -0,0 +1,309 @@
+import numpy as np
+import pandas as pd
+from scipy.cluster.vq import kmeans2
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.spatial.distance import cdist
+from src.data_management.data_handling import DataHandle, TIME_SERIES_FITS
+
+
+class ClusteredDataHandle(DataHandle):
+    """
+    DataHandle with time series aggregated to representative periods (e.g. typical days).
+
+    The constructor takes a DataHandle, for which all input data (climate data, demand, prices, technologies, \
+    networks,...) has been read in. All time series, i.e. demand, import/export prices, import/export limits, \
+    emission factors and the fitted capacity factors and ambient loss factors of technologies, are split into \
+    periods of equal length and clustered into a number of representative periods. Each representative period is \
+    weighted by the number of periods it represents. An instance of this class can be passed to \
+    :class:`~src.energyhub.EnergyHub` in the same way as a DataHandle, the costs and emissions are then scaled with \
+    the weight of each time step.
+
+    Three clustering methods are available:
+
+    - ``'kmeans'``: k-means clustering, periods are represented by the mean of all periods in the cluster
+    - ``'kmedoids'``: k-medoids clustering, periods are represented by the medoid of the cluster
+    - ``'hierarchical'``: agglomerative clustering (ward), periods are represented by the medoid of the cluster
+
+    Extreme periods (e.g. the day with the highest demand) can be added as additional representative periods with a \
+    weight of one. The aggregation error of each time series is available at ``self.aggregation_error``.
+
+    The sequence of periods in the original time horizon is kept at ``self.period_sequence``. With \
+    ``m_config.storage.inter_period_linking = 1`` (default), it is used to link the storage levels of the \
+    representative periods (see :func:`~src.model_construction.generic_technology_constraints.constraints_tec_STOR`). \
+    Otherwise, storage technologies couple the first and the last time step of the aggregated time horizon.
+    """
+    def __init__(self, data, nr_periods, period_length=24, method='kmeans', extreme_periods=None, seed=0):
+        """
+        Constructor
+
+        :param DataHandle data: DataHandle containing all input data at full resolution
+        :param int nr_periods: number of typical periods (excluding extreme periods)
+        :param int period_length: number of time steps per period (e.g. 24 for typical days with hourly resolution)
+        :param str method: clustering method, can be 'kmeans', 'kmedoids' or 'hierarchical'
+        :param list extreme_periods: (optional) list of tuples (series name, 'max' or 'min'). The period containing \
+        the maximum/minimum of the respective time series is added as an extreme period. Series are named \
+        'nodename/demand/carrier', 'nodename/import_prices/carrier', ... and 'nodename/technology/capacity_factor'
+        :param int seed: seed for random initialization of the clustering
+        """
+        self.topology = dict(data.topology)
+        self.network_data = data.network_data
+        self.original_timesteps = data.topology['timesteps']
+        self.period_length = period_length
+        self.method = method
+
+        nr_timesteps = len(self.original_timesteps)
+        if nr_timesteps % period_length != 0:
+            raise Exception('The number of time steps (' + str(nr_timesteps) + ') needs to be a multiple of the '
+                            'period length (' + str(period_length) + ').')
+        self.nr_original_periods = int(nr_timesteps / period_length)
+
+        # Collect all time series to aggregate
+        series = self._collect_time_series(data)
+
+        # Cluster periods
+        self._cluster(series, nr_periods, extreme_periods, seed)
+        self.topology['timesteps'] = pd.date_range(start=self.original_timesteps[0],
+                                                   freq=self.original_timesteps[1] - self.original_timesteps[0],
+                                                   periods=self.nr_periods * period_length)
+
+        # Aggregate input data
+        self.released_nodes = []
+        self.node_data = {}
+        for nodename in data.node_data:
+            self.node_data[nodename] = {}
+            for key in data.node_data[nodename]:
+                if key == 'climate_data':
+                    self.node_data[nodename][key] = data.node_data[nodename][key]
+                else:
+                    frame = data.node_data[nodename][key]
+                    self.node_data[nodename][key] = pd.DataFrame(
+                        {car: self.aggregate(frame[car].to_numpy(dtype=float)) for car in frame.columns},
+                        index=self.topology['timesteps'])
+
+        self.technology_data = {}
+        for nodename in data.technology_data:
+            self.technology_data[nodename] = {}
+            for tec in data.technology_data[nodename]:
+                self.technology_data[nodename][tec] = self._aggregate_technology(data.technology_data[nodename][tec])
+
+        # Aggregation error
+        self.aggregation_error = self._calculate_aggregation_error(series)
+
+    def get_timestep_weights(self):
+        """
+        Returns the weight of each time step in the cost and emission balances, i.e. the number of original periods \
+        represented by the period of the time step
+
+        :return: array of weights
+        """
+        return np.repeat(self.period_weights, self.period_length).astype(float)
+
+    def aggregate(self, values):
+        """
+        Aggregates a time series at full resolution to the representative periods
+
+        :param values: time series at full resolution (only the first nr_original_periods * period_length entries \
+        are used)
+        :return: numpy array of aggregated time series
+        """
+        periods = np.asarray(values, dtype=float)[:self.nr_original_periods * self.period_length]
+        periods = periods.reshape(self.nr_original_periods, self.period_length)
+        return np.concatenate([periods[members].mean(axis=0) for members in self.period_members])
+
+    def disaggregate(self, values):
+        """
+        Maps an aggregated time series back to the original time horizon, using the sequence of periods
+
+        :param values: aggregated time series
+        :return: numpy array of the time series at full resolution
+        """
+        periods = np.asarray(values).reshape(self.nr_periods, self.period_length)
+        return periods[self.period_sequence].ravel()
+
+    def read_technology_data(self):
+        """
+        Writes technologies to self, fits performance functions and aggregates fitted time series
+
+        :return: self at ``self.technology_data[nodename][tec]``
+        """
+        DataHandle.read_technology_data(self)
+        for nodename in self.technology_data:
+            for tec in self.technology_data[nodename]:
+                self.technology_data[nodename][tec] = self._aggregate_technology(self.technology_data[nodename][tec])
+
+    def read_single_technology_data(self, nodename, technologies):
+        """
+        Reads technologies to DataHandle after it has been initialized and aggregates fitted time series.
+
+        This function is only required if technologies are added to the model after the DataHandle has been initialized.
+        """
+        DataHandle.read_single_technology_data(self, nodename, technologies)
+        for tec in technologies:
+            self.technology_data[nodename][tec] = self._aggregate_technology(self.technology_data[nodename][tec])
+
+    def _collect_time_series(self, data):
+        """
+        Collects all time series of a DataHandle in a dict
+
+        :param DataHandle data: DataHandle at full resolution
+        :return: dict with series name as keys and numpy arrays as values
+        """
+        nr_timesteps = self.nr_original_periods * self.period_length
+        series = {}
+        for nodename in data.node_data:
+            for key in data.node_data[nodename]:
+                if not key == 'climate_data':
+                    for car in data.node_data[nodename][key]:
+                        series[nodename + '/' + key + '/' + car] = \
+                            data.node_data[nodename][key][car].to_numpy(dtype=float)[:nr_timesteps]
+        for nodename in data.technology_data:
+            for tec in data.technology_data[nodename]:
+                tec_fit = data.technology_data[nodename][tec]['fit']
+                for key in TIME_SERIES_FITS:
+                    if key in tec_fit:
+                        series[nodename + '/' + tec + '/' + key] = \
+                            np.asarray(tec_fit[key], dtype=float)[:nr_timesteps]
+        return series
+
+    def _cluster(self, series, nr_periods, extreme_periods, seed):
+        """
+        Clusters periods and sets the period sequence, members and weights of each representative period
+
+        :param dict series: time series at full resolution
+        :param int nr_periods: number of typical periods
+        :param list extreme_periods: list of tuples (series name, 'max' or 'min')
+        :param int seed: seed for random initialization
+        """
+        # Normalize each time series and use all time steps of a period as features of the period
+        features = []
+        for name in series:
+            values = series[name]
+            value_range = values.max() - values.min()
+            if value_range > 0:
+                values = (values - values.min()) / value_range
+                features.append(values.reshape(self.nr_original_periods, self.period_length))
+        if features:
+            features = np.hstack(features)
+        else:
+            features = np.zeros((self.nr_original_periods, 1))
+
+        # Extreme periods
+        extreme_period_index = []
+        if extreme_periods:
+            for name, extreme_type in extreme_periods:
+                if extreme_type == 'max':
+                    period = int(np.argmax(series[name]) / self.period_length)
+                elif extreme_type == 'min':
+                    period = int(np.argmin(series[name]) / self.period_length)
+                else:
+                    raise Exception('Extreme periods can only be of type max or min.')
+                if period not in extreme_period_index:
+                    extreme_period_index.append(period)
+
+        # Cluster all other periods
+        periods = np.array([p for p in range(self.nr_original_periods) if p not in extreme_period_index])
+        nr_clusters = min(nr_periods, len(periods))
+        rng = np.random.default_rng(seed)
+        if self.method == 'kmeans':
+            centroids, labels = kmeans2(features[periods], nr_clusters, minit='++', seed=seed)
+            representatives = {k: periods[labels == k] for k in np.unique(labels)}
+        elif self.method == 'kmedoids':
+            labels, medoids = _kmedoids(features[periods], nr_clusters, rng)
+            representatives = {k: periods[[medoids[k]]] for k in np.unique(labels)}
+        elif self.method == 'hierarchical':
+            labels = fcluster(linkage(features[periods], method='ward'), nr_clusters, criterion='maxclust')
+            representatives = {}
+            for k in np.unique(labels):
+                members = periods[labels == k]
+                distance = cdist(features[members], features[members]).sum(axis=1)
+                representatives[k] = members[[np.argmin(distance)]]
+        else:
+            raise Exception('Clustering method ' + self.method + ' is not available.')
+
+        # Period sequence and weights (empty clusters are dropped)
+        self.period_sequence = np.zeros(self.nr_original_periods, dtype=int)
+        self.period_members = []
+        weights = []
+        for k in np.unique(labels):
+            self.period_sequence[periods[labels == k]] = len(self.period_members)
+            self.period_members.append(representatives[k])
+            weights.append(np.sum(labels == k))
+        for period in extreme_period_index:
+            self.period_sequence[period] = len(self.period_members)
+            self.period_members.append(np.array([period]))
+            weights.append(1)
+
+        self.period_weights = np.array(weights)
+        self.nr_periods = len(self.period_members)
+
+    def _aggregate_technology(self, technology_data):
+        """
+        Aggregates the fitted time series of a technology
+
+        :param dict technology_data: technology data as fitted at full resolution
+        :return: copy of the technology data with aggregated time series
+        """
+        technology_data = dict(technology_data)
+        technology_data['fit'] = dict(technology_data['fit'])
+        for key in TIME_SERIES_FITS:
+            if key in technology_data['fit']:
+                technology_data['fit'][key] = pd.Series(self.aggregate(technology_data['fit'][key]),
+                                                        index=self.topology['timesteps'])
+        return technology_data
+
+    def _calculate_aggregation_error(self, series):
+        """
+        Calculates the error of the aggregated time series compared to the full resolution time series
+
+        :param dict series: time series at full resolution
+        :return: data frame with the root mean square error, mean absolute error and the mean of the original and \
+        the aggregated time series (accounting for the weights of the periods)
+        """
+        error = pd.DataFrame(columns=['RMSE', 'MAE', 'Mean_original', 'Mean_aggregated'])
+        for name in series:
+            deviation = self.disaggregate(self.aggregate(series[name])) - series[name]
+            error.loc[name] = [np.sqrt(np.mean(deviation ** 2)),
+                               np.mean(np.abs(deviation)),
+                               np.mean(series[name]),
+                               np.average(self.aggregate(series[name]), weights=self.get_timestep_weights())]
+        return error
+
+
+def _kmedoids(features, nr_clusters, rng, max_iter=100):
+    """
+    Clusters with k-medoids (alternating algorithm with k-medoids++ initialization)
+
+    :param features: array of features (observations x features)
+    :param int nr_clusters: number of clusters
+    :param rng: numpy random generator
+    :param int max_iter: maximal number of iterations
+    :return: labels of each observation and index of the medoids
+    """
+    distance = cdist(features, features)
+    nr_observations = features.shape[0]
+
+    # Initialization
+    medoids = [int(rng.integers(nr_observations))]
+    for k in range(1, nr_clusters):
+        min_distance = distance[:, medoids].min(axis=1) ** 2
+        if min_distance.sum() > 0:
+            medoids.append(int(rng.choice(nr_observations, p=min_distance / min_distance.sum())))
+        else:
+            medoids.append(int(rng.choice([i for i in range(nr_observations) if i not in medoids])))
+
+    # Alternate between assigning observations and updating medoids
+    for iteration in range(max_iter):
+        labels = np.argmin(distance[:, medoids], axis=1)
+        new_medoids = []
+        for k in range(len(medoids)):
+            members = np.where(labels == k)[0]
+            if len(members) == 0:
+                new_medoids.append(medoids[k])
+            else:
+                new_medoids.append(int(members[np.argmin(distance[np.ix_(members, members)].sum(axis=1))]))
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+
+    labels = np.argmin(distance[:, medoids], axis=1)
+    return labels, medoids
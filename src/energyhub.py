@@ -1,15 +1,15 @@
 from pyomo.environ import *
-from pyomo.environ import units as u
 from pyomo.gdp import *
 
 import src.model_construction as mc
 import src.data_management as dm
-import pint
+import src.model_solving as ms
 import numpy as np
 import dill as pickle
 import pandas as pd
+import gc
 import src.config_model as m_config
-import time
+from src.instrumentation import get_instrumentation, phase, profile_rules
 
 
 class EnergyHub:
@@ -26,13 +26,28 @@ class EnergyHub:
     - Set of weather variables :math:`W`
     - Set of technologies at each node :math:`S_n, n \in N`
 
+    **Parameter declarations:**
+
+    - Weight of each time step :math:`w_t` in the cost and emission balances. For data at full resolution, all \
+      weights are one. For clustered data (:class:`~src.data_management.time_series_aggregation.ClusteredDataHandle`)\
+      the weight is the number of periods represented by the respective period.
+
+    For clustered data and ``m_config.storage.inter_period_linking == 1``, the following sets and parameters are \
+    additionally defined and used to link the storage levels of the typical periods (see \
+    :func:`~src.model_construction.generic_technology_constraints.constraints_tec_STOR`):
+
+    - Set of typical periods :math:`K` and set of periods of the original time horizon :math:`P`
+    - Number of time steps per period :math:`L` and typical period :math:`k(p)` representing period :math:`p`
+
     """
     def __init__(self, data):
         """
         Constructor of the energyhub class.
         """
+        data._check_time_series()
         print('Reading in data...')
-        start = time.time()
+        instrumentation = get_instrumentation()
+        record = instrumentation.start_phase('read_data')
 
         # INITIALIZE MODEL
         self.model = ConcreteModel()
@@ -42,6 +57,19 @@ class EnergyHub:
         self.model.set_nodes = Set(initialize=sets['nodes'])  # Nodes
         self.model.set_carriers = Set(initialize=sets['carriers'])  # Carriers
         self.model.set_t = RangeSet(1,len(sets['timesteps']))# Timescale
+        # Weight of each time step in cost and emission balances (differs from one for clustered data)
+        self.model.para_timestep_weight = Param(self.model.set_t,
+                                                initialize=mc.array_to_dict(data.get_timestep_weights(),
+                                                                            self.model.set_t),
+                                                mutable=True)
+        # Typical periods and their sequence in the original time horizon (only for clustered data)
+        if isinstance(data, dm.ClusteredDataHandle) and m_config.storage.inter_period_linking:
+            self.model.set_typical_periods = RangeSet(1, data.nr_periods)
+            self.model.set_calendar_periods = RangeSet(1, data.nr_original_periods)
+            self.model.para_period_length = Param(initialize=data.period_length)
+            self.model.para_period_sequence = Param(self.model.set_calendar_periods,
+                                                    initialize={p + 1: int(k) + 1
+                                                                for p, k in enumerate(data.period_sequence)})
         climate_vars = data.node_data[self.model.set_nodes[1]]['climate_data']['dataframe'].columns.tolist()
         self.model.set_climate_vars = Set(initialize=climate_vars) # climate variables
         def tec_node(set, node):  # Technologies
@@ -59,14 +87,14 @@ class EnergyHub:
 
         # READ IN DATA
         self.data = data
+        self.solution = None
+        self.rolling_horizon_results = None
+        self.solver_session = None
+        self.pareto_front = None
+        self.pareto_results = None
 
-        # define units
-        try:
-            u.load_definitions_from_strings(['EUR = [currency]'])
-        except pint.errors.DefinitionSyntaxError:
-            pass
-
-        print('Reading in data completed in ' + str(time.time() - start) + ' s')
+        instrumentation.end_phase(record)
+        print('Reading in data completed in ' + str(record['wall_time']) + ' s')
 
     def construct_model(self):
         """
@@ -82,11 +110,18 @@ class EnergyHub:
         The objective is minimized and can be chosen as total annualized costs, total annualized emissions \
         multi-objective (emission-cost pareto front).
 
+        With ``m_config.construction.low_memory = 1``, the time series of each node are released from the DataHandle \
+        once its block is constructed (see :func:`~src.data_management.data_handling.DataHandle.release_time_series`). \
+        With ``m_config.instrumentation.memory_report = 1``, the memory and size of each network, node and technology \
+        block is printed (see :func:`~src.instrumentation.Instrumentation.get_memory_report`).
+
         """
         # Todo: implement different options for objective function.
 
+        self.data._check_time_series()
         print('Constructing Model...')
-        start = time.time()
+        instrumentation = get_instrumentation()
+        record = instrumentation.start_phase('construct_model')
         # Global Cost Variables
         self.model.var_node_cost = Var()
         self.model.var_netw_cost = Var()
@@ -98,21 +133,76 @@ class EnergyHub:
 
 
         # Model construction
-        self.model = mc.add_networks(self.model, self.data)
-        self.model = mc.add_nodes(self.model, self.data)
+        with profile_rules('Constructing Model', record):
+            networks_record = instrumentation.start_phase('networks')
+            self.model = mc.add_networks(self.model, self.data)
+            instrumentation.end_phase(networks_record, self.model.network_block)
+            nodes_record = instrumentation.start_phase('nodes')
+            self.model = mc.add_nodes(self.model, self.data)
+            instrumentation.end_phase(nodes_record, self.model.node_blocks)
+
+        if m_config.construction.low_memory:
+            # Free released time series and temporary blocks (kept in reference cycles) right away
+            gc.collect()
+
+        instrumentation.end_phase(record, self.model)
+        print('Constructing Model completed in ' + str(record['wall_time']) + ' s')
+        if m_config.instrumentation.memory_report:
+            instrumentation.print_memory_report(phase=record)
 
     def construct_balances(self):
         """
         Constructs the energy balance, emission balance and calculates costs
         """
-        self.model = mc.add_energybalance(self.model)
-        self.model = mc.add_emissionbalance(self.model)
-        self.model = mc.add_system_costs(self.model)
-
-    def solve_model(self, objective = 'cost'):
+        replaced = [self.model.find_component(name) for name in mc.BALANCE_CONSTRAINTS]
+        with phase('balances', self.model) as record, profile_rules('Constructing Balances', record):
+            self.model = mc.add_energybalance(self.model)
+            self.model = mc.add_emissionbalance(self.model)
+            self.model = mc.add_system_costs(self.model)
+        self._register_changes(*replaced, *[self.model.find_component(name) for name in mc.BALANCE_CONSTRAINTS])
+
+    def solve_model(self, objective = 'cost', rolling_horizon=False, sizes=None):
         """
         Defines objective and solves model
+
+        With ``m_config.solver.persistent == 1`` (off by default), the solver is kept in memory in a \
+        :class:`~src.model_solving.solver_session.SolverSession` and subsequent solves (e.g. after adding a \
+        technology or changing the objective) only pass the changes to the solver. Changes made to the model \
+        outside of the EnergyHub class need to be registered with \
+        :func:`~src.model_solving.solver_session.SolverSession.register_changes`.
+
+        With ``rolling_horizon=True``, the operation is solved with fixed sizes in overlapping time windows, see \
+        :func:`~src.model_solving.rolling_horizon.solve_rolling_horizon`. The window length and lookahead are set in \
+        ``m_config.rolling_horizon``. The stitched results are returned by :func:`~write_results`.
+
+        With ``objective='pareto'``, the pareto front of cost and emissions is calculated, see \
+        :func:`~src.model_solving.pareto.solve_pareto`. The front and the results of each point are stored in \
+        ``pareto_front`` and ``pareto_results``.
+
+        :param str objective: can be 'cost', 'emissions_pos', 'emissions_net', 'emissions_minC' or 'pareto'
+        :param bool rolling_horizon: solve the operation with a rolling horizon
+        :param ResultsHandle sizes: (optional, rolling horizon only) results containing the sizes of all \
+        technologies and networks. If not supplied, the sizes of the solved model are used.
         """
+        if rolling_horizon:
+            self.rolling_horizon_results = ms.solve_rolling_horizon(self, objective, sizes)
+            return
+        self.rolling_horizon_results = None
+
+        if objective == 'pareto':
+            self.pareto_front, self.pareto_results = ms.solve_pareto(self)
+            return
+        elif objective == 'emissions_minC':
+            # Minimize positive emissions, then minimize cost at minimal positive emissions
+            self.solve_model('emissions_pos')
+            emission_limit = self.model.var_emissions_pos.value
+            self.model.const_emission_limit = Constraint(expr=self.model.var_emissions_pos <= emission_limit)
+            self._register_changes(self.model.const_emission_limit)
+            self.solve_model('cost')
+            self._register_changes(self.model.const_emission_limit)
+            self.model.del_component(self.model.const_emission_limit)
+            return
+
         # This is a dirty fix as objectives cannot be found with find_component
         try:
             self.model.del_component(self.model.objective)
@@ -132,25 +222,22 @@ class EnergyHub:
             def init_emission_net_objective(obj):
                 return self.model.var_emissions_net
             self.model.objective = Objective(rule=init_emission_net_objective, sense=minimize)
-        elif objective == 'emissions_minC':
-            def init_emission_minC_objective(obj):
-                return self.model.var_emissions_pos
-            self.model.objective = Objective(rule=init_emission_minC_objective, sense=minimize)
-            emission_limit = self.model.var_emissions_pos.value
-            self.model.const_emission_limit = Constraint(expr=self.model.var_emissions_pos <= emission_limit)
-            def init_cost_objective(obj):
-                return self.model.var_total_cost
-            self.model.objective = Objective(rule=init_cost_objective, sense=minimize)
-
-        elif objective == 'pareto':
-            print('to be implemented')
+        else:
+            raise Exception('Objective ' + objective + ' is not available.')
 
         # Solve model
         print('Solving Model...')
-        start = time.time()
-        solver = SolverFactory(m_config.solver.solver)
-        self.solution = solver.solve(self.model, tee=True, warmstart=True)
+        with phase('solve', objective=objective) as record:
+            if m_config.solver.persistent:
+                # Keep the solver in memory, such that only changes are passed to the solver at the next solve
+                if self.solver_session is None or self.solver_session.solver_name != m_config.solver.solver:
+                    self.solver_session = ms.SolverSession(m_config.solver.solver)
+                self.solution = self.solver_session.solve(self.model, tee=True)
+            else:
+                solver = SolverFactory(m_config.solver.solver)
+                self.solution = solver.solve(self.model, tee=True, warmstart=True)
         self.solution.write()
+        print('Solving Model completed in ' + str(record['wall_time']) + ' s')
 
 
     def add_technology_to_node(self, nodename, technologies):
@@ -166,7 +253,29 @@ class EnergyHub:
         """
         self.data.read_single_technology_data(nodename, technologies)
         node_block = self.model.node_blocks[nodename]
-        mc.add_technologies(nodename, technologies, self.model, self.data, node_block)
+        with profile_rules('Adding Technologies'):
+            mc.add_technologies(nodename, technologies, self.model, self.data, node_block)
+        self._register_changes(node_block)
+        if m_config.construction.low_memory:
+            self.data.release_time_series(nodename)
+            gc.collect()
+
+    def _register_changes(self, *components):
+        """
+        Registers changed components with the solver session (if a session exists)
+
+        :param components: constraints, variables or blocks that were added, deleted or modified
+        """
+        if self.solver_session is not None:
+            self.solver_session.register_changes(*components)
+
+    def __getstate__(self):
+        """
+        Excludes the solver session when pickling (solver instances cannot be pickled)
+        """
+        state = self.__dict__.copy()
+        state['solver_session'] = None
+        return state
 
     def save_model(self, file_path, file_name):
         """
@@ -215,10 +324,17 @@ class EnergyHub:
     def write_results(self):
         """
         Exports results to an instance of ResultsHandle to be further exported or viewed
+
+        With ``m_config.results.lazy = 1``, time series data frames are only built on first access (see \
+        :func:`~src.data_management.result_handling.ResultsHandle.read_results`), e.g. for scenario sweeps that only \
+        evaluate economics and emissions.
         """
+        if self.rolling_horizon_results is not None:
+            return self.rolling_horizon_results
 
         results = dm.ResultsHandle()
-        results.read_results(self)
+        with phase('result_extraction', lazy=m_config.results.lazy):
+            results.read_results(self, m_config.results.lazy)
 
         return results
         for node_name in self.model.set_nodes:
@@ -0,0 +1,103 @@
+import numpy as np
+import src.model_construction as mc
+import src.data_management as dm
+import src.config_model as m_config
+from src.instrumentation import get_instrumentation, phase
+
+
+class EnergyHubSparse:
+    r"""
+    Class to construct and solve an energy system model as a sparse matrix problem.
+
+    This class is an alternative to :class:`~src.energyhub.EnergyHub` for large models. It constructs the same \
+    formulation (RES, CONV2 and STOR technologies, networks, energy, emission and cost balances), but instead of \
+    calling a pyomo rule for each index, all coefficients are written as whole-horizon numpy blocks into a \
+    :class:`~src.model_construction.construct_sparse.SparseModel`. The resulting standard form problem is directly \
+    passed to HiGHS (via ``scipy.optimize.milp``) and the solution is written back to a \
+    :class:`~src.data_management.result_handling.ResultsHandle`.
+
+    Note that, contrary to the pyomo model, technologies cannot be added to a constructed model.
+    """
+    def __init__(self, data):
+        """
+        Constructor of the sparse energyhub class.
+
+        :param DataHandle data: instance of a DataHandle
+        """
+        self.data = data
+        self.model = mc.SparseModel(data.topology)
+        if isinstance(data, dm.ClusteredDataHandle) and m_config.storage.inter_period_linking:
+            self.model.period_length = data.period_length
+            self.model.period_sequence = data.period_sequence
+        self.solution = None
+
+    def construct_model(self):
+        """
+        Constructs all networks, nodes and technologies (see \
+        :func:`~src.model_construction.construct_sparse.add_networks_sparse` and \
+        :func:`~src.model_construction.construct_sparse.add_nodes_sparse`)
+        """
+        print('Constructing Sparse Model...')
+        instrumentation = get_instrumentation()
+        record = instrumentation.start_phase('construct_model', sparse=1)
+
+        # Global cost and emission variables
+        for var in ['var_node_cost', 'var_netw_cost', 'var_total_cost',
+                    'var_emissions_pos', 'var_emissions_neg', 'var_emissions_net']:
+            self.model.global_vars[var] = self.model.add_var(lb=-np.inf)
+
+        # Model construction
+        self.model = mc.add_networks_sparse(self.model, self.data)
+        self.model = mc.add_nodes_sparse(self.model, self.data)
+        instrumentation.end_phase(record)
+        print('Constructing Sparse Model completed in ' + str(record['wall_time']) + ' s')
+
+    def construct_balances(self):
+        """
+        Constructs the energy balance, emission balance and calculates costs
+        """
+        with phase('balances', sparse=1):
+            self.model = mc.add_energybalance_sparse(self.model)
+            self.model = mc.add_emissionbalance_sparse(self.model)
+            self.model = mc.add_system_costs_sparse(self.model)
+
+    def solve_model(self, objective='cost'):
+        """
+        Defines objective and solves model
+
+        :param str objective: can be 'cost', 'emissions_pos', 'emissions_net' or 'emissions_minC' (minimal cost at \
+        minimal positive emissions)
+        """
+        global_vars = self.model.global_vars
+
+        print('Solving Sparse Model...')
+        instrumentation = get_instrumentation()
+        record = instrumentation.start_phase('solve', objective=objective, sparse=1)
+        if objective == 'cost':
+            self.solution = self.model.solve([(1, global_vars['var_total_cost'])], tee=True)
+        elif objective == 'emissions_pos':
+            self.solution = self.model.solve([(1, global_vars['var_emissions_pos'])], tee=True)
+        elif objective == 'emissions_net':
+            self.solution = self.model.solve([(1, global_vars['var_emissions_net'])], tee=True)
+        elif objective == 'emissions_minC':
+            self.solution = self.model.solve([(1, global_vars['var_emissions_pos'])], tee=True)
+            emission_limit = self.model.value(global_vars['var_emissions_pos'])
+            self.model.add_constraint('const_emission_limit', (), [(1, global_vars['var_emissions_pos'])],
+                                      ub=emission_limit)
+            self.solution = self.model.solve([(1, global_vars['var_total_cost'])], tee=True)
+        else:
+            raise Exception('Objective ' + objective + ' is not available for the sparse model.')
+
+        instrumentation.end_phase(record)
+        print(self.solution.message)
+        print('Solving Sparse Model completed in ' + str(record['wall_time']) + ' s')
+
+    def write_results(self):
+        """
+        Exports results to an instance of ResultsHandle to be further exported or viewed
+        """
+        results = dm.ResultsHandle()
+        with phase('result_extraction', sparse=1):
+            results.read_results_sparse(self)
+
+        return results
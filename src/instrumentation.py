@@ -0,0 +1,537 @@
+import inspect
+import json
+import sys
+import time
+import tracemalloc
+import types
+from contextlib import contextmanager
+import pandas as pd
+from pyomo.environ import Var, Param, Constraint, Expression, Objective, Block
+from pyomo.gdp import Disjunct, Disjunction
+import src.config_model as m_config
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, the peak memory is not recorded
+    resource = None
+
+# Resident memory of the process (Linux only, see _get_rss)
+STATM_PATH = '/proc/self/statm'
+
+# Instrumentation of the process (see get_instrumentation)
+_instrumentation = None
+
+# Pyomo components and their keyword arguments, of which rules are profiled (see RuleProfiler)
+PROFILED_COMPONENTS = {Var: ['rule', 'initialize', 'bounds'],
+                       Param: ['rule', 'initialize'],
+                       Constraint: ['rule', 'expr'],
+                       Expression: ['rule', 'expr', 'initialize'],
+                       Objective: ['rule', 'expr'],
+                       Block: ['rule'],
+                       Disjunct: ['rule'],
+                       Disjunction: ['rule', 'expr']}
+
+
+class Instrumentation:
+    """
+    Records wall time, CPU time, memory and model size of the phases of building and solving an energy system model \
+    (e.g. fitting technologies, constructing networks, nodes and technology blocks, big-M transformations, balances, \
+    solving and reading results).
+
+    Each phase is recorded as dict with the following entries:
+
+    - name: name of the phase, path: names of the enclosing phases and the phase joined with '/'
+    - index, end_index: number of the phase and of the last phase started within it (phases are numbered in the \
+      order they are started), such that the phases nested in a phase can be identified
+    - info: further information (e.g. node and technology of technology blocks)
+    - wall_time, cpu_time: duration of the phase in s
+    - memory: with ``m_config.instrumentation.trace_memory = 1``, the peak of memory allocated by python during \
+      the phase in MB (slow). Otherwise the peak resident memory of the process at the end of the phase in MB (not \
+      available on Windows).
+    - memory_allocated, memory_self: with ``m_config.instrumentation.trace_memory = 1``, the memory allocated by \
+      python during the phase and still in use at its end in MB, including and excluding nested phases (e.g. the \
+      technology blocks of a node block)
+    - rss_delta: change of the resident memory of the process during the phase in MB (Linux only)
+    - variables, constraints, binaries: number of variables, active constraints and binary variables of the block \
+      constructed in the phase (with ``m_config.instrumentation.count_components = 1``). Blocks counted in nested \
+      phases (e.g. technology blocks of a node block) are not traversed again.
+
+    Records are collected in ``self.records`` and passed to all callbacks (see :func:`~add_callback`) at the end of \
+    each phase, e.g. to log them or to alert on regressions. Only the last \
+    ``m_config.instrumentation.max_records`` records are kept (e.g. for rolling horizons or Pareto fronts), all \
+    records are removed with :func:`~reset`. With ``m_config.instrumentation.enabled = 0``, phases are timed, but \
+    not recorded.
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.records = []
+        self._callbacks = []
+        self._stack = []
+        self._nr_phases = 0
+
+    @contextmanager
+    def phase(self, name, block=None, **info):
+        """
+        Context manager recording a phase
+
+        :param str name: name of the phase
+        :param block: (optional) pyomo block constructed in the phase, of which components are counted
+        :param info: further information on the phase
+        :return: record of the phase (complete after the phase)
+        """
+        record = self.start_phase(name, **info)
+        try:
+            yield record
+        finally:
+            self.end_phase(record, block)
+
+    def start_phase(self, name, **info):
+        """
+        Starts recording a phase (see :func:`~phase`)
+
+        :param str name: name of the phase
+        :param info: further information on the phase
+        :return: record of the phase, to be passed to :func:`~end_phase`
+        """
+        record = {'name': name,
+                  'path': '/'.join([entry['record']['name'] for entry in self._stack] + [name]),
+                  'info': info,
+                  'index': self._nr_phases}
+        self._nr_phases += 1
+        entry = {'record': record,
+                 'wall_time': time.perf_counter(),
+                 'cpu_time': time.process_time(),
+                 'memory': None,
+                 'peak': 0,
+                 'nested_allocated': 0,
+                 'counted': {},
+                 'rss': _get_rss() if m_config.instrumentation.enabled else None}
+        if m_config.instrumentation.enabled and m_config.instrumentation.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._update_peaks()
+            entry['memory'] = tracemalloc.get_traced_memory()[0]
+        self._stack.append(entry)
+        return record
+
+    def end_phase(self, record, block=None):
+        """
+        Ends recording a phase and passes its record to all callbacks
+
+        :param dict record: record returned by :func:`~start_phase`
+        :param block: (optional) pyomo block constructed in the phase, of which components are counted
+        :return: record of the phase
+        """
+        # Phases left open (e.g. by exceptions) are ended with the enclosing phase
+        entries = [entry for entry in self._stack if entry['record'] is record]
+        if not entries:
+            return record
+        entry = entries[0]
+        del self._stack[self._stack.index(entry):]
+
+        record['end_index'] = self._nr_phases - 1
+        record['wall_time'] = time.perf_counter() - entry['wall_time']
+        record['cpu_time'] = time.process_time() - entry['cpu_time']
+        if not m_config.instrumentation.enabled:
+            return record
+
+        if entry['memory'] is not None and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(entry['peak'], peak)
+            self._update_peaks()
+            record['memory'] = (peak - entry['memory']) / 1e6
+            allocated = current - entry['memory']
+            record['memory_allocated'] = allocated / 1e6
+            record['memory_self'] = (allocated - entry['nested_allocated']) / 1e6
+            if self._stack:
+                self._stack[-1]['nested_allocated'] += allocated
+        elif resource is not None:
+            # Kilobytes on Linux, bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            record['memory'] = max_rss / 1e6 if sys.platform == 'darwin' else max_rss / 1e3
+        else:
+            record['memory'] = None
+        rss = _get_rss()
+        if rss is not None and entry['rss'] is not None:
+            record['rss_delta'] = (rss - entry['rss']) / 1e6
+
+        if m_config.instrumentation.count_components:
+            if block is not None:
+                record.update(count_components(block, entry['counted']))
+            if self._stack:
+                # Blocks counted in this phase are not traversed again by enclosing phases
+                self._stack[-1]['counted'].update(entry['counted'])
+
+        self.records.append(record)
+        if len(self.records) > m_config.instrumentation.max_records:
+            del self.records[:len(self.records) - m_config.instrumentation.max_records]
+        for callback in self._callbacks:
+            callback(record)
+        return record
+
+    def add_callback(self, callback):
+        """
+        Adds a callback, which is called with the record of each phase at its end
+
+        :param callback: function taking the record (dict) as argument
+        """
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        """
+        Removes a callback
+
+        :param callback: function added with :func:`~add_callback`
+        """
+        self._callbacks.remove(callback)
+
+    def get_report(self):
+        """
+        Returns a report of all recorded phases
+
+        :return: dict containing the records of all phases ('phases') and the number of records, wall time and CPU \
+        time summed for each path ('totals')
+        """
+        totals = {}
+        for record in self.records:
+            if record['path'] not in totals:
+                totals[record['path']] = {'count': 0, 'wall_time': 0, 'cpu_time': 0}
+            totals[record['path']]['count'] += 1
+            totals[record['path']]['wall_time'] += record['wall_time']
+            totals[record['path']]['cpu_time'] += record['cpu_time']
+        return {'phases': [dict(record) for record in self.records],
+                'totals': totals}
+
+    def get_memory_report(self, names=('network', 'node', 'technology'), phase=None):
+        """
+        Returns the memory and size of each constructed block (with ``m_config.instrumentation.trace_memory = 1``, \
+        allocations are attributed to the blocks, otherwise only the change of resident memory is available)
+
+        :param tuple names: names of the phases constructing blocks
+        :param dict phase: (optional) record of a phase, only blocks constructed within this phase are reported (e.g. \
+        of the last constructed model). Otherwise, all recorded blocks are reported.
+        :return: data frame with one row per block
+        """
+        columns = ['memory_allocated', 'memory_self', 'rss_delta', 'variables', 'constraints', 'binaries']
+        rows = []
+        for record in self.records:
+            if phase is not None and not phase['index'] < record['index'] <= phase['end_index']:
+                continue
+            if record['name'] in names:
+                row = {'block': record['name']}
+                row.update(record['info'])
+                row.update({column: record.get(column) for column in columns})
+                rows.append(row)
+        return pd.DataFrame(rows)
+
+    def print_memory_report(self, names=('network', 'node', 'technology'), phase=None):
+        """
+        Prints the memory and size of each constructed block (see :func:`~get_memory_report`)
+
+        :param tuple names: names of the phases constructing blocks
+        :param dict phase: (optional) record of a phase, only blocks constructed within this phase are printed
+        """
+        with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.float_format',
+                               '{:.3f}'.format):
+            print(self.get_memory_report(names, phase).to_string())
+
+    def write_report(self, path):
+        """
+        Writes the report (see :func:`~get_report`) to a JSON file
+
+        :param str path: path of the JSON file
+        """
+        with open(path, 'w') as file:
+            json.dump(self.get_report(), file, indent=2, default=str)
+
+    def reset(self):
+        """
+        Removes all records (callbacks are kept)
+        """
+        self.records = []
+
+    def _update_peaks(self):
+        """
+        Passes the peak of traced memory to all open phases and resets it (such that nested phases can be traced)
+        """
+        peak = tracemalloc.get_traced_memory()[1]
+        for entry in self._stack:
+            entry['peak'] = max(entry['peak'], peak)
+        tracemalloc.reset_peak()
+
+
+def _get_rss():
+    """
+    Returns the resident memory of the process
+
+    :return: resident memory in bytes or None, if not available
+    """
+    try:
+        with open(STATM_PATH) as file:
+            return int(file.read().split()[1]) * resource.getpagesize()
+    except (OSError, AttributeError):
+        return None
+
+
+def get_instrumentation():
+    """
+    Returns the instrumentation of the process
+
+    :return: instance of :class:`~Instrumentation`
+    """
+    global _instrumentation
+    if _instrumentation is None:
+        _instrumentation = Instrumentation()
+    return _instrumentation
+
+
+def phase(name, block=None, **info):
+    """
+    Records a phase with the instrumentation of the process (see :func:`~Instrumentation.phase`)
+
+    :param str name: name of the phase
+    :param block: (optional) pyomo block constructed in the phase, of which components are counted
+    :param info: further information on the phase
+    :return: context manager yielding the record of the phase
+    """
+    return get_instrumentation().phase(name, block, **info)
+
+
+def phase_rule(name, rule, **info):
+    """
+    Returns a block rule recording the construction of each block as phase (see :func:`~phase`). The index of the \
+    block is added to the info of the phase with the name of the phase as key (e.g. ``network=...``).
+
+    The rule is kept with the phase, such that the :class:`~RuleProfiler` profiles the rule itself rather than the \
+    recording of the phase.
+
+    :param str name: name of the phase
+    :param rule: rule constructing a block, called with the block and its index
+    :param info: further information on the phase
+    :return: block rule
+    """
+    def init_phase(block, index):
+        with phase(name, block, **info, **{name: index}):
+            return rule(block, index)
+
+    init_phase._phase_rule = (name, rule, info)
+    return init_phase
+
+
+def count_components(block, counted=None):
+    """
+    Counts the variables, active constraints and binary variables of a pyomo block (including sub-blocks)
+
+    :param block: pyomo block (or indexed block)
+    :param dict counted: (optional) counts of blocks, which are not traversed again. Counts of all blocks traversed \
+    are added to it.
+    :return: dict with the number of variables, constraints and binaries
+    """
+    if counted is None:
+        counted = {}
+    counts = {'variables': 0, 'constraints': 0, 'binaries': 0}
+    block_data = block.values() if block.is_indexed() else [block]
+    for data in block_data:
+        data_counts = _count_block_data(data, counted)
+        counts['variables'] += data_counts['variables']
+        counts['binaries'] += data_counts['binaries']
+        if data.active:
+            counts['constraints'] += data_counts['constraints']
+    return counts
+
+
+def _count_block_data(data, counted):
+    """
+    Counts the variables, active constraints (if the block is active) and binary variables of a block and its \
+    sub-blocks, using and updating the counts of blocks already traversed
+
+    :param data: pyomo block data
+    :param dict counted: counts of blocks by their id (the block is kept with its counts, such that ids stay unique)
+    :return: dict with the number of variables, constraints and binaries
+    """
+    if id(data) in counted:
+        return counted[id(data)][1]
+    counts = {'variables': 0, 'constraints': 0, 'binaries': 0}
+    for var in data.component_data_objects(Var, descend_into=False):
+        counts['variables'] += 1
+        if var.is_binary():
+            counts['binaries'] += 1
+    for constraint in data.component_data_objects(Constraint, active=True, descend_into=False):
+        counts['constraints'] += 1
+    for sub_block in data.component_data_objects(Block, descend_into=False):
+        sub_counts = _count_block_data(sub_block, counted)
+        counts['variables'] += sub_counts['variables']
+        counts['binaries'] += sub_counts['binaries']
+        if sub_block.active:
+            counts['constraints'] += sub_counts['constraints']
+    counted[id(data)] = (data, counts)
+    return counts
+
+
+class RuleProfiler:
+    """
+    Profiles the rules called when constructing pyomo components (e.g. ``init_energybalance`` or \
+    ``init_storage_level``).
+
+    While enabled, the constructors of the components in ``PROFILED_COMPONENTS`` are patched, such that each rule \
+    passed to them is wrapped. For each rule, the number of calls, the total time (including the construction of \
+    components within the rule, e.g. for block rules) and the self time (excluding these) are accumulated. Rules \
+    are identified by the module they are defined in, the name of the component and the name of the rule, i.e. \
+    rules of the same component in different blocks (e.g. of each technology) are accumulated. For rules recording \
+    a phase (see :func:`~phase_rule`), the rule within is profiled.
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.stats = {}
+        self._stack = []
+        self._original_inits = {}
+
+    def enable(self):
+        """
+        Patches the constructors of profiled components
+        """
+        for component_type in PROFILED_COMPONENTS:
+            if component_type not in self._original_inits:
+                self._original_inits[component_type] = component_type.__init__
+                component_type.__init__ = self._get_profiled_init(component_type)
+
+    def disable(self):
+        """
+        Restores the constructors of profiled components
+        """
+        for component_type in self._original_inits:
+            component_type.__init__ = self._original_inits[component_type]
+        self._original_inits = {}
+
+    @contextmanager
+    def profile(self):
+        """
+        Context manager profiling all rules called within
+        """
+        self.enable()
+        try:
+            yield self
+        finally:
+            self.disable()
+
+    def get_table(self, by=('module', 'component', 'rule')):
+        """
+        Returns the profile of all rules, ranked by self time
+
+        :param tuple by: columns to group by, any of 'module', 'component' and 'rule'
+        :return: data frame with the number of calls, the total and self time (s) and the self time per call (µs) \
+        for each group
+        """
+        table = pd.DataFrame([list(key) + stats for key, stats in self.stats.items()],
+                             columns=['module', 'component', 'rule', 'calls', 'total_time', 'self_time'])
+        table = table.groupby(list(by), as_index=False)[['calls', 'total_time', 'self_time']].sum()
+        table['self_time_per_call'] = table['self_time'] / table['calls'] * 1e6
+        return table.sort_values('self_time', ascending=False, ignore_index=True)
+
+    def print_table(self, by=('module', 'component', 'rule'), top=20):
+        """
+        Prints the profile of the rules with the highest self time
+
+        :param tuple by: columns to group by, any of 'module', 'component' and 'rule'
+        :param int top: number of rules to print
+        """
+        table = self.get_table(by)
+        total_time = table['self_time'].sum()
+        table['share'] = table['self_time'] / total_time * 100 if total_time > 0 else 0
+        with pd.option_context('display.max_colwidth', 60, 'display.width', 200,
+                               'display.float_format', '{:.4f}'.format):
+            print(table.head(top).to_string())
+
+    def reset(self):
+        """
+        Removes all profiled calls
+        """
+        self.stats = {}
+
+    def _get_profiled_init(self, component_type):
+        """
+        Returns the constructor of a component wrapping all rules passed to it
+
+        :param component_type: pyomo component class
+        :return: patched constructor
+        """
+        original_init = self._original_inits[component_type]
+        arguments = PROFILED_COMPONENTS[component_type]
+        profiler = self
+
+        def init(component, *args, **kwargs):
+            for argument in arguments:
+                if argument in kwargs:
+                    kwargs[argument] = profiler._wrap_rule(kwargs[argument], component)
+            original_init(component, *args, **kwargs)
+
+        return init
+
+    def _wrap_rule(self, rule, component):
+        """
+        Wraps a rule, such that its calls are profiled
+
+        :param rule: rule passed to a component (other arguments, e.g. dicts, are returned unchanged)
+        :param component: component the rule is passed to
+        :return: wrapped rule
+        """
+        if type(rule) is not types.FunctionType or inspect.isgeneratorfunction(rule) or \
+                hasattr(rule, '_profiled_rule'):
+            return rule
+        if hasattr(rule, '_phase_rule'):
+            name, block_rule, info = rule._phase_rule
+            profiled_rule = phase_rule(name, self._wrap_rule(block_rule, component), **info)
+            profiled_rule._profiled_rule = rule
+            return profiled_rule
+        stats = self.stats
+        stack = self._stack
+
+        def profiled_rule(*args, **kwargs):
+            key = (rule.__module__, component.local_name, rule.__name__)
+            if key not in stats:
+                stats[key] = [0, 0, 0]
+            stack.append(0)
+            start = time.perf_counter()
+            try:
+                return rule(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                nested_duration = stack.pop()
+                if stack:
+                    stack[-1] += duration
+                stats[key][0] += 1
+                stats[key][1] += duration
+                stats[key][2] += duration - nested_duration
+
+        # Pyomo calls rules depending on their signature (e.g. with or without index)
+        profiled_rule.__signature__ = inspect.signature(rule)
+        profiled_rule._profiled_rule = rule
+        return profiled_rule
+
+
+@contextmanager
+def profile_rules(title, record=None):
+    """
+    Profiles the rules called within, if ``m_config.instrumentation.profile_rules = 1`` (see \
+    :class:`~RuleProfiler`), and prints the ``m_config.instrumentation.profile_rules_top`` rules with the highest \
+    self time
+
+    :param str title: title of the printed profile
+    :param dict record: (optional) record of a phase (see :func:`~Instrumentation.phase`), to which the profile is \
+    added as 'rules'
+    :return: context manager yielding the profiler or None, if rules are not profiled
+    """
+    if not m_config.instrumentation.profile_rules:
+        yield None
+        return
+    profiler = RuleProfiler()
+    with profiler.profile():
+        yield profiler
+    print('Profile of rules (' + title + '):')
+    profiler.print_table(top=m_config.instrumentation.profile_rules_top)
+    if record is not None:
+        record['rules'] = profiler.get_table().to_dict('records')
@@ -1,8 +1,12 @@
 from .construct_technology import add_technologies
 from .construct_networks import add_networks
-from .construct_balances import add_energybalance, add_emissionbalance, add_system_costs
+from .construct_balances import BALANCE_CONSTRAINTS, add_energybalance, add_emissionbalance, add_system_costs
 from .construct_nodes import add_nodes
+from .construct_sparse import SparseModel, add_networks_sparse, add_nodes_sparse, add_technology_sparse, \
+    add_energybalance_sparse, add_emissionbalance_sparse, add_system_costs_sparse
 from .generic_technology_constraints import *
 from .network_performance_fitting import *
-from .technology_performance_fitting import fit_tec_performance
+from .technology_performance_fitting import fit_tec_performance, perform_fitting_PV_batch, optimize_PV_orientation, \
+    screen_PV_orientations, perform_fitting_WT_batch, screen_wind_turbines
+from .fitting_resources import ResourceRegistry, get_resource_registry
 from .utilities import *
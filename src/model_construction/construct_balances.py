@@ -1,5 +1,8 @@
 from pyomo.environ import *
-from pyomo.environ import units as u
+
+# Constraints that are replaced when the balances are constructed again
+BALANCE_CONSTRAINTS = ['const_energybalance', 'const_emissions_pos', 'const_emissions_neg', 'const_emissions_net',
+                       'const_node_cost', 'const_netw_cost', 'const_cost']
 
 def add_energybalance(model):
     # TODO: formulate energybalance to include global balance
@@ -17,7 +20,9 @@ def add_energybalance(model):
     # Delete previously initialized constraints
     if model.find_component('const_energybalance'):
         model.del_component(model.const_energybalance)
-        model.del_component(model.const_energybalance_index)
+        # Implicit index set (only created by older pyomo versions)
+        if model.find_component('const_energybalance_index'):
+            model.del_component(model.const_energybalance_index)
 
     def init_energybalance(const, t, car, node):  # energybalance at each node
         node_block = model.node_blocks[node]
@@ -59,9 +64,9 @@ def add_emissionbalance(model):
         return sum(
             sum(model.node_blocks[node].tech_blocks_active[tec].var_tec_emissions_pos
                     for tec in model.node_blocks[node].set_tecsAtNode) + \
-            model.node_blocks[node].var_car_emissions_pos + \
-            sum(model.network_block[netw].var_netw_emissions_pos for netw in model.set_networks)
-            for node in model.set_nodes) == \
+            model.node_blocks[node].var_car_emissions_pos
+            for node in model.set_nodes) + \
+            sum(model.network_block[netw].var_netw_emissions_pos for netw in model.set_networks) == \
                 model.var_emissions_pos
     model.const_emissions_pos = Constraint(rule=init_emissions_pos)
 
@@ -85,7 +90,8 @@ def add_system_costs(model):
     """
     Calculates total system costs in three steps.
 
-    - Calculates cost at all nodes as the sum of technology costs, import costs and export revenues
+    - Calculates cost at all nodes as the sum of technology costs, import costs and export revenues. Variable costs \
+      are weighted with the weight of each time step.
     - Calculates cost of all networks
     - Adds up cost of networks and node costs
     """
@@ -101,13 +107,14 @@ def add_system_costs(model):
                 sum(model.node_blocks[node].tech_blocks_active[tec].var_CAPEX
                        for tec in model.node_blocks[node].set_tecsAtNode) + \
                    sum(sum(model.node_blocks[node].tech_blocks_active[tec].var_OPEX_variable[t]
-                           for tec in model.node_blocks[node].set_tecsAtNode) for t in model.set_t) + \
+                           for tec in model.node_blocks[node].set_tecsAtNode) * model.para_timestep_weight[t]
+                       for t in model.set_t) + \
                    sum(model.node_blocks[node].tech_blocks_active[tec].var_OPEX_fixed
                        for tec in model.node_blocks[node].set_tecsAtNode) + \
                    sum(sum(model.node_blocks[node].var_import_flow[t, car] * model.node_blocks[node].para_import_price[t, car]
-                           for car in model.set_carriers) for t in model.set_t) - \
+                           for car in model.set_carriers) * model.para_timestep_weight[t] for t in model.set_t) - \
                    sum(sum(model.node_blocks[node].var_export_flow[t, car] * model.node_blocks[node].para_export_price[t, car]
-                           for car in model.set_carriers) for t in model.set_t) \
+                           for car in model.set_carriers) * model.para_timestep_weight[t] for t in model.set_t) \
                 for node in model.set_nodes) == \
                model.var_node_cost
     model.const_node_cost = Constraint(rule=init_node_cost)
@@ -1,8 +1,8 @@
 from pyomo.environ import *
-from pyomo.environ import units as u
 from pyomo.gdp import *
 import src.config_model as m_config
 import src.model_construction as mc
+from src.instrumentation import phase_rule
 
 def add_networks(model, data):
     r"""
@@ -151,13 +151,14 @@ def add_networks(model, data):
 
         # region Get options from data
         netw_data = data.network_data[netw]
-        connection = netw_data['connection'][:]
+        connection = netw_data['connection'].copy()
         distance = netw_data['distance']
         # endregion
 
         # region PARAMETERS
         # min/max size
-        unit_size = u.MW
+        units = mc.get_units()
+        unit_size = units.MW
         b_netw.para_rated_capacity = Param(domain=NonNegativeReals, initialize=1, units=unit_size)
 
         b_netw.para_size_min = Param(domain=NonNegativeReals, initialize=netw_data['NetworkPerf']['size_min'],
@@ -167,29 +168,29 @@ def add_networks(model, data):
 
         b_netw.para_min_transport =  Param(domain=NonNegativeReals,
                                            initialize= netw_data['NetworkPerf']['min_transport'],
-                                           units=u.dimensionless)
+                                           units=units.dimensionless)
 
         # CAPEX
         b_netw.para_CAPEX_gamma1 = Param(domain=Reals, initialize=netw_data['Economics']['gamma1'],
-                                         units=u.EUR / unit_size)
+                                         units=units.EUR_per_MW)
         b_netw.para_CAPEX_gamma2 = Param(domain=Reals, initialize=netw_data['Economics']['gamma2'],
-                                         units=u.EUR)
+                                         units=units.EUR)
 
         # OPEX
         b_netw.para_OPEX_variable = Param(domain=Reals, initialize=netw_data['Economics']['OPEX_variable'],
-                                          units=u.EUR / u.MWh)
+                                          units=units.EUR_per_MWh)
         b_netw.para_OPEX_fixed = Param(domain=Reals, initialize=netw_data['Economics']['OPEX_fixed'],
-                                       units=u.EUR / u.EUR)
+                                       units=units.dimensionless)
 
         # Network losses (in % per km and flow)
         b_netw.para_loss_factor = Param(domain=Reals, initialize=netw_data['NetworkPerf']['loss'],
-                                       units=u.dimensionless)
+                                       units=units.dimensionless)
 
         # Network emissions
         b_netw.para_loss2emissions = Param(domain=NonNegativeReals, initialize=netw_data['NetworkPerf']['loss2emissions'],
-                                     units=u.t/u.dimensionless)
+                                     units=units.t)
         b_netw.para_emissionfactor = Param(domain=NonNegativeReals, initialize=netw_data['NetworkPerf']['emissionfactor'],
-                                           units=u.t / u.MWh)
+                                           units=units.t_per_MWh)
 
         # endregion
 
@@ -235,13 +236,13 @@ def add_networks(model, data):
                                          domain=NonNegativeReals)
 
         # Capex/Opex
-        b_netw.var_CAPEX = Var(units=u.EUR)
-        b_netw.var_OPEX_variable = Var(units=u.EUR)
-        b_netw.var_OPEX_fixed = Var(units=u.EUR)
-        b_netw.var_cost = Var(units=u.EUR)
+        b_netw.var_CAPEX = Var(units=units.EUR)
+        b_netw.var_OPEX_variable = Var(units=units.EUR)
+        b_netw.var_OPEX_fixed = Var(units=units.EUR)
+        b_netw.var_cost = Var(units=units.EUR)
 
         # Emissions
-        b_netw.var_netw_emissions_pos = Var(units=u.t)
+        b_netw.var_netw_emissions_pos = Var(units=units.t)
         # endregion
 
         # region Establish each arc as a block with
@@ -264,8 +265,8 @@ def add_networks(model, data):
                                    bounds=(b_netw.para_size_min * b_netw.para_rated_capacity,
                                            b_netw.para_size_max * b_netw.para_rated_capacity))
 
-            b_arc.var_CAPEX = Var(units=u.EUR)
-            b_arc.var_OPEX_variable = Var(units=u.EUR)
+            b_arc.var_CAPEX = Var(units=units.EUR)
+            b_arc.var_OPEX_variable = Var(units=units.EUR)
 
             # Flow
             def init_flowlosses(const, t):
@@ -290,7 +291,8 @@ def add_networks(model, data):
 
             # OPEX
             def init_OPEX_variable(const):
-                return b_arc.var_OPEX_variable == sum(b_arc.var_flow[t] for t in model.set_t) * \
+                return b_arc.var_OPEX_variable == sum(b_arc.var_flow[t] * model.para_timestep_weight[t]
+                                                      for t in model.set_t) * \
                        b_netw.para_OPEX_variable
             b_arc.const_OPEX_variable = Constraint(rule=init_OPEX_variable)
 
@@ -381,9 +383,11 @@ def add_networks(model, data):
         # Network emissions as sum over inflow
         #TODO: add loss to emissions
         def init_netw_emissions(const):
-            return sum(sum(b_netw.arc_block[arc].var_flow[t] for t in model.set_t) for arc in b_netw.set_arcs) * \
+            return sum(sum(b_netw.arc_block[arc].var_flow[t] * model.para_timestep_weight[t]
+                           for t in model.set_t) for arc in b_netw.set_arcs) * \
                    b_netw.para_emissionfactor + \
-                   sum(sum(b_netw.arc_block[arc].var_losses[t] for t in model.set_t) for arc in b_netw.set_arcs) * \
+                   sum(sum(b_netw.arc_block[arc].var_losses[t] * model.para_timestep_weight[t]
+                           for t in model.set_t) for arc in b_netw.set_arcs) * \
                    b_netw.para_loss2emissions \
                    == b_netw.var_netw_emissions_pos
         b_netw.const_netw_emissions = Constraint(rule=init_netw_emissions)
@@ -399,5 +403,7 @@ def add_networks(model, data):
             mc.perform_disjunct_relaxation(b_netw)
 
         return b_netw
-    model.network_block = Block(model.set_networks, rule=init_network)
+
+    # Records build time, memory and size of each network block
+    model.network_block = Block(model.set_networks, rule=phase_rule('network', init_network))
     return model
\ No newline at end of file
@@ -1,6 +1,8 @@
 from pyomo.environ import *
-from pyomo.environ import units as u
+import src.config_model as m_config
+from src.instrumentation import phase_rule
 from src.model_construction.construct_technology import add_technologies
+from src.model_construction.utilities import time_series_to_array, array_to_dict, get_units
 
 def add_nodes(model, data):
     r"""
@@ -40,9 +42,9 @@ def add_nodes(model, data):
         C_n = \
         \sum_{tec \in Tec_n} CAPEX_{tec} + \
         \sum_{tec \in Tec_n} OPEXfix_{tec} + \
-        \sum_{tec \in Tec_n} \sum_{t \in T} OPEXvar_{t, tec} + \\
-        \sum_{car \in Car} \sum_{t \in T} import_{t, car} pImport_{t, car} - \
-        \sum_{car \in Car} \sum_{t \in T} export_{t, car} pExport_{t, car}
+        \sum_{tec \in Tec_n} \sum_{t \in T} w_t OPEXvar_{t, tec} + \\
+        \sum_{car \in Car} \sum_{t \in T} w_t import_{t, car} pImport_{t, car} - \
+        \sum_{car \in Car} \sum_{t \in T} w_t export_{t, car} pExport_{t, car}
 
     **Block declarations:**
 
@@ -58,74 +60,68 @@ def add_nodes(model, data):
         b_node.set_tecsAtNode = Set(initialize=model.set_technologies[nodename])
 
         # PARAMETERS
+        units = get_units()
+
+        # Convert the time series of the node to arrays once, to avoid looking up each single value with pandas
+        node_data = data.node_data[nodename]
+        para_data = {}
+        for series in ['demand', 'import_prices', 'export_prices', 'import_limit', 'export_limit',
+                       'import_emissionfactors', 'export_emissionfactors']:
+            para_data[series] = array_to_dict(time_series_to_array(node_data[series], model.set_carriers),
+                                              model.set_t, model.set_carriers)
+
         # Demand
-        # TODO: check if or for
-        def init_demand(para, t, car):
-            if nodename in data.node_data:
-                return data.node_data[nodename]['demand'][car][t - 1]
-        b_node.para_demand = Param(model.set_t, model.set_carriers, rule=init_demand, units=u.MW)
+        b_node.para_demand = Param(model.set_t, model.set_carriers, initialize=para_data['demand'],
+                                   units=units.MW)
 
         # Import Prices
-        def init_import_price(para, t, car):
-            if nodename in data.node_data:
-                return data.node_data[nodename]['import_prices'][car][t - 1]
-        b_node.para_import_price = Param(model.set_t, model.set_carriers, rule=init_import_price, units=u.EUR / u.MWh)
+        b_node.para_import_price = Param(model.set_t, model.set_carriers, initialize=para_data['import_prices'],
+                                         units=units.EUR_per_MWh)
 
         # Export Prices
-        def init_export_price_init(para, t, car):
-            if nodename in data.node_data:
-                return data.node_data[nodename]['export_prices'][car][t - 1]
-        b_node.para_export_price = Param(model.set_t, model.set_carriers, rule=init_export_price_init, units=u.EUR / u.MWh)
+        b_node.para_export_price = Param(model.set_t, model.set_carriers, initialize=para_data['export_prices'],
+                                         units=units.EUR_per_MWh)
 
         # Import Limit
-        def init_import_limit(para, t, car):
-            if nodename in data.node_data:
-                return data.node_data[nodename]['import_limit'][car][t - 1]
-        b_node.para_import_limit = Param(model.set_t, model.set_carriers, rule=init_import_limit, units=u.MW)
+        b_node.para_import_limit = Param(model.set_t, model.set_carriers, initialize=para_data['import_limit'],
+                                         units=units.MW)
 
         # Export Limit
-        def init_export_limit(para, t, car):
-            if nodename in data.node_data:
-                return data.node_data[nodename]['export_limit'][car][t - 1]
-        b_node.para_export_limit = Param(model.set_t, model.set_carriers, rule=init_export_limit, units=u.MW)
+        b_node.para_export_limit = Param(model.set_t, model.set_carriers, initialize=para_data['export_limit'],
+                                         units=units.MW)
 
         # Emission Factor
-        def init_import_emissionfactor(para, t, car):
-            if nodename in data.node_data:
-                return data.node_data[nodename]['import_emissionfactors'][car][t - 1]
         b_node.para_import_emissionfactors = Param(model.set_t, model.set_carriers,
-                                                   rule=init_import_emissionfactor, units=u.t / u.MWh)
-
-        def init_export_emissionfactor(para, t, car):
-            if nodename in data.node_data:
-                return data.node_data[nodename]['export_emissionfactors'][car][t - 1]
+                                                   initialize=para_data['import_emissionfactors'],
+                                                   units=units.t_per_MWh)
         b_node.para_export_emissionfactors = Param(model.set_t, model.set_carriers,
-                                                   rule=init_export_emissionfactor, units=u.t / u.MWh)
+                                                   initialize=para_data['export_emissionfactors'],
+                                                   units=units.t_per_MWh)
 
         # DECISION VARIABLES
         # Interaction with network/system boundaries
         def init_import_bounds(var, t, car):
             return (0, b_node.para_import_limit[t, car])
-        b_node.var_import_flow = Var(model.set_t, model.set_carriers, bounds=init_import_bounds, units=u.MW)
+        b_node.var_import_flow = Var(model.set_t, model.set_carriers, bounds=init_import_bounds, units=units.MW)
 
         def init_export_bounds(var, t, car):
             return (0, b_node.para_export_limit[t, car])
-        b_node.var_export_flow = Var(model.set_t, model.set_carriers, bounds=init_export_bounds, units=u.MW)
+        b_node.var_export_flow = Var(model.set_t, model.set_carriers, bounds=init_export_bounds, units=units.MW)
 
-        b_node.var_import_emissions_pos = Var(model.set_t, model.set_carriers, units=u.MW)
-        b_node.var_import_emissions_neg = Var(model.set_t, model.set_carriers, units=u.MW)
-        b_node.var_export_emissions_pos = Var(model.set_t, model.set_carriers, units=u.MW)
-        b_node.var_export_emissions_neg = Var(model.set_t, model.set_carriers, units=u.MW)
-        b_node.var_car_emissions_pos = Var(within=NonNegativeReals, units=u.t)
-        b_node.var_car_emissions_neg = Var(within=NonNegativeReals, units=u.t)
+        b_node.var_import_emissions_pos = Var(model.set_t, model.set_carriers, units=units.MW)
+        b_node.var_import_emissions_neg = Var(model.set_t, model.set_carriers, units=units.MW)
+        b_node.var_export_emissions_pos = Var(model.set_t, model.set_carriers, units=units.MW)
+        b_node.var_export_emissions_neg = Var(model.set_t, model.set_carriers, units=units.MW)
+        b_node.var_car_emissions_pos = Var(within=NonNegativeReals, units=units.t)
+        b_node.var_car_emissions_neg = Var(within=NonNegativeReals, units=units.t)
 
-        b_node.var_netw_inflow = Var(model.set_t, model.set_carriers, units=u.MW)
-        b_node.var_netw_outflow = Var(model.set_t, model.set_carriers, units=u.MW)
-        b_node.var_netw_consumption = Var(model.set_t, model.set_carriers, units=u.MW)
+        b_node.var_netw_inflow = Var(model.set_t, model.set_carriers, units=units.MW)
+        b_node.var_netw_outflow = Var(model.set_t, model.set_carriers, units=units.MW)
+        b_node.var_netw_consumption = Var(model.set_t, model.set_carriers, units=units.MW)
 
         #Emission constraints
         def init_import_emissions_pos(const, t, car):
-            if data.node_data[nodename]['import_emissionfactors'][car][t - 1] >= 0:
+            if para_data['import_emissionfactors'][t, car] >= 0:
                 return b_node.var_import_flow[t, car] * b_node.para_import_emissionfactors[t, car] \
                     == b_node.var_import_emissions_pos[t, car]
             else:
@@ -134,7 +130,7 @@ def add_nodes(model, data):
                                                        rule=init_import_emissions_pos)
 
         def init_export_emissions_pos(const, t, car):
-            if data.node_data[nodename]['export_emissionfactors'][car][t - 1] >= 0:
+            if para_data['export_emissionfactors'][t, car] >= 0:
                 return b_node.var_export_flow[t, car] * b_node.para_export_emissionfactors[t, car] \
                     == b_node.var_export_emissions_pos[t, car]
             else:
@@ -142,7 +138,7 @@ def add_nodes(model, data):
         b_node.const_export_emissions_pos = Constraint(model.set_t, model.set_carriers, rule=init_export_emissions_pos)
 
         def init_import_emissions_neg(const, t, car):
-            if data.node_data[nodename]['import_emissionfactors'][car][t - 1] < 0:
+            if para_data['import_emissionfactors'][t, car] < 0:
                 return b_node.var_import_flow[t, car] * (-b_node.para_import_emissionfactors[t, car]) \
                     == b_node.var_import_emissions_neg[t, car]
             else:
@@ -151,7 +147,7 @@ def add_nodes(model, data):
                                                        rule=init_import_emissions_neg)
 
         def init_export_emissions_neg(const, t, car):
-            if data.node_data[nodename]['export_emissionfactors'][car][t - 1] < 0:
+            if para_data['export_emissionfactors'][t, car] < 0:
                 return b_node.var_export_flow[t, car] * (-b_node.para_export_emissionfactors[t, car]) \
                     == b_node.var_export_emissions_neg[t, car]
             else:
@@ -161,14 +157,16 @@ def add_nodes(model, data):
 
         def init_car_emissions_pos(const):
             return sum(
-                sum(b_node.var_import_emissions_pos[t, car] + b_node.var_export_emissions_pos[t, car]
+                sum((b_node.var_import_emissions_pos[t, car] + b_node.var_export_emissions_pos[t, car]) *
+                    model.para_timestep_weight[t]
                     for t in model.set_t) for car in model.set_carriers) \
                    == b_node.var_car_emissions_pos
         b_node.const_car_emissions_pos = Constraint(rule=init_car_emissions_pos)
 
         def init_car_emissions_neg(const):
             return sum(
-                sum(b_node.var_import_emissions_neg[t, car] + b_node.var_export_emissions_neg[t, car]
+                sum((b_node.var_import_emissions_neg[t, car] + b_node.var_export_emissions_neg[t, car]) *
+                    model.para_timestep_weight[t]
                     for t in model.set_t) for car in model.set_carriers) == \
                    b_node.var_car_emissions_neg
         b_node.const_car_emissions_neg = Constraint(rule=init_car_emissions_neg)
@@ -195,7 +193,12 @@ def add_nodes(model, data):
         # Add technologies as blocks
         b_node = add_technologies(nodename, b_node.set_tecsAtNode, model, data, b_node)
 
-    model.node_blocks = Block(model.set_nodes, rule=init_node_block)
+        # Time series are copied into the model and can be released
+        if m_config.construction.low_memory:
+            data.release_time_series(nodename)
+
+    # Records build time, memory and size of each node block
+    model.node_blocks = Block(model.set_nodes, rule=phase_rule('node', init_node_block))
 
     return model
 
@@ -0,0 +1,766 @@
+import numbers
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import milp, Bounds, LinearConstraint
+
+
+class SparseModel:
+    r"""
+    Container for a (mixed-integer) linear program in standard form.
+
+    The model is stored as
+
+    .. math::
+        \min c^T x \quad s.t. \quad b_l \leq A x \leq b_u, \quad l \leq x \leq u, \quad x_i \in \mathbb{Z}, i \in I
+
+    Variables and constraints are added as whole blocks (e.g. one block for the output of a technology over all time \
+    steps). Each block is returned as an array of column (variable) or row (constraint) indices, such that the \
+    coefficients of the constraint matrix can be written with numpy operations instead of one python call per index.
+
+    The sets of the model correspond to the sets of :class:`~src.energyhub.EnergyHub`. Components are stored in \
+    ``network_blocks`` and ``node_blocks`` with the same naming as in the pyomo model.
+    """
+    def __init__(self, topology):
+        """
+        Constructor
+
+        :param dict topology: topology of the DataHandle used to construct the model
+        """
+        # Sets
+        self.set_nodes = list(topology['nodes'])
+        self.set_carriers = list(topology['carriers'])
+        self.set_networks = list(topology['networks'].keys())
+        self.nr_timesteps = len(topology['timesteps'])
+
+        # Typical periods for inter-period storage linking (set for clustered data only)
+        self.period_length = None
+        self.period_sequence = None
+
+        # Components
+        self.network_blocks = {}
+        self.node_blocks = {}
+        self.global_vars = {}
+
+        # Terms collected by the components and added to the balances
+        self.balance_terms = {node: {car: [] for car in self.set_carriers} for node in self.set_nodes}
+        self.node_cost_terms = []
+        self.netw_cost_terms = []
+        self.emission_pos_terms = []
+        self.emission_neg_terms = []
+
+        # Standard form
+        self.nr_vars = 0
+        self.nr_constraints = 0
+        self.const_index = {}
+        self._var_lb = []
+        self._var_ub = []
+        self._var_integer = []
+        self._rows = []
+        self._cols = []
+        self._coefs = []
+        self._const_lb = []
+        self._const_ub = []
+
+        self.solution = None
+
+    def add_var(self, shape=(), lb=0, ub=np.inf, integer=False):
+        """
+        Adds a block of variables
+
+        :param tuple shape: shape of the variable block, e.g. (nr_timesteps, nr_carriers)
+        :param lb: lower bound(s), broadcastable to shape
+        :param ub: upper bound(s), broadcastable to shape
+        :param bool integer: if the variables are integer
+        :return: array of column indices with the given shape
+        """
+        size = int(np.prod(shape))
+        index = np.arange(self.nr_vars, self.nr_vars + size).reshape(shape)
+        self._var_lb.append(np.broadcast_to(np.asarray(lb, dtype=float), shape).ravel())
+        self._var_ub.append(np.broadcast_to(np.asarray(ub, dtype=float), shape).ravel())
+        self._var_integer.append(np.full(size, int(integer)))
+        self.nr_vars = self.nr_vars + size
+        return index
+
+    def add_constraint(self, name, shape, terms, lb=-np.inf, ub=np.inf):
+        """
+        Adds a block of constraints :math:`lb \\leq \\sum_i coef_i x_i \\leq ub`
+
+        Each term is a tuple (coefficients, column indices). Coefficients and column indices are broadcast against \
+        the row indices of the block. A term with more dimensions than the block thus sums over the additional \
+        (trailing) dimensions, e.g. a term with shape (nr_timesteps,) in a block with shape () sums over time.
+
+        :param str name: name of the constraint block
+        :param tuple shape: shape of the constraint block
+        :param list terms: list of tuples (coefficients, column indices)
+        :param lb: lower bound(s), broadcastable to shape
+        :param ub: upper bound(s), broadcastable to shape
+        :return: array of row indices with the given shape
+        """
+        size = int(np.prod(shape))
+        rows = np.arange(self.nr_constraints, self.nr_constraints + size).reshape(shape)
+        self.nr_constraints = self.nr_constraints + size
+        self._const_lb.append(np.broadcast_to(np.asarray(lb, dtype=float), shape).ravel())
+        self._const_ub.append(np.broadcast_to(np.asarray(ub, dtype=float), shape).ravel())
+        for coef, cols in terms:
+            self.add_terms(rows, coef, cols)
+        self.const_index[name] = rows
+        return rows
+
+    def add_terms(self, rows, coef, cols):
+        """
+        Adds coefficients to existing constraints
+
+        :param rows: row indices
+        :param coef: coefficients
+        :param cols: column indices
+        """
+        cols = np.asarray(cols)
+        rows = np.asarray(rows)
+        # Align rows with the leading dimensions of the columns (e.g. time), sum over trailing dimensions
+        rows = rows.reshape(rows.shape + (1,) * max(cols.ndim - rows.ndim, 0))
+        rows, cols, coef = np.broadcast_arrays(rows, cols, np.asarray(coef, dtype=float))
+        self._rows.append(rows.ravel())
+        self._cols.append(cols.ravel())
+        self._coefs.append(coef.ravel())
+
+    def get_matrix(self):
+        """
+        Assembles the constraint matrix
+
+        :return: constraint matrix as scipy.sparse.csr_matrix
+        """
+        rows = np.concatenate(self._rows) if self._rows else np.zeros(0, dtype=int)
+        cols = np.concatenate(self._cols) if self._cols else np.zeros(0, dtype=int)
+        coefs = np.concatenate(self._coefs) if self._coefs else np.zeros(0)
+        return sp.coo_matrix((coefs, (rows, cols)), shape=(self.nr_constraints, self.nr_vars)).tocsr()
+
+    def solve(self, objective, sense=1, tee=False):
+        """
+        Solves the model with HiGHS (via scipy.optimize.milp)
+
+        :param objective: list of tuples (coefficients, column indices) defining the objective function
+        :param int sense: 1 to minimize, -1 to maximize
+        :param bool tee: print solver output
+        :return: scipy.optimize.OptimizeResult
+        """
+        c = np.zeros(self.nr_vars)
+        for coef, cols in objective:
+            cols, coef = np.broadcast_arrays(np.asarray(cols), np.asarray(coef, dtype=float))
+            np.add.at(c, cols.ravel(), coef.ravel() * sense)
+
+        result = milp(c,
+                      integrality=np.concatenate(self._var_integer),
+                      bounds=Bounds(np.concatenate(self._var_lb), np.concatenate(self._var_ub)),
+                      constraints=LinearConstraint(self.get_matrix(),
+                                                   np.concatenate(self._const_lb),
+                                                   np.concatenate(self._const_ub)),
+                      options={'disp': tee})
+        if result.x is not None:
+            self.solution = result.x
+        return result
+
+    def value(self, index):
+        """
+        Returns the solution value(s) of variables
+
+        :param index: column index or array of column indices
+        :return: solution values with the shape of index
+        """
+        return self.solution[index]
+
+
+def add_networks_sparse(model, data):
+    r"""
+    Adds all networks to a :class:`SparseModel`.
+
+    The formulation is the same as in :func:`~src.model_construction.construct_networks.add_networks`. Flows, losses \
+    and the constraints linking them to the size of each arc are added as one block over all time steps. The \
+    disjunction allowing only one direction of flow for bidirectional networks is formulated with a binary \
+    variable for each time step and unique arc, and the big-m given by the maximal size of the network:
+
+    .. math::
+        flow_{nodeFrom, nodeTo} \leq M y_t, \quad flow_{nodeTo, nodeFrom} \leq M (1 - y_t)
+
+    :param SparseModel model: instance of a sparse model
+    :param DataHandle data: instance of a DataHandle
+    :return: model
+    """
+    nr_t = model.nr_timesteps
+    weights = data.get_timestep_weights()
+
+    for netw in model.set_networks:
+        netw_data = data.network_data[netw]
+        connection = netw_data['connection']
+        performance = netw_data['NetworkPerf']
+        economics = netw_data['Economics']
+        carrier = performance['carrier']
+        rated_capacity = 1
+        b_netw = {'carrier': carrier,
+                  'para_OPEX_fixed': economics['OPEX_fixed'],
+                  'arc_block': {}}
+
+        # Arcs
+        arcs = [(from_node, to_node) for from_node in connection for to_node in connection[from_node].index
+                if connection.at[from_node, to_node] == 1]
+        if performance['bidirectional'] == 1:
+            arcs_unique = []
+            for from_node, to_node in arcs:
+                if (to_node, from_node) not in arcs_unique:
+                    arcs_unique.append((from_node, to_node))
+            arc_set = arcs_unique
+        else:
+            arc_set = arcs
+        b_netw['set_arcs'] = arcs
+
+        for arc in arcs:
+            name = 'network_blocks[' + netw + '].arc_block[' + ','.join(arc) + '].'
+            b_arc = {}
+            b_arc['var_size'] = model.add_var(lb=performance['size_min'], ub=performance['size_max'])
+            b_arc['var_flow'] = model.add_var((nr_t,), lb=performance['size_min'] * rated_capacity,
+                                              ub=performance['size_max'] * rated_capacity)
+            b_arc['var_losses'] = model.add_var((nr_t,), lb=performance['size_min'] * rated_capacity,
+                                                ub=performance['size_max'] * rated_capacity)
+            b_arc['var_CAPEX'] = model.add_var(lb=-np.inf)
+            b_arc['var_OPEX_variable'] = model.add_var(lb=-np.inf)
+
+            # Flow losses
+            model.add_constraint(name + 'const_flowlosses', (nr_t,),
+                                 [(1, b_arc['var_losses']), (-performance['loss'], b_arc['var_flow'])],
+                                 lb=0, ub=0)
+            # Flow-Size Constraint
+            model.add_constraint(name + 'const_flow_size_high', (nr_t,),
+                                 [(1, b_arc['var_flow']), (-rated_capacity, b_arc['var_size'])],
+                                 ub=0)
+            model.add_constraint(name + 'const_flow_size_low', (nr_t,),
+                                 [(rated_capacity * performance['min_transport'], b_arc['var_size']),
+                                  (-1, b_arc['var_flow'])],
+                                 ub=0)
+            # CAPEX
+            model.add_constraint(name + 'const_capex', (),
+                                 [(1, b_arc['var_CAPEX']), (-economics['gamma1'], b_arc['var_size'])],
+                                 lb=economics['gamma2'], ub=economics['gamma2'])
+            # OPEX
+            model.add_constraint(name + 'const_OPEX_variable', (),
+                                 [(1, b_arc['var_OPEX_variable']),
+                                  (-economics['OPEX_variable'] * weights, b_arc['var_flow'])],
+                                 lb=0, ub=0)
+            b_netw['arc_block'][arc] = b_arc
+
+        name = 'network_blocks[' + netw + '].'
+        if performance['bidirectional'] == 1:
+            # Size in both direction is the same, only one direction of flow in each time step
+            big_m = performance['size_max'] * rated_capacity
+            for from_node, to_node in arcs_unique:
+                arc_name = name + 'arc_block[' + from_node + ',' + to_node + '].'
+                b_arc = b_netw['arc_block'][from_node, to_node]
+                b_arc_reverse = b_netw['arc_block'][to_node, from_node]
+                model.add_constraint(arc_name + 'const_size_bidirectional', (),
+                                     [(1, b_arc['var_size']), (-1, b_arc_reverse['var_size'])],
+                                     lb=0, ub=0)
+                var_direction = model.add_var((nr_t,), lb=0, ub=1, integer=True)
+                model.add_constraint(arc_name + 'const_one_direction_only', (nr_t,),
+                                     [(1, b_arc['var_flow']), (-big_m, var_direction)],
+                                     ub=0)
+                model.add_constraint(arc_name + 'const_one_direction_only_reverse', (nr_t,),
+                                     [(1, b_arc_reverse['var_flow']), (big_m, var_direction)],
+                                     ub=big_m)
+
+        # Cost of network
+        b_netw['var_CAPEX'] = model.add_var(lb=-np.inf)
+        b_netw['var_OPEX_variable'] = model.add_var(lb=-np.inf)
+        b_netw['var_OPEX_fixed'] = model.add_var(lb=-np.inf)
+        b_netw['var_cost'] = model.add_var(lb=-np.inf)
+        b_netw['var_netw_emissions_pos'] = model.add_var(lb=-np.inf)
+
+        model.add_constraint(name + 'const_CAPEX', (),
+                             [(1, b_netw['var_CAPEX'])] +
+                             [(-1, b_netw['arc_block'][arc]['var_CAPEX']) for arc in arc_set],
+                             lb=0, ub=0)
+        model.add_constraint(name + 'const_OPEX_fixed', (),
+                             [(1, b_netw['var_OPEX_fixed']), (-economics['OPEX_fixed'], b_netw['var_CAPEX'])],
+                             lb=0, ub=0)
+        model.add_constraint(name + 'const_OPEX_var', (),
+                             [(1, b_netw['var_OPEX_variable'])] +
+                             [(-1, b_netw['arc_block'][arc]['var_OPEX_variable']) for arc in arc_set],
+                             lb=0, ub=0)
+        model.add_constraint(name + 'const_cost', (),
+                             [(1, b_netw['var_cost']), (-1, b_netw['var_CAPEX']),
+                              (-1, b_netw['var_OPEX_fixed']), (-1, b_netw['var_OPEX_variable'])],
+                             lb=0, ub=0)
+
+        # Network emissions
+        model.add_constraint(name + 'const_netw_emissions', (),
+                             [(1, b_netw['var_netw_emissions_pos'])] +
+                             [(-performance['emissionfactor'] * weights, b_netw['arc_block'][arc]['var_flow'])
+                              for arc in arcs] +
+                             [(-performance['loss2emissions'] * weights, b_netw['arc_block'][arc]['var_losses'])
+                              for arc in arcs],
+                             lb=0, ub=0)
+
+        # Inflow and outflow at nodes
+        for from_node, to_node in arcs:
+            b_arc = b_netw['arc_block'][from_node, to_node]
+            model.balance_terms[to_node][carrier].append((1, b_arc['var_flow']))
+            model.balance_terms[to_node][carrier].append((-1, b_arc['var_losses']))
+            model.balance_terms[from_node][carrier].append((-1, b_arc['var_flow']))
+
+        model.netw_cost_terms.append((1, b_netw['var_cost']))
+        model.emission_pos_terms.append((1, b_netw['var_netw_emissions_pos']))
+        model.network_blocks[netw] = b_netw
+
+    return model
+
+
+def add_nodes_sparse(model, data):
+    r"""
+    Adds all nodes with respective technologies to a :class:`SparseModel`.
+
+    The formulation is the same as in :func:`~src.model_construction.construct_nodes.add_nodes`. Imports and exports \
+    are added as one block of shape (time steps, carriers). The emissions from imports and exports are directly \
+    summed over all time steps, using the positive and negative part of the emission factors respectively.
+
+    :param SparseModel model: instance of a sparse model
+    :param DataHandle data: instance of a DataHandle
+    :return: model
+    """
+    nr_t = model.nr_timesteps
+    weights = data.get_timestep_weights()[:, np.newaxis]
+
+    for node in model.set_nodes:
+        node_data = data.node_data[node]
+        b_node = {}
+        for series in ['demand', 'import_prices', 'export_prices', 'import_limit', 'export_limit',
+                       'import_emissionfactors', 'export_emissionfactors']:
+            b_node['para_' + series] = \
+                node_data[series][model.set_carriers].to_numpy(dtype=float)[:nr_t]
+
+        # Imports and exports
+        shape = (nr_t, len(model.set_carriers))
+        b_node['var_import_flow'] = model.add_var(shape, lb=0, ub=b_node['para_import_limit'])
+        b_node['var_export_flow'] = model.add_var(shape, lb=0, ub=b_node['para_export_limit'])
+
+        # Emissions from imports and exports
+        b_node['var_car_emissions_pos'] = model.add_var(lb=0)
+        b_node['var_car_emissions_neg'] = model.add_var(lb=0)
+        import_ef = b_node['para_import_emissionfactors']
+        export_ef = b_node['para_export_emissionfactors']
+        name = 'node_blocks[' + node + '].'
+        model.add_constraint(name + 'const_car_emissions_pos', (),
+                             [(1, b_node['var_car_emissions_pos']),
+                              (-np.maximum(import_ef, 0) * weights, b_node['var_import_flow']),
+                              (-np.maximum(export_ef, 0) * weights, b_node['var_export_flow'])],
+                             lb=0, ub=0)
+        model.add_constraint(name + 'const_car_emissions_neg', (),
+                             [(1, b_node['var_car_emissions_neg']),
+                              (-np.maximum(-import_ef, 0) * weights, b_node['var_import_flow']),
+                              (-np.maximum(-export_ef, 0) * weights, b_node['var_export_flow'])],
+                             lb=0, ub=0)
+
+        for car_idx, car in enumerate(model.set_carriers):
+            model.balance_terms[node][car].append((1, b_node['var_import_flow'][:, car_idx]))
+            model.balance_terms[node][car].append((-1, b_node['var_export_flow'][:, car_idx]))
+        model.node_cost_terms.append((b_node['para_import_prices'] * weights, b_node['var_import_flow']))
+        model.node_cost_terms.append((-b_node['para_export_prices'] * weights, b_node['var_export_flow']))
+        model.emission_pos_terms.append((1, b_node['var_car_emissions_pos']))
+        model.emission_neg_terms.append((1, b_node['var_car_emissions_neg']))
+
+        # Technologies
+        b_node['tech_blocks_active'] = {}
+        model.node_blocks[node] = b_node
+        if node in data.technology_data:
+            for tec in data.technology_data[node]:
+                add_technology_sparse(node, tec, model, data)
+
+    return model
+
+
+def add_technology_sparse(nodename, tec, model, data):
+    r"""
+    Adds a technology to a node of a :class:`SparseModel`.
+
+    The formulation is the same as in :func:`~src.model_construction.construct_technology.add_technologies` and the \
+    respective constraints of the technology type. Currently, the types RES, CONV2 and STOR are available. For \
+    storage technologies with ``allow_only_one_direction == 1``, a binary variable for each time step \
+    allows either charging or discharging.
+
+    :param str nodename: name of node for which technology is installed
+    :param str tec: name of technology
+    :param SparseModel model: instance of a sparse model
+    :param DataHandle data: instance of a DataHandle
+    :return: model
+    """
+    nr_t = model.nr_timesteps
+    weights = data.get_timestep_weights()[:, np.newaxis]
+    tec_data = data.technology_data[nodename][tec]
+    tec_fit = tec_data['fit']
+    performance = tec_data['TechnologyPerf']
+    economics = tec_data['Economics']
+    tec_type = performance['tec_type']
+    size_is_integer = performance['size_is_int']
+    name = 'node_blocks[' + nodename + '].tech_blocks_active[' + tec + '].'
+
+    if isinstance(performance['size_min'], numbers.Number):
+        size_min = performance['size_min']
+    else:
+        size_min = min(performance['size_min'])
+    if isinstance(performance['size_max'], numbers.Number):
+        size_max = performance['size_max']
+    else:
+        size_max = max(performance['size_max'])
+
+    b_tec = {'tec_type': tec_type,
+             'para_size_min': size_min,
+             'para_size_max': size_max,
+             'set_input_carriers': list(performance['input_carrier']),
+             'set_output_carriers': list(performance['output_carrier'])}
+
+    # Decision variables
+    b_tec['var_size'] = model.add_var(lb=size_min, ub=size_max, integer=size_is_integer)
+    b_tec['var_output'] = model.add_var((nr_t, len(b_tec['set_output_carriers'])), lb=0, ub=size_max)
+    if not tec_type == 'RES':
+        b_tec['var_input'] = model.add_var((nr_t, len(b_tec['set_input_carriers'])), lb=size_min, ub=size_max)
+    b_tec['var_CAPEX'] = model.add_var(lb=-np.inf)
+    b_tec['var_OPEX_fixed'] = model.add_var(lb=-np.inf)
+    b_tec['var_OPEX_variable'] = model.add_var(lb=-np.inf)
+
+    # Capex/Opex
+    model.add_constraint(name + 'const_CAPEX', (),
+                         [(1, b_tec['var_CAPEX']), (-economics['unit_CAPEX_annual'], b_tec['var_size'])],
+                         lb=0, ub=0)
+    model.add_constraint(name + 'const_OPEX_fixed', (),
+                         [(1, b_tec['var_OPEX_fixed']), (-economics['OPEX_fixed'], b_tec['var_CAPEX'])],
+                         lb=0, ub=0)
+    model.add_constraint(name + 'const_OPEX_variable', (),
+                         [(1, b_tec['var_OPEX_variable']),
+                          (-economics['OPEX_variable'] * weights, b_tec['var_output'])],
+                         lb=0, ub=0)
+
+    # Emissions
+    emission_factor = performance['emission_factor']
+    if tec_type == 'RES':
+        b_tec['var_tec_emissions_pos'] = model.add_var(lb=0, ub=0)
+        b_tec['var_tec_emissions_neg'] = model.add_var(lb=0, ub=0)
+    else:
+        main_car = b_tec['set_input_carriers'].index(performance['main_input_carrier'])
+        main_input = b_tec['var_input'][:, main_car]
+        if emission_factor >= 0:
+            b_tec['var_tec_emissions_pos'] = model.add_var(lb=0)
+            b_tec['var_tec_emissions_neg'] = model.add_var(lb=0, ub=0)
+            model.add_constraint(name + 'const_tec_emissions_pos', (),
+                                 [(1, b_tec['var_tec_emissions_pos']),
+                                  (-emission_factor * weights[:, 0], main_input)],
+                                 lb=0, ub=0)
+        else:
+            b_tec['var_tec_emissions_pos'] = model.add_var(lb=0, ub=0)
+            b_tec['var_tec_emissions_neg'] = model.add_var(lb=0)
+            model.add_constraint(name + 'const_tec_emissions_neg', (),
+                                 [(1, b_tec['var_tec_emissions_neg']),
+                                  (emission_factor * weights[:, 0], main_input)],
+                                 lb=0, ub=0)
+
+    # Technology types
+    if tec_type == 'RES':
+        constraints_tec_RES_sparse(model, name, b_tec, tec_data)
+    elif tec_type == 'CONV2':
+        constraints_tec_CONV2_sparse(model, name, b_tec, tec_data)
+    elif tec_type == 'STOR':
+        constraints_tec_STOR_sparse(model, name, b_tec, tec_data)
+    else:
+        raise Exception('Technology type ' + tec_type + ' is not available in the sparse model.')
+
+    # Link to balances
+    for car_idx, car in enumerate(b_tec['set_output_carriers']):
+        model.balance_terms[nodename][car].append((1, b_tec['var_output'][:, car_idx]))
+    if 'var_input' in b_tec:
+        for car_idx, car in enumerate(b_tec['set_input_carriers']):
+            model.balance_terms[nodename][car].append((-1, b_tec['var_input'][:, car_idx]))
+    for var in ['var_CAPEX', 'var_OPEX_fixed', 'var_OPEX_variable']:
+        model.node_cost_terms.append((1, b_tec[var]))
+    model.emission_pos_terms.append((1, b_tec['var_tec_emissions_pos']))
+    model.emission_neg_terms.append((1, b_tec['var_tec_emissions_neg']))
+
+    model.node_blocks[nodename]['tech_blocks_active'][tec] = b_tec
+    return model
+
+
+def constraints_tec_RES_sparse(model, name, b_tec, tec_data):
+    """
+    Adds constraints of tec_type RES to a technology of a :class:`SparseModel`
+
+    Same formulation as :func:`~src.model_construction.generic_technology_constraints.constraints_tec_RES`
+
+    :param SparseModel model: instance of a sparse model
+    :param str name: name of the technology block
+    :param dict b_tec: technology block
+    :param tec_data: technology data
+    :return: technology block
+    """
+    nr_t = model.nr_timesteps
+    tec_fit = tec_data['fit']
+    if tec_data['TechnologyPerf']['size_is_int']:
+        rated_power = tec_fit['rated_power']
+    else:
+        rated_power = 1
+    if 'curtailment' in tec_data['TechnologyPerf']:
+        curtailment = tec_data['TechnologyPerf']['curtailment']
+    else:
+        curtailment = 0
+
+    capfactor = np.asarray(tec_fit['capacity_factor'], dtype=float)[:nr_t, np.newaxis]
+    nr_output = len(b_tec['set_output_carriers'])
+
+    if curtailment == 0:  # no curtailment allowed (default)
+        model.add_constraint(name + 'const_input_output', (nr_t, nr_output),
+                             [(1, b_tec['var_output']), (-capfactor * rated_power, b_tec['var_size'])],
+                             lb=0, ub=0)
+    elif curtailment == 1:  # continuous curtailment
+        model.add_constraint(name + 'const_input_output', (nr_t, nr_output),
+                             [(1, b_tec['var_output']), (-capfactor * rated_power, b_tec['var_size'])],
+                             ub=0)
+    elif curtailment == 2:  # discrete curtailment
+        b_tec['var_size_on'] = model.add_var((nr_t, 1), lb=b_tec['para_size_min'], ub=b_tec['para_size_max'],
+                                             integer=True)
+        model.add_constraint(name + 'const_curtailed_units', (nr_t, 1),
+                             [(1, b_tec['var_size_on']), (-1, b_tec['var_size'])],
+                             ub=0)
+        model.add_constraint(name + 'const_input_output', (nr_t, nr_output),
+                             [(1, b_tec['var_output']), (-capfactor * rated_power, b_tec['var_size_on'])],
+                             lb=0, ub=0)
+    return b_tec
+
+
+def constraints_tec_CONV2_sparse(model, name, b_tec, tec_data):
+    """
+    Adds constraints of tec_type CONV2 to a technology of a :class:`SparseModel`
+
+    Same formulation as :func:`~src.model_construction.generic_technology_constraints.constraints_tec_CONV2`
+
+    :param SparseModel model: instance of a sparse model
+    :param str name: name of the technology block
+    :param dict b_tec: technology block
+    :param tec_data: technology data
+    :return: technology block
+    """
+    nr_t = model.nr_timesteps
+    tec_fit = tec_data['fit']
+
+    for car_idx, car in enumerate(b_tec['set_output_carriers']):
+        model.add_constraint(name + 'const_input_output[' + car + ']', (nr_t,),
+                             [(1, b_tec['var_output'][:, car_idx]),
+                              (-tec_fit[car]['alpha1'], b_tec['var_input'])],
+                             lb=0, ub=0)
+
+    # size constraint based on sum of inputs
+    model.add_constraint(name + 'const_size', (nr_t,),
+                         [(1, b_tec['var_input']), (-1, b_tec['var_size'])],
+                         ub=0)
+    return b_tec
+
+
+def constraints_tec_STOR_sparse(model, name, b_tec, tec_data):
+    """
+    Adds constraints of tec_type STOR to a technology of a :class:`SparseModel`
+
+    Same formulation as :func:`~src.model_construction.generic_technology_constraints.constraints_tec_STOR`. The \
+    storage level in the first time step is coupled to the last time step. If ``model.period_sequence`` is set, \
+    the storage levels of the typical periods are linked with an inter-period storage level instead.
+
+    :param SparseModel model: instance of a sparse model
+    :param str name: name of the technology block
+    :param dict b_tec: technology block
+    :param tec_data: technology data
+    :return: technology block
+    """
+    nr_t = model.nr_timesteps
+    tec_fit = tec_data['fit']
+    if 'allow_only_one_direction' in tec_fit:
+        allow_only_one_direction = tec_fit['allow_only_one_direction']
+    else:
+        allow_only_one_direction = 0
+
+    nr_input = len(b_tec['set_input_carriers'])
+    output_index = [b_tec['set_output_carriers'].index(car) for car in b_tec['set_input_carriers']]
+    var_input = b_tec['var_input']
+    var_output = b_tec['var_output'][:, output_index]
+
+    ambient_loss_factor = np.array(tec_fit['ambient_loss_factor'], dtype=float)[:nr_t]
+    decay = 1 - tec_fit['lambda'] - ambient_loss_factor
+
+    if model.period_sequence is None:
+        b_tec['var_storage_level'] = model.add_var((nr_t, nr_input), lb=0)
+        var_level = b_tec['var_storage_level']
+
+        # Size constraint
+        model.add_constraint(name + 'const_size', (nr_t, nr_input),
+                             [(1, var_level), (-1, b_tec['var_size'])],
+                             ub=0)
+
+        # Storage level calculation, the first time step is coupled to the last time step
+        decay[0] = decay[-1]
+        level_previous = np.roll(var_level, 1, axis=0)
+        model.add_constraint(name + 'const_storage_level', (nr_t, nr_input),
+                             [(1, var_level),
+                              (-decay[:, np.newaxis], level_previous),
+                              (-tec_fit['eta_in'], var_input),
+                              (1 / tec_fit['eta_out'], var_output)],
+                             lb=0, ub=0)
+    else:
+        b_tec = _constraints_tec_STOR_inter_period_sparse(model, name, b_tec, decay, var_input, var_output,
+                                                          tec_fit['eta_in'], tec_fit['eta_out'])
+
+    # Maximal charging and discharging
+    model.add_constraint(name + 'const_max_charge', (nr_t, nr_input),
+                         [(1, var_input), (-tec_fit['charge_max'], b_tec['var_size'])],
+                         ub=0)
+    model.add_constraint(name + 'const_max_discharge', (nr_t, nr_input),
+                         [(1, var_output), (-tec_fit['discharge_max'], b_tec['var_size'])],
+                         ub=0)
+
+    # Only either input or output can be larger zero
+    if allow_only_one_direction == 1:
+        size_max = b_tec['para_size_max']
+        var_charging = model.add_var((nr_t, 1), lb=0, ub=1, integer=True)
+        model.add_constraint(name + 'const_input_only', (nr_t, nr_input),
+                             [(1, var_output), (size_max, var_charging)],
+                             ub=size_max)
+        model.add_constraint(name + 'const_output_only', (nr_t, nr_input),
+                             [(1, var_input), (-size_max, var_charging)],
+                             ub=0)
+    return b_tec
+
+
+def _constraints_tec_STOR_inter_period_sparse(model, name, b_tec, decay, var_input, var_output, eta_in, eta_out):
+    """
+    Adds the intra- and inter-period storage levels of a storage technology for clustered data (see \
+    :func:`~src.model_construction.generic_technology_constraints.constraints_tec_STOR`)
+
+    :param SparseModel model: instance of a sparse model
+    :param str name: name of the technology block
+    :param dict b_tec: technology block
+    :param decay: decay of the storage level in each time step
+    :param var_input: column indices of the input
+    :param var_output: column indices of the output (of the stored carriers)
+    :param float eta_in: charging efficiency
+    :param float eta_out: discharging efficiency
+    :return: technology block
+    """
+    nr_t = model.nr_timesteps
+    nr_input = var_input.shape[1]
+    length = model.period_length
+    sequence = np.asarray(model.period_sequence)
+    nr_typical = int(nr_t / length)
+    nr_calendar = len(sequence)
+
+    b_tec['var_storage_level'] = model.add_var((nr_t, nr_input), lb=-np.inf)
+    b_tec['var_storage_level_inter'] = model.add_var((nr_calendar, nr_input), lb=0)
+    b_tec['var_storage_level_intra_max'] = model.add_var((nr_typical, nr_input), lb=0)
+    b_tec['var_storage_level_intra_min'] = model.add_var((nr_typical, nr_input), lb=-np.inf, ub=0)
+    var_level = b_tec['var_storage_level']
+    var_inter = b_tec['var_storage_level_inter']
+
+    # Intra-period storage level, starting at zero in each typical period
+    level_previous = np.roll(var_level, 1, axis=0)
+    period_decay = decay.reshape(nr_typical, length)
+    decay = decay.copy()
+    decay[::length] = 0
+    model.add_constraint(name + 'const_storage_level', (nr_t, nr_input),
+                         [(1, var_level),
+                          (-decay[:, np.newaxis], level_previous),
+                          (-eta_in, var_input),
+                          (1 / eta_out, var_output)],
+                         lb=0, ub=0)
+
+    # Maximal and minimal intra-period storage level
+    period = np.repeat(np.arange(nr_typical), length)
+    model.add_constraint(name + 'const_storage_level_intra_max', (nr_t, nr_input),
+                         [(1, var_level), (-1, b_tec['var_storage_level_intra_max'][period])],
+                         ub=0)
+    model.add_constraint(name + 'const_storage_level_intra_min', (nr_t, nr_input),
+                         [(1, var_level), (-1, b_tec['var_storage_level_intra_min'][period])],
+                         lb=0)
+
+    # Inter-period storage level, chained through the original sequence of periods
+    period_decay = np.prod(period_decay, axis=1)[sequence][:, np.newaxis]
+    model.add_constraint(name + 'const_storage_level_inter', (nr_calendar, nr_input),
+                         [(1, np.roll(var_inter, -1, axis=0)),
+                          (-period_decay, var_inter),
+                          (-1, var_level[(sequence + 1) * length - 1])],
+                         lb=0, ub=0)
+
+    # Size constraints
+    model.add_constraint(name + 'const_size_max', (nr_calendar, nr_input),
+                         [(1, var_inter),
+                          (1, b_tec['var_storage_level_intra_max'][sequence]),
+                          (-1, b_tec['var_size'])],
+                         ub=0)
+    model.add_constraint(name + 'const_size_min', (nr_calendar, nr_input),
+                         [(period_decay, var_inter),
+                          (1, b_tec['var_storage_level_intra_min'][sequence])],
+                         lb=0)
+    return b_tec
+
+
+def add_energybalance_sparse(model):
+    """
+    Adds the energy balance for each node and carrier to a :class:`SparseModel`, as in \
+    :func:`~src.model_construction.construct_balances.add_energybalance`
+
+    :param SparseModel model: instance of a sparse model
+    :return: model
+    """
+    for node in model.set_nodes:
+        demand = model.node_blocks[node]['para_demand']
+        for car_idx, car in enumerate(model.set_carriers):
+            model.add_constraint('const_energybalance[' + node + ',' + car + ']', (model.nr_timesteps,),
+                                 model.balance_terms[node][car],
+                                 lb=demand[:, car_idx], ub=demand[:, car_idx])
+    return model
+
+
+def add_emissionbalance_sparse(model):
+    """
+    Adds the emission balance to a :class:`SparseModel`, as in \
+    :func:`~src.model_construction.construct_balances.add_emissionbalance`
+
+    :param SparseModel model: instance of a sparse model
+    :return: model
+    """
+    model.add_constraint('const_emissions_pos', (),
+                         [(1, model.global_vars['var_emissions_pos'])] +
+                         [(-coef, cols) for coef, cols in model.emission_pos_terms],
+                         lb=0, ub=0)
+    model.add_constraint('const_emissions_neg', (),
+                         [(1, model.global_vars['var_emissions_neg'])] +
+                         [(-coef, cols) for coef, cols in model.emission_neg_terms],
+                         lb=0, ub=0)
+    model.add_constraint('const_emissions_net', (),
+                         [(1, model.global_vars['var_emissions_net']),
+                          (-1, model.global_vars['var_emissions_pos']),
+                          (1, model.global_vars['var_emissions_neg'])],
+                         lb=0, ub=0)
+    return model
+
+
+def add_system_costs_sparse(model):
+    """
+    Adds the cost balance to a :class:`SparseModel`, as in \
+    :func:`~src.model_construction.construct_balances.add_system_costs`
+
+    :param SparseModel model: instance of a sparse model
+    :return: model
+    """
+    model.add_constraint('const_node_cost', (),
+                         [(1, model.global_vars['var_node_cost'])] +
+                         [(-np.asarray(coef), cols) for coef, cols in model.node_cost_terms],
+                         lb=0, ub=0)
+    model.add_constraint('const_netw_cost', (),
+                         [(1, model.global_vars['var_netw_cost'])] +
+                         [(-np.asarray(coef), cols) for coef, cols in model.netw_cost_terms],
+                         lb=0, ub=0)
+    model.add_constraint('const_cost', (),
+                         [(1, model.global_vars['var_total_cost']),
+                          (-1, model.global_vars['var_node_cost']),
+                          (-1, model.global_vars['var_netw_cost'])],
+                         lb=0, ub=0)
+    return model
+
@@ -2,6 +2,7 @@ import numbers
 from src.model_construction.generic_technology_constraints import *
 import src.model_construction as mc
 import src.config_model as m_config
+from src.instrumentation import phase_rule
 
 
 
@@ -91,21 +92,24 @@ def add_technologies(nodename, set_tecsToAdd, model, data, b_node):
         else:
             size_max = max(tec_data['TechnologyPerf']['size_max'])
 
+        units = mc.get_units()
         if size_is_integer:
-            unit_size = u.dimensionless
+            unit_size = units.dimensionless
+            unit_CAPEX = units.EUR
         else:
-            unit_size = u.MW
+            unit_size = units.MW
+            unit_CAPEX = units.EUR_per_MW
         b_tec.para_size_min = Param(domain=NonNegativeReals, initialize=size_min, units=unit_size)
         b_tec.para_size_max = Param(domain=NonNegativeReals, initialize=size_max, units=unit_size)
-        b_tec.para_output_max = Param(domain=NonNegativeReals, initialize=size_max, units=u.MW)
+        b_tec.para_output_max = Param(domain=NonNegativeReals, initialize=size_max, units=units.MW)
         b_tec.para_unit_CAPEX = Param(domain=Reals, initialize=tec_data['Economics']['unit_CAPEX_annual'],
-                                      units=u.EUR/unit_size)
+                                      units=unit_CAPEX)
         b_tec.para_OPEX_variable = Param(domain=Reals, initialize=tec_data['Economics']['OPEX_variable'],
-                                         units=u.EUR/u.MWh)
+                                         units=units.EUR_per_MWh)
         b_tec.para_OPEX_fixed = Param(domain=Reals, initialize=tec_data['Economics']['OPEX_fixed'],
-                                      units=u.EUR/u.EUR)
+                                      units=units.dimensionless)
         b_tec.para_tec_emissionfactor = Param(domain=Reals, initialize=tec_data['TechnologyPerf']['emission_factor'],
-                                      units=u.t/u.MWh)
+                                      units=units.t_per_MWh)
 
         # endregion
 
@@ -118,25 +122,25 @@ def add_technologies(nodename, set_tecsToAdd, model, data, b_node):
         # Input
         if not tec_type == 'RES':
             b_tec.var_input = Var(model.set_t, b_tec.set_input_carriers, within=NonNegativeReals,
-                                  bounds=(b_tec.para_size_min, b_tec.para_size_max), units=u.MW)
+                                  bounds=(b_tec.para_size_min, b_tec.para_size_max), units=units.MW)
         # Output
         b_tec.var_output = Var(model.set_t, b_tec.set_output_carriers, within=NonNegativeReals,
-                               bounds=(0, b_tec.para_output_max), units=u.MW)
+                               bounds=(0, b_tec.para_output_max), units=units.MW)
 
         # Emissions
-        b_tec.var_tec_emissions_pos = Var(within=NonNegativeReals, units=u.t)
-        b_tec.var_tec_emissions_neg = Var(within=NonNegativeReals, units=u.t)
+        b_tec.var_tec_emissions_pos = Var(within=NonNegativeReals, units=units.t)
+        b_tec.var_tec_emissions_neg = Var(within=NonNegativeReals, units=units.t)
 
         # Size
         if size_is_integer:  # size
             b_tec.var_size = Var(within=NonNegativeIntegers, bounds=(b_tec.para_size_min, b_tec.para_size_max))
         else:
             b_tec.var_size = Var(within=NonNegativeReals, bounds=(b_tec.para_size_min, b_tec.para_size_max),
-                                 units=u.MW)
+                                 units=units.MW)
         # Capex/Opex
-        b_tec.var_CAPEX = Var(units=u.EUR)  # capex
-        b_tec.var_OPEX_variable = Var(model.set_t, units=u.EUR)  # variable opex
-        b_tec.var_OPEX_fixed = Var(units=u.EUR)  # fixed opex
+        b_tec.var_CAPEX = Var(units=units.EUR)  # capex
+        b_tec.var_OPEX_variable = Var(model.set_t, units=units.EUR)  # variable opex
+        b_tec.var_OPEX_fixed = Var(units=units.EUR)  # fixed opex
         # endregion
 
         # region GENERAL CONSTRAINTS
@@ -161,7 +165,8 @@ def add_technologies(nodename, set_tecsToAdd, model, data, b_node):
             # Calculate emissions from emission factor
             def init_tec_emissions_pos(const):
                 if tec_data['TechnologyPerf']['emission_factor'] >= 0:
-                    return sum(b_tec.var_input[t, tec_data['TechnologyPerf']['main_input_carrier']]
+                    return sum(b_tec.var_input[t, tec_data['TechnologyPerf']['main_input_carrier']] *
+                               model.para_timestep_weight[t]
                                for t in model.set_t) \
                            * b_tec.para_tec_emissionfactor \
                            == b_tec.var_tec_emissions_pos
@@ -171,7 +176,8 @@ def add_technologies(nodename, set_tecsToAdd, model, data, b_node):
 
             def init_tec_emissions_neg(const):
                 if tec_data['TechnologyPerf']['emission_factor'] < 0:
-                    return sum(b_tec.var_input[t, tec_data['TechnologyPerf']['main_input_carrier']]
+                    return sum(b_tec.var_input[t, tec_data['TechnologyPerf']['main_input_carrier']] *
+                               model.para_timestep_weight[t]
                                for t in model.set_t) * \
                            (-b_tec.para_tec_emissionfactor) == \
                            b_tec.var_tec_emissions_neg
@@ -196,12 +202,12 @@ def add_technologies(nodename, set_tecsToAdd, model, data, b_node):
         return b_tec
 
     # Create a new block containing all new technologies. The set of nodes that need to be added
-    if b_node.find_component('tech_blocks_new'):
+    if b_node.find_component('tech_blocks_new') is not None:
         b_node.del_component(b_node.tech_blocks_new)
-    b_node.tech_blocks_new = Block(set_tecsToAdd, rule=init_technology_block)
+    b_node.tech_blocks_new = Block(set_tecsToAdd, rule=phase_rule('technology', init_technology_block, node=nodename))
 
     # If it exists, carry over active tech blocks to temporary block
-    if b_node.find_component('tech_blocks_active'):
+    if b_node.find_component('tech_blocks_active') is not None:
         b_node.tech_blocks_existing = Block(b_node.set_tecsAtNode)
         for tec in b_node.set_tecsAtNode:
             b_node.tech_blocks_existing[tec].transfer_attributes_from(b_node.tech_blocks_active[tec])
@@ -218,8 +224,8 @@ def add_technologies(nodename, set_tecsToAdd, model, data, b_node):
             bl.transfer_attributes_from(b_node.tech_blocks_existing[tec])
     b_node.tech_blocks_active = Block(b_node.set_tecsAtNode, rule=init_active_technology_blocks)
 
-    if b_node.find_component('tech_blocks_new'):
+    if b_node.find_component('tech_blocks_new') is not None:
         b_node.del_component(b_node.tech_blocks_new)
-    if b_node.find_component('tech_blocks_existing'):
+    if b_node.find_component('tech_blocks_existing') is not None:
         b_node.del_component(b_node.tech_blocks_existing)
     return b_node
@@ -0,0 +1,186 @@
+import os
+import pickle
+import threading
+import pvlib
+import pandas as pd
+from timezonefinder import TimezoneFinder
+import src.config_model as m_config
+
+# Power curves of wind turbines
+WT_DATA_PATH = os.path.join('.', 'data', 'technology_data', 'WT_data', 'WT_data.csv')
+
+# Process-wide registry (see get_resource_registry)
+_resource_registry = None
+
+
+class ResourceRegistry:
+    """
+    Registry of resources required for fitting technology performances and importing climate data.
+
+    The following resources are loaded on first use and kept in memory:
+
+    - CEC module database of the SAM library (``pvlib.pvsystem.retrieve_sam('CECMod')``)
+    - Timezone finder (``timezonefinder.TimezoneFinder``), time zones are memoized for each location
+    - Power curves of wind turbines from ``./data/technology_data/WT_data/WT_data.csv``
+
+    PV modules and wind turbines that have been used are persisted to ``m_config.fitting.resource_cache_path`` \
+    (if not empty), once for each call of :func:`~get_pv_modules` or :func:`~get_turbines` that uses new modules or \
+    turbines. As long as the pvlib version and the wind turbine data are unchanged, they are loaded from there, i.e. \
+    the SAM database and the turbine data are only read, if a new module or turbine is used.
+    """
+    def __init__(self, cache_path=''):
+        """
+        Constructor
+
+        :param str cache_path: (optional) path of the file, in which used modules and turbines are persisted
+        """
+        self.cache_path = cache_path
+        self._sam_modules = None
+        self._timezone_finder = None
+        self._wt_data = None
+        self._timezones = {}
+        self._timezone_lock = threading.Lock()
+        self._pv_modules = {}
+        self._turbines = {}
+        self._load_cache()
+
+    def get_pv_module(self, module_name):
+        """
+        Returns the parameters of a PV module from the CEC module database
+
+        :param str module_name: name of the module in the database
+        :return: pandas series of module parameters
+        """
+        return self.get_pv_modules([module_name])[0]
+
+    def get_pv_modules(self, module_names):
+        """
+        Returns the parameters of several PV modules from the CEC module database (new modules are persisted once)
+
+        :param list module_names: names of the modules in the database
+        :return: list of pandas series of module parameters
+        """
+        new_modules = [module_name for module_name in dict.fromkeys(module_names)
+                       if module_name not in self._pv_modules]
+        if new_modules:
+            if self._sam_modules is None:
+                self._sam_modules = pvlib.pvsystem.retrieve_sam('CECMod')
+            for module_name in new_modules:
+                self._pv_modules[module_name] = self._sam_modules[module_name]
+            self._save_cache()
+        return [self._pv_modules[module_name] for module_name in module_names]
+
+    def get_turbine(self, turbine_model):
+        """
+        Returns the data of a wind turbine (rated power and power curve)
+
+        :param str turbine_model: name of the turbine as in the column 'TurbineName' of the turbine data
+        :return: pandas data frame with one row per entry of the turbine in the turbine data
+        """
+        return self.get_turbines([turbine_model])[0]
+
+    def get_turbines(self, turbine_models):
+        """
+        Returns the data of several wind turbines (new turbines are persisted once)
+
+        :param list turbine_models: names of the turbines as in the column 'TurbineName' of the turbine data
+        :return: list of pandas data frames with one row per entry of the turbine in the turbine data
+        """
+        new_turbines = [turbine_model for turbine_model in dict.fromkeys(turbine_models)
+                        if turbine_model not in self._turbines]
+        if new_turbines:
+            wt_data = self.get_turbine_data()
+            turbines = {turbine_model: turbine for turbine_model, turbine
+                        in wt_data[wt_data['TurbineName'].isin(new_turbines)].groupby('TurbineName', sort=False)}
+            for turbine_model in new_turbines:
+                if turbine_model not in turbines:
+                    raise Exception('The wind turbine ' + turbine_model + ' is not contained in ' + WT_DATA_PATH +
+                                    '.')
+                self._turbines[turbine_model] = turbines[turbine_model]
+            self._save_cache()
+        return [self._turbines[turbine_model] for turbine_model in turbine_models]
+
+    def get_turbine_data(self):
+        """
+        Returns the data of all wind turbines (always read from the turbine data, not persisted)
+
+        :return: pandas data frame with one row per turbine
+        """
+        if self._wt_data is None:
+            self._wt_data = pd.read_csv(WT_DATA_PATH, delimiter=';')
+        return self._wt_data
+
+    def get_timezone(self, lon, lat):
+        """
+        Returns the time zone of a location (can be called from several threads)
+
+        :param float lon: longitude
+        :param float lat: latitude
+        :return: name of the time zone
+        """
+        with self._timezone_lock:
+            if (lon, lat) not in self._timezones:
+                if self._timezone_finder is None:
+                    self._timezone_finder = TimezoneFinder()
+                self._timezones[lon, lat] = self._timezone_finder.timezone_at(lng=lon, lat=lat)
+        return self._timezones[lon, lat]
+
+    def _get_versions(self):
+        """
+        Returns the versions of the sources of persisted resources
+
+        :return: dict of versions
+        """
+        try:
+            wt_data_version = (os.path.getsize(WT_DATA_PATH), os.path.getmtime(WT_DATA_PATH))
+        except OSError:
+            wt_data_version = None
+        return {'pvlib': pvlib.__version__, 'wt_data': wt_data_version}
+
+    def _load_cache(self):
+        """
+        Loads persisted modules and turbines, if their sources did not change
+        """
+        if not self.cache_path or not os.path.isfile(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as handle:
+                cache = pickle.load(handle)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        versions = self._get_versions()
+        if cache['versions']['pvlib'] == versions['pvlib']:
+            self._pv_modules = cache['pv_modules']
+        if cache['versions']['wt_data'] == versions['wt_data']:
+            self._turbines = cache['turbines']
+
+    def _save_cache(self):
+        """
+        Persists all used modules and turbines. The cache is written to a temporary file of the process and thread \
+        first, such that processes saving at the same time do not write to the same file.
+        """
+        if not self.cache_path:
+            return
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        cache = {'versions': self._get_versions(),
+                 'pv_modules': self._pv_modules,
+                 'turbines': self._turbines}
+        tmp_path = self.cache_path + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+        with open(tmp_path, 'wb') as handle:
+            pickle.dump(cache, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.cache_path)
+
+
+def get_resource_registry():
+    """
+    Returns the registry of the process. It is created on first use with the cache path \
+    ``m_config.fitting.resource_cache_path``.
+
+    :return: instance of :class:`~ResourceRegistry`
+    """
+    global _resource_registry
+    if _resource_registry is None or _resource_registry.cache_path != m_config.fitting.resource_cache_path:
+        _resource_registry = ResourceRegistry(m_config.fitting.resource_cache_path)
+    return _resource_registry
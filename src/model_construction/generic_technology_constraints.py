@@ -1,5 +1,4 @@
 from pyomo.environ import *
-from pyomo.environ import units as u
 from pyomo.gdp import *
 import warnings
 import src.config_model as m_config
@@ -183,6 +182,35 @@ def constraints_tec_STOR(model, b_tec, tec_data):
     - If ``allow_only_one_direction == 1``, then only input or output can be unequal to zero in each respective time
       step (otherwise, simultanous charging and discharging can lead to unwanted 'waste' of energy/material).
 
+    **Inter-period linking:**
+
+    If the model is constructed from clustered data (the model has the set of calendar periods :math:`P`, see
+    :class:`~src.energyhub.EnergyHub`), coupling the first and last time step of the (shortened) horizon does not allow
+    to shift energy between periods. Instead, the storage level is split into an intra-period level and an
+    inter-period level (Kotzur et al., 2018):
+
+    - :math:`E_t` is the intra-period storage level, i.e. the change of the storage level since the beginning of the
+      typical period :math:`k` containing :math:`t`. It starts at zero in each typical period and can be negative:
+
+      .. math::
+        E_{t} = {\\eta}_{in} * Input_{t} - 1 / {\\eta}_{out} * Output_{t} \\quad \\text{for the first time step of each
+        typical period}
+
+    - The inter-period storage level :math:`E^{inter}_p` is the storage level at the beginning of period :math:`p` of
+      the original time horizon. It decays over the period with
+      :math:`d_k = \\prod_{t \\in k} (1 - {\\lambda} - ambientLossFactor_t)` and is chained through the original
+      sequence of periods (cyclic):
+
+      .. math::
+        E^{inter}_{p+1} = E^{inter}_{p} * d_{k(p)} + E_{t_{end}(k(p))}
+
+    - The size constraint is formulated with the maximal and minimal intra-period level of each typical period,
+      :math:`\\overline{E}_k \\geq E_t \\geq \\underline{E}_k, \\overline{E}_k \\geq 0 \\geq \\underline{E}_k`:
+
+      .. math::
+        E^{inter}_{p} + \\overline{E}_{k(p)} \\leq S \\\\
+        E^{inter}_{p} * d_{k(p)} + \\underline{E}_{k(p)} \\geq 0
+
     :param obj model: instance of a pyomo model
     :param obj b_tec: technology block
     :param tec_data: technology data
@@ -195,8 +223,13 @@ def constraints_tec_STOR(model, b_tec, tec_data):
     else:
         allow_only_one_direction = 0
 
+    inter_period_linking = hasattr(model, 'set_calendar_periods')
+
     # Additional decision variables
-    b_tec.var_storage_level = Var(model.set_t, b_tec.set_input_carriers, domain=NonNegativeReals)
+    if inter_period_linking:
+        b_tec.var_storage_level = Var(model.set_t, b_tec.set_input_carriers, domain=Reals)
+    else:
+        b_tec.var_storage_level = Var(model.set_t, b_tec.set_input_carriers, domain=NonNegativeReals)
 
     # Additional parameters
     b_tec.para_eta_in = Param(domain=NonNegativeReals, initialize=tec_fit['eta_in'])
@@ -209,13 +242,21 @@ def constraints_tec_STOR(model, b_tec, tec_data):
     b_tec.para_ambient_loss_factor = Param(model.set_t, domain=NonNegativeReals, rule=init_ambient_loss_factor)
 
     # Size constraint
-    def init_size_constraint(const, t, car):
-        return b_tec.var_storage_level[t, car] <= b_tec.var_size
-    b_tec.const_size = Constraint(model.set_t, b_tec.set_input_carriers, rule=init_size_constraint)
+    if inter_period_linking:
+        b_tec = _constraints_tec_STOR_inter_period(model, b_tec)
+    else:
+        def init_size_constraint(const, t, car):
+            return b_tec.var_storage_level[t, car] <= b_tec.var_size
+        b_tec.const_size = Constraint(model.set_t, b_tec.set_input_carriers, rule=init_size_constraint)
 
     # Storage level calculation
     def init_storage_level(const, t, car):
-        if t == 1: # couple first and last time interval
+        if inter_period_linking and (t - 1) % value(model.para_period_length) == 0:
+            # intra-period storage level starts at zero in each typical period
+            return b_tec.var_storage_level[t, car] == \
+                b_tec.para_eta_in * b_tec.var_input[t, car] - \
+                1 / b_tec.para_eta_out * b_tec.var_output[t, car]
+        elif t == 1: # couple first and last time interval
             return b_tec.var_storage_level[t, car] == \
                   b_tec.var_storage_level[max(model.set_t), car] * (1 - b_tec.para_eta_lambda) - \
                   b_tec.para_ambient_loss_factor[max(model.set_t)] * b_tec.var_storage_level[max(model.set_t), car] + \
@@ -260,4 +301,72 @@ def constraints_tec_STOR(model, b_tec, tec_data):
         return b_tec.var_output[t, car] <= b_tec.para_discharge_max * b_tec.var_size
     b_tec.const_max_discharge = Constraint(model.set_t, b_tec.set_input_carriers, rule=init_maximal_discharge)
 
-    return b_tec
\ No newline at end of file
+    return b_tec
+
+
+def _constraints_tec_STOR_inter_period(model, b_tec):
+    """
+    Adds the inter-period storage level and the size constraints of a storage technology for clustered data (see \
+    :func:`constraints_tec_STOR`)
+
+    :param obj model: instance of a pyomo model
+    :param obj b_tec: technology block
+    :return: technology block
+    """
+    period_length = value(model.para_period_length)
+
+    def period_of_timestep(t):
+        return int((t - 1) / period_length) + 1
+
+    # Decay of the storage level over each typical period
+    def init_period_decay(para, k):
+        decay = 1
+        for t in range((k - 1) * period_length + 1, k * period_length + 1):
+            decay = decay * (1 - value(b_tec.para_eta_lambda) - value(b_tec.para_ambient_loss_factor[t]))
+        return decay
+    b_tec.para_period_decay = Param(model.set_typical_periods, domain=NonNegativeReals, rule=init_period_decay)
+
+    # Storage level at the beginning of each period and maximal/minimal intra-period level
+    b_tec.var_storage_level_inter = Var(model.set_calendar_periods, b_tec.set_input_carriers,
+                                        domain=NonNegativeReals)
+    b_tec.var_storage_level_intra_max = Var(model.set_typical_periods, b_tec.set_input_carriers,
+                                            domain=NonNegativeReals)
+    b_tec.var_storage_level_intra_min = Var(model.set_typical_periods, b_tec.set_input_carriers,
+                                            domain=NonPositiveReals)
+
+    def init_intra_max(const, t, car):
+        return b_tec.var_storage_level[t, car] <= b_tec.var_storage_level_intra_max[period_of_timestep(t), car]
+    b_tec.const_storage_level_intra_max = Constraint(model.set_t, b_tec.set_input_carriers, rule=init_intra_max)
+
+    def init_intra_min(const, t, car):
+        return b_tec.var_storage_level[t, car] >= b_tec.var_storage_level_intra_min[period_of_timestep(t), car]
+    b_tec.const_storage_level_intra_min = Constraint(model.set_t, b_tec.set_input_carriers, rule=init_intra_min)
+
+    # Chain inter-period storage levels through the original sequence of periods
+    def init_storage_level_inter(const, p, car):
+        k = model.para_period_sequence[p]
+        if p == max(model.set_calendar_periods): # couple last and first period
+            p_next = min(model.set_calendar_periods)
+        else:
+            p_next = p + 1
+        return b_tec.var_storage_level_inter[p_next, car] == \
+            b_tec.var_storage_level_inter[p, car] * b_tec.para_period_decay[k] + \
+            b_tec.var_storage_level[k * period_length, car]
+    b_tec.const_storage_level_inter = Constraint(model.set_calendar_periods, b_tec.set_input_carriers,
+                                                 rule=init_storage_level_inter)
+
+    # Size constraints
+    def init_size_constraint_max(const, p, car):
+        k = model.para_period_sequence[p]
+        return b_tec.var_storage_level_inter[p, car] + b_tec.var_storage_level_intra_max[k, car] <= b_tec.var_size
+    b_tec.const_size_max = Constraint(model.set_calendar_periods, b_tec.set_input_carriers,
+                                      rule=init_size_constraint_max)
+
+    def init_size_constraint_min(const, p, car):
+        k = model.para_period_sequence[p]
+        return b_tec.var_storage_level_inter[p, car] * b_tec.para_period_decay[k] + \
+            b_tec.var_storage_level_intra_min[k, car] >= 0
+    b_tec.const_size_min = Constraint(model.set_calendar_periods, b_tec.set_input_carriers,
+                                      rule=init_size_constraint_min)
+
+    return b_tec
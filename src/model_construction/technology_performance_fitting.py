@@ -4,9 +4,15 @@ from scipy import optimize
 import pvlib
 import datetime
 import pytz
-from timezonefinder import TimezoneFinder
 import pandas as pd
-from scipy.interpolate import interp1d
+from .fitting_resources import get_resource_registry
+
+# Grid of orientations of PV systems with optimal orientation
+PV_TILTS = np.arange(0, 91, 5)
+PV_AZIMUTHS = np.arange(90, 271, 10)
+
+# Wind speeds of the power curves in the wind turbine data
+WT_POWER_CURVE_SPEEDS = np.linspace(0, 35, 71)
 
 
 def fit_tec_performance(technology, tec=None, climate_data=None):
@@ -51,11 +57,15 @@ def fit_tec_performance(technology, tec=None, climate_data=None):
 def perform_fitting_PV(climate_data, **kwargs):
     """
     Calculates capacity factors and specific area requirements for a PV system
+
+    The orientation of the system is given by ``system_data['tilt']`` and ``system_data['surface_azimuth']``. If \
+    either of them is 'optimal', it is chosen from ``PV_TILTS`` and ``PV_AZIMUTHS`` respectively, such that the \
+    capacity factor is maximized (see :func:`~optimize_PV_orientation`).
+
     :param climate_data: contains information on weather data, and location
-    :param PV_type: (optional) can specify a certain type of module
+    :param system_data: (optional) dict with tilt, surface_azimuth, module_name and inverter_eff
     :return: returns capacity factors and specific area requirements
     """
-    # Todo: get perfect tilting angle
     if not kwargs.__contains__('system_data'):
         system_data = dict()
         system_data['tilt'] = 18
@@ -65,97 +75,308 @@ def perform_fitting_PV(climate_data, **kwargs):
     else:
         system_data = kwargs['system_data']
 
-    def define_pv_system(location, system_data):
-        """
-        defines the pv system
-        :param location: location information (latitude, longitude, altitude, time zone)
-        :param system_data: contains data on tilt, surface_azimuth, module_name, inverter efficiency
-        :return: returns PV model chain, peak power, specific area requirements
-        """
-        module_database = pvlib.pvsystem.retrieve_sam('CECMod')
-        module = module_database[system_data['module_name']]
-
-        # Define temperature losses of module
-        temperature_model_parameters = pvlib.temperature.TEMPERATURE_MODEL_PARAMETERS['sapm']['open_rack_glass_glass']
-
-        # Create PV model chain
-        inverter_parameters = {'pdc0': 5000, 'eta_inv_nom': system_data['inverter_eff']}
-        system = pvlib.pvsystem.PVSystem(surface_tilt=system_data['tilt'],
-                                         surface_azimuth=system_data['surface_azimuth'],
-                                         module_parameters=module,
-                                         inverter_parameters=inverter_parameters,
-                                         temperature_model_parameters=temperature_model_parameters)
-
-        pv_model = pvlib.modelchain.ModelChain(system, location, spectral_model="no_loss", aoi_model="physical")
-        peakpower = module.STC
-        specific_area = module.STC / module.A_c / 1000 / 1000
-
-        return pv_model, peakpower, specific_area
-
-    # Define parameters for convinience
-    lon = climate_data['longitude']
-    lat = climate_data['latitude']
-    alt = climate_data['altitude']
+    if system_data['tilt'] == 'optimal' or system_data['surface_azimuth'] == 'optimal':
+        tilts = PV_TILTS if system_data['tilt'] == 'optimal' else [system_data['tilt']]
+        azimuths = PV_AZIMUTHS if system_data['surface_azimuth'] == 'optimal' else [system_data['surface_azimuth']]
+        fitting = optimize_PV_orientation(climate_data, tilts, azimuths, system_data['module_name'],
+                                          system_data['inverter_eff'])
+        del fitting['orientations']
+        return fitting
 
-    # Get location
-    tf = TimezoneFinder()
-    tz = tf.timezone_at(lng=lon, lat=lat)
-    location = pvlib.location.Location(lat, lon, tz=tz, altitude=alt)
+    capacity_factor, specific_area = perform_fitting_PV_batch(climate_data,
+                                                              [system_data['tilt']],
+                                                              [system_data['surface_azimuth']],
+                                                              [system_data['module_name']],
+                                                              system_data['inverter_eff'])
 
-    # Initialize pv_system
-    pv_model, peakpower, specific_area = define_pv_system(location, system_data)
+    # return fit
+    fitting = dict()
+    fitting['capacity_factor'] = pd.Series(capacity_factor[0, 0, 0], index=climate_data['dataframe'].index)
+    fitting['specific_area'] = specific_area[0]
+    return fitting
 
-    # Run system with climate data
-    pv_model.run_model(climate_data['dataframe'])
+def perform_fitting_PV_batch(climate_data, tilts, azimuths, module_names, inverter_eff=0.96):
+    """
+    Calculates capacity factors of PV systems for a grid of tilts, azimuths and module types at one location
 
-    # Calculate cap factors
-    power = pv_model.results.ac.p_mp
-    capacity_factor = power / peakpower
+    The calculation follows the pvlib ModelChain (Hay-Davies transposition, physical AOI losses, SAPM cell \
+    temperature, CEC single diode model, PVWatts inverter), but the solar position and the irradiance components \
+    are calculated once per location and all orientations are evaluated at once. The maximum power point is \
+    calculated with Newton's method instead of the golden section search of the ModelChain (the results agree to \
+    numerical precision).
+
+    :param climate_data: contains information on weather data, and location
+    :param list tilts: tilts of the modules in degree
+    :param list azimuths: azimuths of the modules in degree (180 = south)
+    :param list module_names: names of the modules in the CEC module database
+    :param float inverter_eff: nominal efficiency of the inverter
+    :return: array of capacity factors with dimensions (modules, tilts, azimuths, time steps) and array of \
+    specific area requirements of the modules
+    """
+    site = _prepare_PV_site(climate_data)
+    tilts = np.asarray(tilts, dtype=float)
+    azimuths = np.asarray(azimuths, dtype=float)
+    surface_tilt = np.repeat(tilts, len(azimuths))[:, np.newaxis]
+    surface_azimuth = np.tile(azimuths, len(tilts))[:, np.newaxis]
+
+    # Irradiance on all orientations, dimensions (orientations, time steps)
+    aoi = pvlib.irradiance.aoi(surface_tilt, surface_azimuth, site['zenith'], site['azimuth'])
+    irradiance = pvlib.irradiance.get_total_irradiance(surface_tilt, surface_azimuth, site['zenith'], site['azimuth'],
+                                                       site['dni'], site['ghi'], site['dhi'],
+                                                       dni_extra=site['dni_extra'], albedo=0.25,
+                                                       model='haydavies')
+    aoi_modifier = pvlib.iam.physical(aoi)
+    temperature_model_parameters = pvlib.temperature.TEMPERATURE_MODEL_PARAMETERS['sapm']['open_rack_glass_glass']
+    cell_temperature = pvlib.temperature.sapm_cell(irradiance['poa_global'], site['temp_air'], site['wind_speed'],
+                                                   **temperature_model_parameters)
+
+    capacity_factor = np.empty((len(module_names), len(tilts), len(azimuths), len(site['ghi'])))
+    specific_area = np.empty(len(module_names))
+    modules = get_resource_registry().get_pv_modules(module_names)
+    for i, module in enumerate(modules):
+        effective_irradiance = irradiance['poa_direct'] * aoi_modifier + \
+                               module.get('FD', 1.) * irradiance['poa_diffuse']
+        # The maximum power point is only calculated for time steps with irradiance (otherwise zero)
+        effective_irradiance = effective_irradiance.ravel()
+        daylight = effective_irradiance > 0
+        diode_parameters = pvlib.pvsystem.calcparams_cec(effective_irradiance[daylight],
+                                                         cell_temperature.ravel()[daylight],
+                                                         module['alpha_sc'], module['a_ref'], module['I_L_ref'],
+                                                         module['I_o_ref'], module['R_sh_ref'], module['R_s'],
+                                                         module['Adjust'])
+        power_dc = np.zeros(effective_irradiance.shape)
+        power_dc[daylight] = np.nan_to_num(pvlib.pvsystem.max_power_point(*diode_parameters, method='newton')['p_mp'])
+        power_ac = np.nan_to_num(pvlib.inverter.pvwatts(power_dc, 5000, inverter_eff))
+        capacity_factor[i] = (power_ac / module['STC']).reshape(len(tilts), len(azimuths), -1)
+        specific_area[i] = module['STC'] / module['A_c'] / 1000 / 1000
+
+    return capacity_factor, specific_area
+
+def optimize_PV_orientation(climate_data, tilts=None, azimuths=None, module_name='SunPower_SPR_X20_327',
+                            inverter_eff=0.96):
+    """
+    Chooses the orientation of a PV system with the maximal capacity factor from a grid of tilts and azimuths
+
+    :param climate_data: contains information on weather data, and location
+    :param list tilts: (optional) tilts in degree, ``PV_TILTS`` if not supplied
+    :param list azimuths: (optional) azimuths in degree, ``PV_AZIMUTHS`` if not supplied
+    :param str module_name: name of the module in the CEC module database
+    :param float inverter_eff: nominal efficiency of the inverter
+    :return: returns capacity factors and specific area requirements of the optimal orientation, the optimal tilt \
+    and azimuth and the mean capacity factors of all orientations (data frame with tilts as index and azimuths as \
+    columns)
+    """
+    tilts = PV_TILTS if tilts is None else tilts
+    azimuths = PV_AZIMUTHS if azimuths is None else azimuths
+    capacity_factor, specific_area = perform_fitting_PV_batch(climate_data, tilts, azimuths, [module_name],
+                                                              inverter_eff)
+    mean_capacity_factor = capacity_factor[0].mean(axis=2)
+    tilt_optimal, azimuth_optimal = np.unravel_index(np.argmax(mean_capacity_factor), mean_capacity_factor.shape)
 
     # return fit
     fitting = dict()
-    fitting['capacity_factor'] = capacity_factor
-    fitting['specific_area'] = specific_area
+    fitting['capacity_factor'] = pd.Series(capacity_factor[0, tilt_optimal, azimuth_optimal],
+                                           index=climate_data['dataframe'].index)
+    fitting['specific_area'] = specific_area[0]
+    fitting['tilt'] = float(tilts[tilt_optimal])
+    fitting['surface_azimuth'] = float(azimuths[azimuth_optimal])
+    fitting['orientations'] = pd.DataFrame(mean_capacity_factor, index=list(tilts), columns=list(azimuths))
     return fitting
 
+def screen_PV_orientations(climate_data, tilts=None, azimuths=None, module_names=None, inverter_eff=0.96):
+    """
+    Calculates the mean capacity factors of PV systems for all orientations and modules at several locations
+
+    :param dict climate_data: climate data of each location (e.g. node names as keys)
+    :param list tilts: (optional) tilts in degree, ``PV_TILTS`` if not supplied
+    :param list azimuths: (optional) azimuths in degree, ``PV_AZIMUTHS`` if not supplied
+    :param list module_names: (optional) names of the modules in the CEC module database
+    :param float inverter_eff: nominal efficiency of the inverter
+    :return: data frame with mean capacity factor per location, module, tilt and azimuth
+    """
+    tilts = PV_TILTS if tilts is None else tilts
+    azimuths = PV_AZIMUTHS if azimuths is None else azimuths
+    module_names = ['SunPower_SPR_X20_327'] if module_names is None else module_names
+
+    screening = []
+    for location in climate_data:
+        capacity_factor, specific_area = perform_fitting_PV_batch(climate_data[location], tilts, azimuths,
+                                                                  module_names, inverter_eff)
+        index = pd.MultiIndex.from_product([[location], module_names, list(tilts), list(azimuths)],
+                                           names=['Location', 'Module', 'Tilt', 'Azimuth'])
+        screening.append(pd.DataFrame({'Capacity_Factor': capacity_factor.mean(axis=3).ravel()}, index=index))
+    return pd.concat(screening).reset_index()
+
+def _prepare_PV_site(climate_data):
+    """
+    Calculates the solar position and irradiance components of a location (independent of the PV system)
+
+    :param climate_data: contains information on weather data, and location
+    :return: dict of numpy arrays (zenith, azimuth, dni, ghi, dhi, dni_extra, temp_air, wind_speed)
+    """
+    lon = climate_data['longitude']
+    lat = climate_data['latitude']
+    alt = climate_data['altitude']
+    weather = climate_data['dataframe']
+
+    tz = get_resource_registry().get_timezone(lon, lat)
+    location = pvlib.location.Location(lat, lon, tz=tz, altitude=alt)
+    if 'temp_air' in weather:
+        solar_position = location.get_solarposition(weather.index, method='nrel_numpy',
+                                                    temperature=weather['temp_air'])
+    else:
+        solar_position = location.get_solarposition(weather.index, method='nrel_numpy')
+
+    # Wind speeds at module height are not available (ws10 is at 10 m), i.e. no wind cooling as in the ModelChain
+    site = dict()
+    site['zenith'] = solar_position['apparent_zenith'].to_numpy()
+    site['azimuth'] = solar_position['azimuth'].to_numpy()
+    site['dni'] = weather['dni'].to_numpy()
+    site['ghi'] = weather['ghi'].to_numpy()
+    site['dhi'] = weather['dhi'].to_numpy()
+    site['dni_extra'] = pvlib.irradiance.get_extra_radiation(weather.index).to_numpy()
+    site['temp_air'] = weather['temp_air'].to_numpy() if 'temp_air' in weather else 20
+    site['wind_speed'] = weather['wind_speed'].to_numpy() if 'wind_speed' in weather else 0
+    return site
+
 def perform_fitting_WT(climate_data, turbine_model, hubheight):
-    # Load data for wind turbine type
-    WT_data = pd.read_csv(r'.\data\technology_data\WT_data\WT_data.csv', delimiter=';')
-    WT_data = WT_data[WT_data['TurbineName'] == turbine_model]
-
-    # Load wind speed and correct for height
-    ws = climate_data['dataframe']['ws10']
-
-    #TODO: make power exponent choice possible
-    #TODO: Make different heights possible
-    alpha = 1/7
-    # if data.node_data.windPowerExponent(node) >= 0
-    #     alpha = data.node_data.windPowerExponent(node);
-    # else:
-    #     if data.node_data.offshore(node) == 1:
-    #         alpha = 0.45;
-    #     else:
-    #         alpha = 1 / 7;
-
-    if hubheight > 0:
-        ws = ws * (hubheight / 10) ** alpha
-
-    # Make power curve
-    rated_power =  WT_data.iloc[0]['RatedPowerkW']
-    x = np.linspace(0, 35, 71)
-    y = WT_data.iloc[:,13:84]
-    y = y.to_numpy()
-
-    f = interp1d(x, y)
-    capacity_factor = f(ws) / rated_power
+    """
+    Calculates capacity factors and rated power of a wind turbine
+
+    Wind speeds at 10 m (column ``ws10`` of the climate data) are corrected to the hub height with a power law. The \
+    exponent can be set per node with ``climate_data['wind_shear_exponent']`` (default: 1/7). See \
+    :func:`~perform_fitting_WT_batch`.
+
+    :param climate_data: contains information on weather data, and location
+    :param str turbine_model: name of the turbine in ``./data/technology_data/WT_data/WT_data.csv``
+    :param float hubheight: hub height in m (no height correction for hub heights <= 0)
+    :return: returns capacity factors and rated power
+    """
+    if 'wind_shear_exponent' in climate_data:
+        alpha = climate_data['wind_shear_exponent']
+    else:
+        alpha = 1/7
+
+    capacity_factor, rated_power = perform_fitting_WT_batch(climate_data['dataframe']['ws10'].to_numpy(),
+                                                            [turbine_model], [hubheight], alpha)
 
     # return fit
     fitting = dict()
-    fitting['capacity_factor'] = capacity_factor[0]
-    fitting['rated_power'] = rated_power / 1000
+    fitting['capacity_factor'] = capacity_factor[0, 0, 0]
+    fitting['rated_power'] = rated_power[0]
 
     return fitting
 
+def perform_fitting_WT_batch(wind_speeds, turbine_models, hubheights, alpha=1/7, measurement_height=10):
+    """
+    Calculates capacity factors of several wind turbines at several hub heights and locations in one pass
+
+    Wind speeds are corrected from the measurement height to each hub height with a power law \
+    :math:`v_h = v (h / h_{m})^{\\alpha}` (no correction for hub heights <= 0) and the power curves of all turbines \
+    are interpolated linearly. Above the highest wind speed of the power curves (35 m/s), the capacity factor is zero.
+
+    :param wind_speeds: wind speeds at the measurement height with dimensions (locations, time steps) or (time steps)
+    :param list turbine_models: names of the turbines in ``./data/technology_data/WT_data/WT_data.csv``
+    :param list hubheights: hub heights in m
+    :param alpha: wind shear exponent, either one value or one value per location (e.g. differing for onshore and \
+    offshore locations)
+    :param float measurement_height: height of the wind speed measurements in m
+    :return: array of capacity factors with dimensions (locations, turbines, hub heights, time steps) and array of \
+    rated powers of the turbines in MW
+    """
+    wind_speeds = np.atleast_2d(np.asarray(wind_speeds, dtype=float))
+    power_curves, rated_power = _get_power_curves(turbine_models)
+    lower, weight, in_range = _interpolate_wind_speeds(wind_speeds, hubheights, alpha, measurement_height)
+
+    normalized_curves = power_curves / rated_power[:, np.newaxis]
+    capacity_factor = normalized_curves[:, lower] * (1 - weight) + normalized_curves[:, lower + 1] * weight
+    capacity_factor = np.where(in_range, capacity_factor, 0)
+
+    return np.moveaxis(capacity_factor, 0, 1), rated_power / 1000
+
+def screen_wind_turbines(wind_speeds, hubheights, turbine_models=None, alpha=1/7, measurement_height=10):
+    """
+    Calculates the mean capacity factors of wind turbines at all locations and hub heights (e.g. to select turbines \
+    for candidate sites). The results equal the mean of the profiles of :func:`~perform_fitting_WT_batch`, but are \
+    calculated without the profiles of each turbine.
+
+    :param wind_speeds: wind speeds at the measurement height, data frame or array with dimensions (locations, time \
+    steps). The index of a data frame is used as location names.
+    :param list hubheights: hub heights in m
+    :param list turbine_models: (optional) names of the turbines, all turbines in the turbine data if not supplied
+    :param alpha: wind shear exponent, either one value or one value per location
+    :param float measurement_height: height of the wind speed measurements in m
+    :return: data frame with mean capacity factor and full load hours per location, turbine and hub height
+    """
+    if isinstance(wind_speeds, pd.DataFrame):
+        locations = wind_speeds.index.tolist()
+    else:
+        locations = list(range(np.atleast_2d(wind_speeds).shape[0]))
+    wind_speeds = np.atleast_2d(np.asarray(wind_speeds, dtype=float))
+    if turbine_models is None:
+        turbine_models = get_resource_registry().get_turbine_data()['TurbineName'].drop_duplicates().tolist()
+    power_curves, rated_power = _get_power_curves(turbine_models)
+    lower, weight, in_range = _interpolate_wind_speeds(wind_speeds, hubheights, alpha, measurement_height)
+
+    # The mean capacity factor is linear in the power curve: sum the interpolation weights of each wind speed of the
+    # power curves over time, dimensions (locations, hub heights, wind speeds)
+    nr_speeds = len(WT_POWER_CURVE_SPEEDS)
+    weight = np.where(in_range, weight, 0)
+    offset = np.arange(lower.shape[0] * lower.shape[1]).reshape(lower.shape[0], lower.shape[1], 1) * nr_speeds
+    speed_weights = np.bincount((lower + offset).ravel(), (np.where(in_range, 1 - weight, 0)).ravel(),
+                                minlength=offset.size * nr_speeds) + \
+                    np.bincount((lower + 1 + offset).ravel(), weight.ravel(), minlength=offset.size * nr_speeds)
+    speed_weights = speed_weights.reshape(lower.shape[0], lower.shape[1], nr_speeds)
+
+    normalized_curves = power_curves / rated_power[:, np.newaxis]
+    mean_capacity_factor = speed_weights @ normalized_curves.T / wind_speeds.shape[1]
+    mean_capacity_factor = np.moveaxis(mean_capacity_factor, 2, 1)
+
+    index = pd.MultiIndex.from_product([locations, turbine_models, list(hubheights)],
+                                       names=['Location', 'Turbine', 'Hub_Height'])
+    screening = pd.DataFrame({'Capacity_Factor': mean_capacity_factor.ravel()}, index=index)
+    screening['Full_Load_Hours'] = screening['Capacity_Factor'] * wind_speeds.shape[1]
+    return screening.reset_index()
+
+def _interpolate_wind_speeds(wind_speeds, hubheights, alpha, measurement_height):
+    """
+    Corrects wind speeds for hub heights and returns their position on the wind speeds of the power curves
+
+    :param wind_speeds: wind speeds at the measurement height with dimensions (locations, time steps)
+    :param list hubheights: hub heights in m
+    :param alpha: wind shear exponent, either one value or one value per location
+    :param float measurement_height: height of the wind speed measurements in m
+    :return: index of the lower wind speed, weight of the upper wind speed and if the wind speed is within the \
+    power curves, all with dimensions (locations, hub heights, time steps)
+    """
+    hubheights = np.asarray(hubheights, dtype=float)
+    alpha = np.broadcast_to(np.asarray(alpha, dtype=float), (wind_speeds.shape[0],))
+
+    # Correct wind speeds for hub heights (no correction for hub heights <= 0)
+    height_factor = np.where(hubheights > 0,
+                             (np.maximum(hubheights, 0) / measurement_height) ** alpha[:, np.newaxis], 1)
+    ws = wind_speeds[:, np.newaxis, :] * height_factor[:, :, np.newaxis]
+
+    # Position on the equidistant wind speeds of the power curves
+    position = ws / (WT_POWER_CURVE_SPEEDS[1] - WT_POWER_CURVE_SPEEDS[0])
+    in_range = (position >= 0) & (position <= len(WT_POWER_CURVE_SPEEDS) - 1)
+    lower = np.clip(np.floor(position).astype(int), 0, len(WT_POWER_CURVE_SPEEDS) - 2)
+    weight = np.where(in_range, position - lower, 0)
+    return lower, weight, in_range
+
+def _get_power_curves(turbine_models):
+    """
+    Returns the power curves and rated powers of wind turbines
+
+    :param list turbine_models: names of the turbines
+    :return: array of power curves in kW with dimensions (turbines, wind speeds) and array of rated powers in kW
+    """
+    registry = get_resource_registry()
+    turbines = [turbine.iloc[0] for turbine in registry.get_turbines(turbine_models)]
+    power_curves = np.array([turbine.iloc[13:84].to_numpy(dtype=float) for turbine in turbines])
+    rated_power = np.array([turbine['RatedPowerkW'] for turbine in turbines], dtype=float)
+    return power_curves, rated_power
+
 def perform_fitting_tec_CONV2(tec_data):
     """
     Fits conversion technology type 2 and returns fitted parameters as a dict
@@ -1,14 +1,86 @@
 from pyomo.gdp import *
-import time
+import itertools
+import numpy as np
+from types import SimpleNamespace
+import pint
 import src.config_model as m_config
+from src.instrumentation import phase
 from pyomo.environ import *
+from pyomo.environ import units as u
+
+# Units of model components (see get_units)
+UNIT_NAMES = ['dimensionless', 'MW', 'MWh', 't', 'EUR', 'EUR_per_MW', 'EUR_per_MWh', 't_per_MWh']
+
+# Units resolved for m_config.construction.units = 1 and 0
+_units = {}
 
 
 def perform_disjunct_relaxation(component):
     print('Big-M Transformation...')
-    start = time.time()
-    xfrm = TransformationFactory('gdp.bigm')
-    xfrm.apply_to(component)
-    m_config.presolve.big_m_transformation_required = 0
-    print('Reading in data completed in ' + str(time.time() - start) + ' s')
-    return component
\ No newline at end of file
+    with phase('big_m', component) as record:
+        xfrm = TransformationFactory('gdp.bigm')
+        xfrm.apply_to(component)
+        m_config.presolve.big_m_transformation_required = 0
+    print('Big-M Transformation completed in ' + str(record['wall_time']) + ' s')
+    return component
+
+
+def get_units():
+    """
+    Returns the units of model components (see UNIT_NAMES), which are resolved once. With \
+    ``m_config.construction.units = 0``, all units are None, such that components are constructed without units and \
+    the unit registry of pint is not loaded. Units are not checked while solving, they can be validated offline with \
+    :func:`~src.unit_validation.validate_units`.
+
+    :return: namespace of units (e.g. ``get_units().EUR_per_MWh``)
+    """
+    with_units = bool(m_config.construction.units)
+    if with_units not in _units:
+        if with_units:
+            try:
+                u.load_definitions_from_strings(['EUR = [currency]'])
+            except pint.errors.DefinitionSyntaxError:
+                pass
+            _units[with_units] = SimpleNamespace(dimensionless=u.dimensionless,
+                                                 MW=u.MW,
+                                                 MWh=u.MWh,
+                                                 t=u.t,
+                                                 EUR=u.EUR,
+                                                 EUR_per_MW=u.EUR / u.MW,
+                                                 EUR_per_MWh=u.EUR / u.MWh,
+                                                 t_per_MWh=u.t / u.MWh)
+        else:
+            _units[with_units] = SimpleNamespace(**{name: None for name in UNIT_NAMES})
+    return _units[with_units]
+
+
+def time_series_to_array(frame, columns):
+    """
+    Converts time series of a data frame to a numpy array.
+
+    Columns are returned in the order specified, such that the array can be matched with a pyomo set.
+
+    :param pd.DataFrame frame: data frame containing time series in its columns
+    :param columns: columns to convert (e.g. a set of carriers)
+    :return: numpy array of shape (time steps, columns)
+    """
+    return frame[list(columns)].to_numpy(dtype=float)
+
+
+def array_to_dict(values, set_t, set_carriers=None):
+    """
+    Converts an array of time series to a dict that can be used to initialize a pyomo component.
+
+    Initializing components from a dict is considerably faster than calling a rule for each index. Only the first \
+    ``len(set_t)`` entries of the array are used.
+
+    :param values: array with time steps in the first and (optionally) carriers in the second dimension
+    :param set_t: set of time steps, starting at 1
+    :param set_carriers: (optional) set of carriers, in the same order as the columns of values
+    :return: dict with index (t) or (t, car) as keys
+    """
+    values = np.asarray(values, dtype=float)[:len(set_t)]
+    if set_carriers is None:
+        return dict(zip(set_t, values.tolist()))
+    else:
+        return dict(zip(itertools.product(set_t, set_carriers), values.ravel().tolist()))
@@ -0,0 +1,3 @@
+from .rolling_horizon import *
+from .solver_session import *
+from .pareto import *
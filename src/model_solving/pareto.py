@@ -0,0 +1,312 @@
+from pyomo.environ import *
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import dill as pickle
+import numpy as np
+import pandas as pd
+import os
+import src.config_model as m_config
+import time
+
+# Energyhub instance of a worker process
+_worker_energyhub = None
+
+# Termination conditions of solves that are used in the pareto front
+SOLVED_TERMINATION_CONDITIONS = ['optimal', 'locallyOptimal', 'globallyOptimal', 'feasible']
+
+
+def solve_pareto(energyhub):
+    """
+    Calculates the pareto front of total cost and emissions with the epsilon-constraint method.
+
+    First, the two anchor points are solved with the energyhub instance: the minimal cost and the minimal \
+    emissions. The emissions are the net emissions or the positive emissions (``m_config.pareto.emissions`` can be \
+    'emissions_net' or 'emissions_pos'). The range between the emissions of both anchor points is then divided into \
+    ``m_config.pareto.nr_points - 1`` emission limits. For each limit, the cost is minimized with the emissions \
+    constrained to the limit (the last limit is the minimal emission, i.e. the minimal cost at minimal emissions).
+
+    The points are solved in parallel in ``m_config.pareto.nr_processes`` processes (0 uses all available cores). \
+    Each process holds a copy of the energyhub instance and reuses its model (and solver session) for all points \
+    it solves, only the emission limit is replaced. Each point is warm started with the solution of the closest \
+    point solved so far. Note that on Windows, scripts using parallel processes need to be guarded by \
+    ``if __name__ == '__main__':``.
+
+    Points that cannot be solved (e.g. infeasible or failed solves) are kept in the front with NaN values, their \
+    termination condition is given in the column 'Termination_Condition' and their results are None. If minimizing \
+    the emissions fails, only the minimal cost point is calculated.
+
+    :param EnergyHub energyhub: instance of the energyhub class with a constructed model
+    :return: data frame of the pareto front and a list of ResultsHandles of each point (in the order of the front)
+    """
+    nr_points = m_config.pareto.nr_points
+    emissions = m_config.pareto.emissions
+    if emissions not in ['emissions_net', 'emissions_pos']:
+        raise Exception('The pareto front can only be calculated for emissions_net or emissions_pos.')
+    if nr_points < 2:
+        raise Exception('The pareto front needs at least two points.')
+
+    print('Calculating Pareto Front...')
+    start_pareto = time.time()
+
+    # Anchor points
+    termination = _solve(energyhub, 'cost')
+    emissions_max = _get_emissions(energyhub.model, emissions, termination)
+    if emissions_max is None:
+        raise Exception('The pareto front cannot be calculated, as minimizing cost failed (' + termination + ').')
+    results_min_cost = energyhub.write_results()
+    solved_points = {emissions_max: _get_var_values(energyhub.model)}
+    anchor_points = [{'emission_limit': np.nan, 'emissions': emissions_max, 'results': results_min_cost,
+                      'solve_time': np.nan, 'termination': termination}]
+
+    termination = _solve(energyhub, emissions)
+    emissions_min = _get_emissions(energyhub.model, emissions, termination)
+    if emissions_min is None:
+        print('Minimizing ' + emissions + ' failed (' + termination + '), only the minimal cost point is calculated.')
+        anchor_points.append(_get_failed_point(np.nan, np.nan, termination))
+        emission_limits = []
+    else:
+        solved_points[emissions_min] = _get_var_values(energyhub.model)
+        emission_limits = list(np.linspace(emissions_max, emissions_min, nr_points)[1:])
+
+    # Emission limits, ordered such that points close to already dispatched points are solved first
+    dispatch_order = []
+    while emission_limits:
+        dispatch_order.append(emission_limits.pop(-1))
+        if emission_limits:
+            dispatch_order.append(emission_limits.pop(0))
+
+    # Solve points
+    nr_processes = m_config.pareto.nr_processes
+    if nr_processes == 0:
+        nr_processes = os.cpu_count()
+    nr_processes = min(nr_processes, len(dispatch_order))
+    points = []
+    if dispatch_order:
+        energyhub_pickled = pickle.dumps(energyhub)
+    if dispatch_order and nr_processes <= 1:
+        # A copy of the energyhub instance is used, such that the instance passed is not changed
+        energyhub_copy = pickle.loads(energyhub_pickled)
+        for emission_limit in dispatch_order:
+            point = _solve_point(energyhub_copy, emission_limit, _get_nearest_solution(solved_points, emission_limit))
+            _add_point(point, points, solved_points)
+        del energyhub_copy
+    elif dispatch_order:
+        solver_config = (m_config.solver.solver, m_config.solver.persistent)
+        with ProcessPoolExecutor(max_workers=nr_processes, initializer=_init_worker,
+                                 initargs=(energyhub_pickled, solver_config)) as executor:
+            running = {}
+            while dispatch_order or running:
+                while dispatch_order and len(running) < nr_processes:
+                    emission_limit = dispatch_order.pop(0)
+                    future = executor.submit(_solve_point_in_worker, emission_limit,
+                                             _get_nearest_solution(solved_points, emission_limit))
+                    running[future] = emission_limit
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    emission_limit = running.pop(future)
+                    try:
+                        point = future.result()
+                    except Exception as exception:
+                        # The worker process failed (e.g. it was terminated)
+                        print('Solving the point with emission limit ' + str(emission_limit) + ' failed: ' +
+                              str(exception))
+                        point = _get_failed_point(emission_limit, np.nan, 'error')
+                    _add_point(point, points, solved_points)
+
+    # Pareto front
+    points = sorted(points, key=lambda point: point['emission_limit'], reverse=True)
+    points = anchor_points[:1] + points + anchor_points[1:]
+    pareto_front = pd.DataFrame(columns=['Emission_Limit',
+                                         'Total_Cost',
+                                         'Net_Emissions',
+                                         'Positive_Emissions',
+                                         'Negative_Emissions',
+                                         'Solve_Time',
+                                         'Termination_Condition'
+                                         ])
+    for point in points:
+        if point['results'] is None:
+            pareto_front.loc[len(pareto_front.index)] = \
+                [point['emission_limit'], np.nan, np.nan, np.nan, np.nan, point['solve_time'], point['termination']]
+        else:
+            pareto_front.loc[len(pareto_front.index)] = \
+                [point['emission_limit'],
+                 point['results'].economics['Total_Cost'].iloc[0],
+                 point['results'].emissions['Net'].iloc[0],
+                 point['results'].emissions['Positive'].iloc[0],
+                 point['results'].emissions['Negative'].iloc[0],
+                 point['solve_time'],
+                 point['termination']]
+
+    nr_failed = sum(point['results'] is None for point in points)
+    if nr_failed:
+        print(str(nr_failed) + ' points of the pareto front could not be solved.')
+    print('Calculating Pareto Front completed in ' + str(time.time() - start_pareto) + ' s')
+    return pareto_front, [point['results'] for point in points]
+
+
+def _init_worker(energyhub_pickled, solver_config):
+    """
+    Loads the energyhub instance in a worker process
+
+    :param bytes energyhub_pickled: pickled energyhub instance
+    :param tuple solver_config: solver name and if a persistent solver is used
+    """
+    global _worker_energyhub
+    m_config.solver.solver, m_config.solver.persistent = solver_config
+    _worker_energyhub = pickle.loads(energyhub_pickled)
+
+
+def _solve_point_in_worker(emission_limit, var_values):
+    """
+    Minimizes cost for an emission limit with the energyhub instance of a worker process
+
+    :param float emission_limit: emission limit
+    :param var_values: values of all variables used as a warm start
+    :return: dict, see :func:`~_solve_point`
+    """
+    return _solve_point(_worker_energyhub, emission_limit, var_values)
+
+
+def _solve_point(energyhub, emission_limit, var_values):
+    """
+    Minimizes cost for an emission limit
+
+    :param EnergyHub energyhub: instance of the energyhub class, its model is changed
+    :param float emission_limit: emission limit
+    :param var_values: values of all variables used as a warm start
+    :return: dict with the emission limit, emissions, results, variable values, solve time and termination \
+    condition (emissions, results and variable values are None, if the point could not be solved)
+    """
+    start = time.time()
+    model = energyhub.model
+    solver_session = energyhub.solver_session
+    # The constraint is replaced (not a mutable parameter), as changes are then detected by all solver sessions
+    if model.find_component('const_pareto_emission_limit'):
+        if solver_session is not None:
+            solver_session.register_changes(model.const_pareto_emission_limit)
+        model.del_component(model.const_pareto_emission_limit)
+    model.const_pareto_emission_limit = Constraint(
+        expr=_get_emission_var(model, m_config.pareto.emissions) <= emission_limit)
+    if solver_session is not None:
+        solver_session.register_changes(model.const_pareto_emission_limit)
+    _set_var_values(model, var_values)
+    termination = _solve(energyhub, 'cost')
+    emissions = _get_emissions(model, m_config.pareto.emissions, termination)
+    if emissions is None:
+        print('Solving the point with emission limit ' + str(emission_limit) + ' failed (' + termination + ').')
+        return _get_failed_point(emission_limit, time.time() - start, termination)
+    return {'emission_limit': emission_limit,
+            'emissions': emissions,
+            'results': energyhub.write_results(),
+            'var_values': _get_var_values(model),
+            'solve_time': time.time() - start,
+            'termination': termination}
+
+
+def _solve(energyhub, objective):
+    """
+    Solves the model of an energyhub instance without raising an exception, if the solver fails
+
+    :param EnergyHub energyhub: instance of the energyhub class
+    :param str objective: objective passed to :func:`~src.energyhub.EnergyHub.solve_model`
+    :return: termination condition of the solver ('error', if the solver failed)
+    """
+    try:
+        energyhub.solve_model(objective)
+    except Exception as exception:
+        print('Solving for ' + objective + ' failed: ' + str(exception))
+        return 'error'
+    return str(energyhub.solution.solver.termination_condition)
+
+
+def _get_emissions(model, emissions, termination):
+    """
+    Returns the emissions of a solved model
+
+    :param model: pyomo model
+    :param str emissions: 'emissions_net' or 'emissions_pos'
+    :param str termination: termination condition of the solver
+    :return: emissions or None, if the model was not solved
+    """
+    if termination not in SOLVED_TERMINATION_CONDITIONS:
+        return None
+    return value(_get_emission_var(model, emissions), exception=False)
+
+
+def _get_failed_point(emission_limit, solve_time, termination):
+    """
+    Returns a point that could not be solved
+
+    :param float emission_limit: emission limit
+    :param float solve_time: solve time
+    :param str termination: termination condition of the solver
+    :return: dict, see :func:`~_solve_point`
+    """
+    return {'emission_limit': emission_limit,
+            'emissions': None,
+            'results': None,
+            'var_values': None,
+            'solve_time': solve_time,
+            'termination': termination}
+
+
+def _add_point(point, points, solved_points):
+    """
+    Adds a point to the points of the front and, if it was solved, its variable values to the solved points
+
+    :param dict point: point returned by :func:`~_solve_point`
+    :param list points: points of the front
+    :param dict solved_points: emissions of solved points as keys and variable values as values
+    """
+    var_values = point.pop('var_values')
+    if point['emissions'] is not None:
+        solved_points[point['emissions']] = var_values
+    points.append(point)
+
+
+def _get_emission_var(model, emissions):
+    """
+    Returns the emission variable constrained in the pareto front
+
+    :param model: pyomo model
+    :param str emissions: 'emissions_net' or 'emissions_pos'
+    :return: pyomo variable
+    """
+    if emissions == 'emissions_net':
+        return model.var_emissions_net
+    else:
+        return model.var_emissions_pos
+
+
+def _get_var_values(model):
+    """
+    Returns the values of all variables of a model (in the order of the model components)
+
+    :param model: pyomo model
+    :return: numpy array of variable values
+    """
+    return np.array([var.value for var in model.component_data_objects(Var, descend_into=True)], dtype=float)
+
+
+def _set_var_values(model, var_values):
+    """
+    Sets the values of all variables that are not fixed (e.g. as a warm start)
+
+    :param model: pyomo model
+    :param var_values: numpy array of variable values (in the order of the model components)
+    """
+    for var, var_value in zip(model.component_data_objects(Var, descend_into=True), var_values):
+        if not var.fixed and not np.isnan(var_value):
+            var.set_value(var_value, skip_validation=True)
+
+
+def _get_nearest_solution(solved_points, emission_limit):
+    """
+    Returns the variable values of the solved point closest to an emission limit
+
+    :param dict solved_points: emissions of solved points as keys and variable values as values
+    :param float emission_limit: emission limit
+    :return: numpy array of variable values
+    """
+    nearest = min(solved_points, key=lambda emissions: abs(emissions - emission_limit))
+    return solved_points[nearest]
@@ -0,0 +1,240 @@
+from pyomo.environ import *
+from pyomo.util.calc_var_value import calculate_variable_from_constraint
+import pandas as pd
+import src.config_model as m_config
+import src.data_management as dm
+import time
+
+
+def solve_rolling_horizon(energyhub, objective='cost', sizes=None):
+    """
+    Solves the operation of an energy system with fixed sizes in overlapping time windows (rolling horizon).
+
+    The time horizon is split into windows of ``m_config.rolling_horizon.horizon`` time steps. Each window is \
+    extended by ``m_config.rolling_horizon.lookahead`` time steps, which are optimized but not committed. For each \
+    window, a new model is constructed from the respective slice of the input data (see \
+    :func:`~src.data_management.data_handling.DataHandle.slice_timesteps`) and all technology and network sizes are \
+    fixed. The storage level at the end of the committed part of a window is passed on as the initial storage level \
+    of the next window (the first window couples the first and last time step as in the full model). Only the \
+    committed time steps are evaluated and the results of all windows are stitched into one ResultsHandle.
+
+    Sizes can be supplied as a ResultsHandle (e.g. from a design optimization with clustered data). Otherwise the \
+    sizes of the solved model of the energyhub instance are used.
+
+    :param EnergyHub energyhub: instance of the energyhub class, containing a DataHandle at full resolution
+    :param str objective: objective of each window, as in :func:`~src.energyhub.EnergyHub.solve_model`
+    :param ResultsHandle sizes: (optional) results containing the sizes of all technologies and networks
+    :return: instance of :class:`~src.data_management.result_handling.ResultsHandle`
+    """
+    data = energyhub.data
+    if isinstance(data, dm.ClusteredDataHandle):
+        raise Exception('A rolling horizon can only be used with data at full resolution.')
+    if sizes is None:
+        if energyhub.solution is None:
+            raise Exception('The sizes need to be supplied or the model needs to be solved before solving with a '
+                            'rolling horizon.')
+        sizes = energyhub.write_results()
+
+    horizon = m_config.rolling_horizon.horizon
+    lookahead = m_config.rolling_horizon.lookahead
+    nr_timesteps = len(data.topology['timesteps'])
+
+    print('Solving Model with Rolling Horizon...')
+    start_rolling_horizon = time.time()
+    windows = []
+    storage_levels = {}
+    for start in range(0, nr_timesteps, horizon):
+        end = min(start + horizon + lookahead, nr_timesteps)
+        nr_committed = min(horizon, nr_timesteps - start)
+        print('Solving time steps ' + str(start + 1) + ' to ' + str(end) + '...')
+
+        window = type(energyhub)(data.slice_timesteps(start, end))
+        window.construct_model()
+        window.construct_balances()
+        _fix_sizes(window.model, sizes)
+        _set_initial_storage_levels(window.model, storage_levels)
+        window.solve_model(objective)
+        storage_levels = _get_storage_levels(window.model, nr_committed)
+
+        # Evaluate committed time steps only
+        for t in window.model.set_t:
+            if t > nr_committed:
+                window.model.para_timestep_weight[t] = 0
+        _update_derived_variables(window.model)
+        windows.append((window.write_results(), nr_committed, _get_fixed_costs(window.model)))
+
+    print('Solving Model with Rolling Horizon completed in ' + str(time.time() - start_rolling_horizon) + ' s')
+    return _stitch_results(windows)
+
+
+def _fix_sizes(model, sizes):
+    """
+    Fixes the sizes of all technologies and networks
+
+    :param model: pyomo model of a window
+    :param ResultsHandle sizes: results containing the sizes
+    """
+    tec_sizes = sizes.technologies.set_index(['Node', 'Technology'])['Size']
+    for node in model.set_nodes:
+        b_node = model.node_blocks[node]
+        for tec in b_node.set_tecsAtNode:
+            if (node, tec) not in tec_sizes.index:
+                raise Exception('The size of technology ' + tec + ' at node ' + node + ' is not supplied.')
+            b_tec = b_node.tech_blocks_active[tec]
+            size = max(tec_sizes[node, tec], 0)
+            if b_tec.var_size.is_integer():
+                size = round(size)
+            b_tec.var_size.fix(size)
+
+    netw_sizes = sizes.networks.set_index(['Network', 'fromNode', 'toNode'])['Size']
+    for netw in model.set_networks:
+        b_netw = model.network_block[netw]
+        for arc in b_netw.set_arcs:
+            if (netw, arc[0], arc[1]) not in netw_sizes.index:
+                raise Exception('The size of network ' + netw + ' from ' + arc[0] + ' to ' + arc[1] +
+                                ' is not supplied.')
+            b_netw.arc_block[arc].var_size.fix(max(netw_sizes[netw, arc[0], arc[1]], 0))
+        # Sizes of both directions are fixed already
+        if b_netw.find_component('const_size_bidirectional'):
+            b_netw.const_size_bidirectional.deactivate()
+
+
+def _set_initial_storage_levels(model, storage_levels):
+    """
+    Replaces the coupling of the first and last storage level by the storage level passed from the previous window
+
+    :param model: pyomo model of a window
+    :param dict storage_levels: storage levels with (node, technology) as keys
+    """
+    for (node, tec), levels in storage_levels.items():
+        b_tec = model.node_blocks[node].tech_blocks_active[tec]
+        for car in levels:
+            b_tec.const_storage_level[1, car].deactivate()
+
+        def init_storage_level_initial(const, car):
+            return b_tec.var_storage_level[1, car] == \
+                levels[car] * (1 - b_tec.para_eta_lambda) - \
+                b_tec.para_ambient_loss_factor[1] * levels[car] + \
+                b_tec.para_eta_in * b_tec.var_input[1, car] - \
+                1 / b_tec.para_eta_out * b_tec.var_output[1, car]
+        b_tec.const_storage_level_initial = Constraint(list(levels.keys()), rule=init_storage_level_initial)
+
+
+def _get_storage_levels(model, t):
+    """
+    Returns the storage levels of all storage technologies at time step t
+
+    :param model: solved pyomo model of a window
+    :param int t: time step
+    :return: dict with (node, technology) as keys and dicts {carrier: storage level} as values
+    """
+    storage_levels = {}
+    for node in model.set_nodes:
+        b_node = model.node_blocks[node]
+        for tec in b_node.set_tecsAtNode:
+            b_tec = b_node.tech_blocks_active[tec]
+            if b_tec.find_component('var_storage_level'):
+                storage_levels[node, tec] = {car: max(b_tec.var_storage_level[t, car].value, 0)
+                                             for car in b_tec.set_input_carriers}
+    return storage_levels
+
+
+def _update_derived_variables(model):
+    """
+    Recalculates all costs and emissions summed over time from the constraints defining them (e.g. after changing \
+    the weights of time steps)
+
+    :param model: solved pyomo model of a window
+    """
+    for node in model.set_nodes:
+        b_node = model.node_blocks[node]
+        for tec in b_node.set_tecsAtNode:
+            b_tec = b_node.tech_blocks_active[tec]
+            calculate_variable_from_constraint(b_tec.var_tec_emissions_pos, b_tec.const_tec_emissions_pos)
+            calculate_variable_from_constraint(b_tec.var_tec_emissions_neg, b_tec.const_tec_emissions_neg)
+        calculate_variable_from_constraint(b_node.var_car_emissions_pos, b_node.const_car_emissions_pos)
+        calculate_variable_from_constraint(b_node.var_car_emissions_neg, b_node.const_car_emissions_neg)
+
+    for netw in model.set_networks:
+        b_netw = model.network_block[netw]
+        for arc in b_netw.set_arcs:
+            calculate_variable_from_constraint(b_netw.arc_block[arc].var_OPEX_variable,
+                                               b_netw.arc_block[arc].const_OPEX_variable)
+        calculate_variable_from_constraint(b_netw.var_OPEX_variable, b_netw.const_OPEX_var)
+        calculate_variable_from_constraint(b_netw.var_cost, b_netw.const_cost)
+        calculate_variable_from_constraint(b_netw.var_netw_emissions_pos, b_netw.const_netw_emissions)
+
+    calculate_variable_from_constraint(model.var_node_cost, model.const_node_cost)
+    calculate_variable_from_constraint(model.var_netw_cost, model.const_netw_cost)
+    calculate_variable_from_constraint(model.var_total_cost, model.const_cost)
+    calculate_variable_from_constraint(model.var_emissions_pos, model.const_emissions_pos)
+    calculate_variable_from_constraint(model.var_emissions_neg, model.const_emissions_neg)
+    calculate_variable_from_constraint(model.var_emissions_net, model.const_emissions_net)
+
+
+def _get_fixed_costs(model):
+    """
+    Returns the costs of a window that do not depend on the operation (CAPEX and fixed OPEX)
+
+    :param model: solved pyomo model of a window
+    :return: tuple of fixed technology costs and fixed network costs
+    """
+    tec_cost = sum(sum(value(model.node_blocks[node].tech_blocks_active[tec].var_CAPEX) +
+                       value(model.node_blocks[node].tech_blocks_active[tec].var_OPEX_fixed)
+                       for tec in model.node_blocks[node].set_tecsAtNode)
+                   for node in model.set_nodes)
+    netw_cost = sum(value(model.network_block[netw].var_CAPEX) + value(model.network_block[netw].var_OPEX_fixed)
+                    for netw in model.set_networks)
+    return tec_cost, netw_cost
+
+
+def _stitch_results(windows):
+    """
+    Stitches the results of all windows into one ResultsHandle
+
+    :param list windows: list of tuples (results, number of committed time steps, fixed costs) of each window
+    :return: instance of :class:`~src.data_management.result_handling.ResultsHandle`
+    """
+    results = dm.ResultsHandle()
+    first_results = windows[0][0]
+    nr_windows = len(windows)
+    tec_cost_fixed, netw_cost_fixed = windows[0][2]
+
+    # Economics and emissions (fixed costs are only accounted for once)
+    economics = sum(window_results.economics for window_results, nr_committed, fixed_costs in windows)
+    economics['Technology_Cost'] = economics['Technology_Cost'] - (nr_windows - 1) * tec_cost_fixed
+    economics['Network_Cost'] = economics['Network_Cost'] - (nr_windows - 1) * netw_cost_fixed
+    economics['Total_Cost'] = economics['Total_Cost'] - (nr_windows - 1) * (tec_cost_fixed + netw_cost_fixed)
+    results.economics = economics
+    results.emissions = sum(window_results.emissions for window_results, nr_committed, fixed_costs in windows)
+
+    # Sizes
+    results.technologies = first_results.technologies.copy()
+    results.technologies['OPEX_variable'] = sum(window_results.technologies['OPEX_variable']
+                                                for window_results, nr_committed, fixed_costs in windows)
+    results.networks = first_results.networks.copy()
+    for column in ['OPEX_variable', 'total_flow']:
+        results.networks[column] = sum(window_results.networks[column]
+                                       for window_results, nr_committed, fixed_costs in windows)
+
+    # Time series
+    for car in first_results.energybalance:
+        results.energybalance[car] = {}
+        for node_name in first_results.energybalance[car]:
+            results.energybalance[car][node_name] = pd.concat(
+                [window_results.energybalance[car][node_name].iloc[:nr_committed]
+                 for window_results, nr_committed, fixed_costs in windows], ignore_index=True)
+    for node_name in first_results.detailed_results.nodes:
+        results.detailed_results.nodes[node_name] = {}
+        for tec_name in first_results.detailed_results.nodes[node_name]:
+            results.detailed_results.nodes[node_name][tec_name] = pd.concat(
+                [window_results.detailed_results.nodes[node_name][tec_name].iloc[:nr_committed]
+                 for window_results, nr_committed, fixed_costs in windows], ignore_index=True)
+    for netw_name in first_results.detailed_results.networks:
+        results.detailed_results.networks[netw_name] = {}
+        for arc_name in first_results.detailed_results.networks[netw_name]:
+            results.detailed_results.networks[netw_name][arc_name] = pd.concat(
+                [window_results.detailed_results.networks[netw_name][arc_name].iloc[:nr_committed]
+                 for window_results, nr_committed, fixed_costs in windows], ignore_index=True)
+
+    return results
@@ -0,0 +1,193 @@
+from pyomo.environ import *
+from pyomo.common.collections import ComponentMap, ComponentSet
+
+# Persistent interfaces used for solvers given by their standard name
+PERSISTENT_SOLVERS = {'gurobi': 'gurobi_persistent',
+                      'cplex': 'cplex_persistent',
+                      'xpress': 'xpress_persistent',
+                      'highs': 'appsi_highs',
+                      'cbc': 'appsi_cbc',
+                      'ipopt': 'appsi_ipopt'}
+
+
+class SolverSession:
+    """
+    Solver instance that is kept in memory between solves of the same model.
+
+    Two kinds of persistent interfaces are supported:
+
+    - APPSI solvers (e.g. ``'appsi_highs'``, ``'appsi_gurobi'``) detect added, removed and modified components \
+      (including changed objectives and mutable parameters) themselves.
+    - Legacy persistent solvers (e.g. ``'gurobi_persistent'``) are updated by the session: before each solve, \
+      added and removed constraints and variables, variables with changed bounds or fixed values and a changed \
+      objective are pushed to the solver. Only components registered with :func:`~register_changes` since the last \
+      solve are compared with the solver. If no components are registered, all constraints and variables of the \
+      model are compared, which takes time proportional to the model size. Constraints that are modified in place \
+      and changed values of mutable parameters are not detected, delete and re-add the constraint or call \
+      :func:`~reset` after changing them.
+
+    Standard solver names are mapped to their persistent interface (see ``PERSISTENT_SOLVERS``). As the solver \
+    keeps its state, the basis (LP) and the previous solution (MIP start, if the solver is warm start capable) \
+    carry over to the next solve.
+    """
+    def __init__(self, solver_name):
+        """
+        Constructor
+
+        :param str solver_name: name of the solver as given to ``SolverFactory``
+        """
+        self.solver_name = solver_name
+        if solver_name in PERSISTENT_SOLVERS:
+            solver_name = PERSISTENT_SOLVERS[solver_name]
+        self.interface_name = solver_name
+        self.solver = SolverFactory(solver_name)
+        self.is_appsi = solver_name.startswith('appsi_')
+        self.model = None
+        self._constraints = ComponentSet()
+        self._variables = ComponentMap()
+        self._objective = None
+        self._changes = []
+
+    def register_changes(self, *components):
+        """
+        Registers components that were added, deleted or modified since the last solve, such that only these are \
+        compared with a legacy persistent solver at the next solve. Deleted components need to be registered with \
+        the component before deletion. Blocks are registered with all their constraints and variables.
+
+        :param components: constraints, variables or blocks (indexed or not), None is ignored
+        """
+        self._changes.extend(component for component in components if component is not None)
+
+    def solve(self, model, tee=True):
+        """
+        Solves the model, pushing all changes since the last solve to the solver
+
+        :param model: pyomo model
+        :param bool tee: print solver output
+        :return: solver results
+        """
+        if self.is_appsi:
+            self.model = model
+            self._changes = []
+            return self.solver.solve(model, tee=tee, warmstart=True)
+
+        if model is not self.model:
+            self._set_instance(model)
+        else:
+            self._update()
+        return self.solver.solve(tee=tee, warmstart=self.solver.warm_start_capable(), save_results=False)
+
+    def reset(self):
+        """
+        Discards the solver instance, i.e. the model is written to the solver from scratch at the next solve
+        """
+        self.solver = SolverFactory(self.interface_name)
+        self.model = None
+        self._constraints = ComponentSet()
+        self._variables = ComponentMap()
+        self._objective = None
+        self._changes = []
+
+    def _set_instance(self, model):
+        """
+        Writes the model to a legacy persistent solver
+
+        :param model: pyomo model
+        """
+        self.solver.set_instance(model)
+        self.model = model
+        self._constraints = ComponentSet(model.component_data_objects(Constraint, active=True, descend_into=True))
+        self._variables = ComponentMap((var, _var_state(var)) for var in
+                                       model.component_data_objects(Var, descend_into=True))
+        self._objective = _get_active_objective(model)
+        self._changes = []
+
+    def _update(self):
+        """
+        Pushes added, removed and modified constraints, variables and the objective to a legacy persistent solver
+        """
+        model = self.model
+        if self._changes:
+            # Only registered components are compared with the solver
+            constraints, variables = _get_component_data(self._changes)
+            removed_constraints = [con for con in constraints if con in self._constraints and
+                                   (not con.active or con.model() is not model)]
+            removed_variables = [var for var in variables if var in self._variables and var.model() is not model]
+            constraints = [con for con in constraints if con.active and con.model() is model]
+            variables = [var for var in variables if var.model() is model]
+        else:
+            constraints = ComponentSet(model.component_data_objects(Constraint, active=True, descend_into=True))
+            variables = ComponentSet(model.component_data_objects(Var, descend_into=True))
+            removed_constraints = [con for con in self._constraints if con not in constraints]
+            removed_variables = [var for var in self._variables if var not in variables]
+        self._changes = []
+
+        # Removed constraints, then removed variables (they need to be unreferenced)
+        for con in removed_constraints:
+            self.solver.remove_constraint(con)
+            self._constraints.remove(con)
+        for var in removed_variables:
+            self.solver.remove_var(var)
+            del self._variables[var]
+
+        # Added or modified variables, then added constraints
+        for var in variables:
+            if var not in self._variables:
+                self.solver.add_var(var)
+                self._variables[var] = _var_state(var)
+            elif self._variables[var] != _var_state(var):
+                self.solver.update_var(var)
+                self._variables[var] = _var_state(var)
+        for con in constraints:
+            if con not in self._constraints:
+                self.solver.add_constraint(con)
+                self._constraints.add(con)
+
+        objective = _get_active_objective(model)
+        if objective is not self._objective:
+            self.solver.set_objective(objective)
+            self._objective = objective
+
+
+def _var_state(var):
+    """
+    Returns the properties of a variable that need to be pushed to the solver when they change
+
+    :param var: pyomo variable
+    :return: tuple of fixed, fixed value, bounds and domain
+    """
+    return var.fixed, var.value if var.fixed else None, var.lb, var.ub, var.is_integer(), var.is_binary()
+
+
+def _get_component_data(components):
+    """
+    Returns the constraints and variables of registered components (without duplicates)
+
+    :param list components: constraints, variables or blocks
+    :return: component sets of constraints and variables
+    """
+    constraints = ComponentSet()
+    variables = ComponentSet()
+    for component in components:
+        component_data = component.values() if component.is_indexed() else [component]
+        if component.ctype is Constraint:
+            constraints.update(component_data)
+        elif component.ctype is Var:
+            variables.update(component_data)
+        elif component.ctype is Block:
+            for block in component_data:
+                constraints.update(block.component_data_objects(Constraint, descend_into=True))
+                variables.update(block.component_data_objects(Var, descend_into=True))
+    return constraints, variables
+
+
+def _get_active_objective(model):
+    """
+    Returns the active objective of a model
+
+    :param model: pyomo model
+    :return: objective or None
+    """
+    for objective in model.component_data_objects(Objective, active=True, descend_into=True):
+        return objective
+    return None
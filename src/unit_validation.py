@@ -0,0 +1,186 @@
+"""
+Offline validation of the units of the model.
+
+Models can be built without units (``m_config.construction.units = 0``), as units are not checked while solving. To
+keep the units consistent, a model with units is built for the first time steps of a DataHandle (saved with
+:func:`~src.data_management.data_handling.DataHandle.save`) and the units of all constraints are checked:
+
+    python -m src.unit_validation ./user_data/data_handle.p --timesteps 24
+
+Components are identified without their indices (e.g. ``node_blocks[*].const_import_emissions_pos``). Known
+inconsistencies are listed in ./data/unit_baseline.json with the unit signature of each component, i.e. the units of
+the terms of its expressions (e.g. ``MW, MW*t/MWh``). The validation fails for components that are not listed and for
+listed components with a different unit signature, i.e. new unit errors in listed components are found as well.
+After fixing the units of a component, remove it from the baseline. Signatures found in further topologies are added
+to the baseline with --update-baseline.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import pandas as pd
+from pyomo.environ import Constraint
+from pyomo.environ import units as u
+from pyomo.core.expr.numeric_expr import SumExpression
+from pyomo.core.expr.numvalue import is_constant
+from pyomo.util.check_units import identify_inconsistent_units
+import src.config_model as m_config
+import src.data_management as dm
+
+BASELINE_PATH = './data/unit_baseline.json'
+
+
+def get_component_name(component):
+    """
+    Returns the name of a component without indices, which identifies it for all nodes, networks and technologies
+
+    :param component: pyomo component
+    :return: name, e.g. ``node_blocks[*].tech_blocks_active[*].const_OPEX_variable``
+    """
+    return re.sub(r'\[[^\]]*\]', '[*]', component.name)
+
+
+def get_unit_signature(component_data):
+    """
+    Returns the units of the terms of the expression of a component. Terms that are inconsistent themselves are \
+    given by the units of their terms in brackets. Constant bounds of constraints are not included.
+
+    :param component_data: pyomo component data (e.g. a constraint)
+    :return: units of all terms, sorted and separated by comma, e.g. ``MW, MW*t/MWh``
+    """
+    if component_data.ctype is Constraint:
+        terms = list(component_data.body.args) if isinstance(component_data.body, SumExpression) \
+            else [component_data.body]
+        terms = terms + [bound for bound in [component_data.lower, component_data.upper]
+                         if bound is not None and not is_constant(bound)]
+    else:
+        terms = [component_data.expr]
+    return ', '.join(sorted(set(_get_term_units(term) for term in terms)))
+
+
+def _get_term_units(term):
+    """
+    Returns the units of a term of an expression (see :func:`~get_unit_signature`)
+
+    :param term: pyomo expression
+    :return: units as string
+    """
+    try:
+        return str(u.get_units(term))
+    except Exception:
+        units = sorted(set(_get_term_units(arg) for arg in term.args))
+        if len(units) == 1:
+            return units[0]
+        return '(' + ', '.join(units) + ')'
+
+
+def read_baseline(path=BASELINE_PATH):
+    """
+    Reads the known inconsistencies
+
+    :param str path: path of the baseline
+    :return: dict with component names (see :func:`~get_component_name`) as keys and lists of their unit \
+    signatures (see :func:`~get_unit_signature`) as values
+    """
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_baseline(inconsistent, path=BASELINE_PATH):
+    """
+    Adds all inconsistencies to the baseline (inconsistencies in the baseline are kept)
+
+    :param inconsistent: data frame returned by :func:`~validate_units`
+    :param str path: path of the baseline
+    """
+    baseline = read_baseline(path)
+    for component, signature in zip(inconsistent['component'], inconsistent['signature']):
+        baseline[component] = sorted(set(baseline.get(component, [])) | {signature})
+    with open(path, 'w') as file:
+        json.dump(dict(sorted(baseline.items())), file, indent=2)
+        file.write('\n')
+
+
+def validate_units(data, nr_timesteps=24, baseline_path=BASELINE_PATH):
+    """
+    Builds a model with units for the first time steps of the data and returns all components with inconsistent units
+
+    :param DataHandle data: DataHandle with technology and network data (clustered data is used with all time steps)
+    :param int nr_timesteps: number of time steps of the model
+    :param str baseline_path: path of the known inconsistencies (see :func:`~read_baseline`)
+    :return: data frame with the name, unit signature, type, number of inconsistent entries and an example of each \
+    component and unit signature with inconsistent units and if it is in the baseline (empty, if all units are \
+    consistent)
+    """
+    from src.energyhub import EnergyHub
+
+    if not isinstance(data, dm.ClusteredDataHandle):
+        data = data.slice_timesteps(0, min(nr_timesteps, len(data.topology['timesteps'])))
+
+    units = m_config.construction.units
+    m_config.construction.units = 1
+    try:
+        energyhub = EnergyHub(data)
+        energyhub.construct_model()
+        energyhub.construct_balances()
+    finally:
+        m_config.construction.units = units
+
+    # Pyomo logs each inconsistent expression as error
+    logger = logging.getLogger('pyomo.util.check_units')
+    level = logger.level
+    logger.setLevel(logging.CRITICAL)
+    try:
+        inconsistent_data = identify_inconsistent_units(energyhub.model)
+    finally:
+        logger.setLevel(level)
+
+    baseline = read_baseline(baseline_path)
+    inconsistent = {}
+    for component_data in inconsistent_data:
+        component = component_data.parent_component()
+        name = get_component_name(component)
+        signature = get_unit_signature(component_data)
+        if (name, signature) not in inconsistent:
+            expression = component_data.expr if hasattr(component_data, 'expr') else component_data
+            inconsistent[name, signature] = {'component': name,
+                                             'signature': signature,
+                                             'type': component.ctype.__name__,
+                                             'count': 0,
+                                             'example': str(expression),
+                                             'baseline': signature in baseline.get(name, [])}
+        inconsistent[name, signature]['count'] += 1
+    return pd.DataFrame(list(inconsistent.values()),
+                        columns=['component', 'signature', 'type', 'count', 'example', 'baseline'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds a model with units and checks the consistency of its units')
+    parser.add_argument('path', help='path of a DataHandle saved with DataHandle.save')
+    parser.add_argument('--timesteps', type=int, default=24, help='number of time steps of the model')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='path of the components with known inconsistencies')
+    parser.add_argument('--update-baseline', action='store_true', help='add all inconsistencies to the baseline')
+    parser.add_argument('--all', action='store_true', help='also print components in the baseline')
+    args = parser.parse_args()
+
+    inconsistent = validate_units(dm.load_data_handle(args.path), args.timesteps, args.baseline)
+    if args.update_baseline:
+        write_baseline(inconsistent, args.baseline)
+        print('Added ' + str(len(inconsistent)) + ' inconsistencies to ' + args.baseline + '.')
+        raise SystemExit(0)
+
+    new = inconsistent[~inconsistent['baseline'].astype(bool)]
+    print(str(len(inconsistent) - len(new)) + ' inconsistencies are in the baseline.')
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.max_colwidth', 60,
+                           'display.width', 250):
+        if args.all and not inconsistent.empty:
+            print(inconsistent)
+        if new.empty:
+            print('No further inconsistent units.')
+        else:
+            print('Inconsistent units:')
+            print(new)
+            raise SystemExit(1)
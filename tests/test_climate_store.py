@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import src.data_management as dm
+
+
+def get_climate_data(nr_timesteps, value):
+    """
+    Returns climate data with constant values
+
+    :param int nr_timesteps: number of time steps
+    :param float value: value of all variables
+    :return: dict of climate data
+    """
+    dataframe = pd.DataFrame({'ghi': np.full(nr_timesteps, value), 'temp_air': np.full(nr_timesteps, value)},
+                             index=pd.date_range('2001-01-01', freq='1h', periods=nr_timesteps))
+    return {'longitude': 5.0, 'latitude': 52.0, 'altitude': 10, 'dataframe': dataframe}
+
+
+def test_save_and_load(tmp_path):
+    dm.save_climate_data(get_climate_data(48, 1.0), str(tmp_path / 'store'))
+    climate_data = dm.load_climate_data(str(tmp_path / 'store'))
+    assert climate_data['dataframe'].shape == (48, 2)
+    assert climate_data['latitude'] == 52.0
+    assert dm.load_climate_data(str(tmp_path / 'store')) is climate_data
+
+
+def test_overwrite_loaded_store(tmp_path):
+    path = str(tmp_path / 'store')
+    dm.save_climate_data(get_climate_data(8760, 1.0), path)
+    loaded = dm.load_climate_data(path)
+
+    # Climate data loaded before keeps the previous (memory-mapped) files
+    dm.save_climate_data(get_climate_data(24, 2.0), path)
+    assert loaded['dataframe']['ghi'].sum() == 8760
+    assert sorted(file.name for file in (tmp_path / 'store').iterdir()) == ['ghi.npy', 'index.npy', 'meta.json',
+                                                                           'temp_air.npy']
+
+    reloaded = dm.load_climate_data(path)
+    assert reloaded is not loaded
+    assert reloaded['dataframe'].shape == (24, 2)
+    assert (reloaded['dataframe']['ghi'] == 2.0).all()
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+import src.config_model as m_config
+import src.data_management as dm
+
+YEAR = 2019
+LONS = [5.0, 5.25]
+LATS = [52.25, 52.0]
+
+
+@pytest.fixture(scope='module')
+def era5_endpoint(tmp_path_factory):
+    """
+    Writes monthly netCDF files of synthetic ERA5 data for a grid of 2 x 2 points
+    """
+    path = tmp_path_factory.mktemp('era5')
+    rng = np.random.default_rng(0)
+    for month in range(1, 13):
+        time_index = pd.date_range(str(YEAR) + '-' + format(month, '02d') + '-01',
+                                   periods=pd.Period(str(YEAR) + '-' + format(month, '02d')).days_in_month * 24,
+                                   freq='h')
+        shape = (len(time_index), len(LATS), len(LONS))
+        hour = time_index.hour.to_numpy()[:, None, None]
+        sun = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None) * np.ones(shape)
+        variables = {'ssrd': sun * 500 * 3600,
+                     'fdir': sun * 300 * 3600,
+                     't2m': 283 + rng.random(shape),
+                     'd2m': 280 + rng.random(shape),
+                     'u10': 3 + rng.random(shape),
+                     'v10': 4 * np.ones(shape),
+                     'u100': 6 + rng.random(shape),
+                     'v100': 8 * np.ones(shape)}
+        dataset = xr.Dataset({variable: (('time', 'latitude', 'longitude'), values.astype('float32'))
+                              for variable, values in variables.items()},
+                             coords={'time': time_index, 'latitude': LATS, 'longitude': LONS})
+        dataset.to_netcdf(path / ('era5_' + str(YEAR) + '_' + format(month, '02d') + '.nc'))
+    return path
+
+
+@pytest.fixture
+def climate_api(era5_endpoint, tmp_path, monkeypatch):
+    """
+    Configures the climate api with the synthetic ERA5 data and a cache in a temporary directory
+    """
+    monkeypatch.setattr(m_config.climate_api, 'era5_endpoint', str(era5_endpoint))
+    monkeypatch.setattr(m_config.climate_api, 'cache', 1)
+    monkeypatch.setattr(m_config.climate_api, 'cache_path', str(tmp_path / 'api_cache'))
+    monkeypatch.setattr(m_config.climate_api, 'offline', 0)
+    return m_config.climate_api
+
+
+def test_parse_era5(climate_api, era5_endpoint):
+    locations = {'a': (5.02, 52.01), 'b': (4.99, 51.98, 20), 'c': (5.24, 52.24)}
+    climate_data = dm.import_era5_climate_data_for_nodes(locations, YEAR)
+
+    # Nodes at the same grid point share one dataframe
+    assert climate_data['a']['dataframe'] is climate_data['b']['dataframe']
+    assert climate_data['b']['altitude'] == 20
+
+    dataframe = climate_data['c']['dataframe']
+    assert dataframe.shape == (8760, 7)
+    assert not dataframe.isna().any().any()
+    assert str(dataframe.index.tz) == 'Europe/Amsterdam'
+
+    # Wind speeds from u/v components, irradiances from J/m2 accumulated over one hour
+    with xr.open_dataset(era5_endpoint / ('era5_' + str(YEAR) + '_03.nc')) as dataset:
+        point = dataset.sel(longitude=5.25, latitude=52.25)
+        u10 = point['u10'].values
+        ssrd = point['ssrd'].values
+    march = dataframe.tz_convert('UTC')
+    march = march[march.index.month == 3]
+    assert np.allclose(march['ws10'], np.hypot(u10, 4), rtol=1e-6)
+    assert np.allclose(march['ghi'], ssrd / 3600, rtol=1e-5)
+    assert (dataframe['rh'] <= 100).all()
+    assert (dataframe['dhi'] >= 0).all()
+    assert 0 < climate_data['c']['wind_shear_exponent'] < 1
+
+
+def test_era5_cache(climate_api, monkeypatch):
+    climate_data = dm.import_era5_climate_data(5.02, 52.01, YEAR)
+
+    # Parsed grid points are read from the cache
+    monkeypatch.setattr(climate_api, 'offline', 1)
+    cached = dm.import_era5_climate_data(5.02, 52.01, YEAR)
+    assert np.array_equal(cached['dataframe'].to_numpy(), climate_data['dataframe'].to_numpy())
+    with pytest.raises(Exception, match='offline mode'):
+        dm.import_era5_climate_data(5.25, 52.0, YEAR)
+
+
+def test_era5_typical_year(climate_api):
+    with pytest.raises(Exception, match='single years'):
+        dm.import_era5_climate_data(5.02, 52.01, 'typical_year')
+
+
+def test_save_shared_climate_data(climate_api, tmp_path):
+    topology = {'timesteps': pd.date_range(str(YEAR) + '-01-01', freq='1h', periods=8760),
+                'timestep_length_h': 1,
+                'carriers': ['electricity'],
+                'nodes': ['a', 'b', 'c'],
+                'technologies': {'a': [], 'b': [], 'c': []},
+                'networks': {}}
+    locations = {'a': (5.02, 52.01), 'b': (4.99, 51.98), 'c': (5.24, 52.24)}
+    data = dm.DataHandle(topology)
+    data.read_climate_data_for_nodes(locations, 'ERA5', YEAR, save_path=str(tmp_path / 'climate'))
+
+    # The climate data of each cell is saved once, the nodes link to it
+    assert len(list((tmp_path / 'climate' / 'cells').iterdir())) == 2
+    loaded = dm.DataHandle(topology)
+    for nodename in locations:
+        loaded.read_climate_data_from_file(nodename, str(tmp_path / 'climate' / nodename))
+    assert loaded.node_data['a']['climate_data'] is loaded.node_data['b']['climate_data']
+    assert np.array_equal(loaded.node_data['c']['climate_data']['dataframe'].to_numpy(),
+                          data.node_data['c']['climate_data']['dataframe'].to_numpy())
+
+    with pytest.raises(Exception, match='not available'):
+        data.read_climate_data_for_nodes(locations, 'MERRA2', YEAR)
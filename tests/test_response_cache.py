@@ -0,0 +1,168 @@
+import http.server
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import src.config_model as m_config
+import src.data_management as dm
+
+
+def get_jrc_records(nr_timesteps=8760):
+    """
+    Returns hourly records as in responses of the JRC PVGIS api
+
+    :param int nr_timesteps: number of records
+    :return: list of records
+    """
+    return [{'G(h)': 100.0, 'Gb(n)': 50.0, 'Gd(h)': 50.0, 'T2m': 10.0, 'RH': 80.0, 'WS10m': 5.0}
+            for t in range(nr_timesteps)]
+
+
+@pytest.fixture
+def climate_api(tmp_path, monkeypatch):
+    """
+    Configures the climate api with a response cache in a temporary directory
+    """
+    monkeypatch.setattr(m_config.climate_api, 'cache', 1)
+    monkeypatch.setattr(m_config.climate_api, 'cache_path', str(tmp_path / 'api_cache'))
+    monkeypatch.setattr(m_config.climate_api, 'offline', 0)
+    monkeypatch.setattr(m_config.climate_api, 'retries', 2)
+    monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+    return m_config.climate_api
+
+
+def test_cache_hit_and_miss(tmp_path):
+    cache = dm.ResponseCache(str(tmp_path))
+    assert cache.load('a') is None
+    cache.save('a', {'value': 1})
+    assert cache.load('a') == {'value': 1}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_ttl(tmp_path):
+    cache = dm.ResponseCache(str(tmp_path), ttl=1)
+    cache.save('a', {'value': 1})
+    cache.save('b', {'value': 2})
+
+    # Age one response by two days
+    file = tmp_path / 'a.json'
+    cached = json.loads(file.read_text())
+    cached['time'] = cached['time'] - 2 * 24 * 3600
+    file.write_text(json.dumps(cached))
+
+    assert cache.load('a') is None
+    assert cache.load('b') == {'value': 2}
+
+
+def test_cache_lru_eviction(tmp_path):
+    response = {'values': list(range(200))}
+    entry_size = len(json.dumps({'time': time.time(), 'response': response}))
+    cache = dm.ResponseCache(str(tmp_path), max_size=2.5 * entry_size / 1e6)
+    cache.save('a', response)
+    cache.save('b', response)
+    os.utime(tmp_path / 'a.json', (1000, 1000))
+    os.utime(tmp_path / 'b.json', (2000, 2000))
+
+    # Loading a marks it as recently used, such that b is evicted
+    assert cache.load('a') == response
+    cache.save('c', response)
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'c.json']
+
+
+def test_cache_threaded_eviction(tmp_path):
+    response = {'values': list(range(200))}
+    entry_size = len(json.dumps({'time': time.time(), 'response': response}))
+    cache = dm.ResponseCache(str(tmp_path), max_size=2.5 * entry_size / 1e6)
+
+    # Threads saving to a full cache evict the same responses
+    def save_and_load(thread_nr):
+        for entry_nr in range(20):
+            key = str(thread_nr) + '_' + str(entry_nr)
+            cache.save(key, response)
+            cache.load(key)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for future in [executor.submit(save_and_load, thread_nr) for thread_nr in range(8)]:
+            future.result()
+    assert len(os.listdir(tmp_path)) <= 2
+
+
+def test_offline_mode(climate_api, monkeypatch):
+    parameters = {'lon': 5.16, 'lat': 52.0}
+    dm.get_response_cache().save('jrc_lon5.1600_lat52.0000_typical_year', {'outputs': 'cached'})
+    monkeypatch.setattr(climate_api, 'offline', 1)
+    assert dm.get_jrc_response(parameters) == {'outputs': 'cached'}
+    with pytest.raises(Exception, match='offline mode'):
+        dm.get_jrc_response({'lon': 5.2, 'lat': 52.0})
+
+
+def test_fixture_endpoint(climate_api, tmp_path, monkeypatch):
+    endpoint = tmp_path / 'jrc'
+    endpoint.mkdir()
+    (endpoint / 'jrc_lon5.1600_lat52.0000_typical_year.json').write_text(
+        json.dumps({'outputs': {'tmy_hourly': get_jrc_records()}}))
+    monkeypatch.setattr(climate_api, 'jrc_endpoint', str(endpoint))
+
+    climate_data = dm.import_jrc_climate_data(5.162, 52.001, 'typical_year', 10)
+    assert climate_data['dataframe'].shape == (8760, 6)
+    assert (climate_data['dataframe']['ghi'] == 100).all()
+
+    # The response is cached
+    monkeypatch.setattr(climate_api, 'offline', 1)
+    assert dm.import_jrc_climate_data(5.162, 52.001, 'typical_year', 10)['dataframe'].equals(
+        climate_data['dataframe'])
+
+
+class JRCHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Local JRC endpoint: returns 400 for latitudes above 60 (as PVGIS for locations at sea), fails once with 503 for \
+    longitudes above 10 and responds with records otherwise
+    """
+    requests = []
+
+    def do_GET(self):
+        query = dict(parameter.split('=') for parameter in self.path.split('?', 1)[1].split('&'))
+        JRCHandler.requests.append(query)
+        if float(query['lat']) > 60:
+            self.respond(400, {'message': 'Location over the sea', 'status': 400})
+        elif float(query['lon']) > 10 and len(JRCHandler.requests) == 1:
+            self.respond(503, {'message': 'Service unavailable'})
+        else:
+            self.respond(200, {'outputs': {'tmy_hourly': get_jrc_records(24)}})
+
+    def respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_endpoint(climate_api, monkeypatch):
+    """
+    Starts the local JRC endpoint
+    """
+    JRCHandler.requests = []
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), JRCHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(climate_api, 'jrc_endpoint', 'http://127.0.0.1:' + str(server.server_port) + '/api/tmy')
+    yield JRCHandler.requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_errors_are_not_retried(local_endpoint):
+    with pytest.raises(Exception, match='Location over the sea'):
+        dm.get_jrc_response({'lon': 5.0, 'lat': 70.0})
+    assert len(local_endpoint) == 1
+
+
+def test_server_errors_are_retried(local_endpoint):
+    data = dm.get_jrc_response({'lon': 12.0, 'lat': 50.0})
+    assert len(data['outputs']['tmy_hourly']) == 24
+    assert len(local_endpoint) == 2
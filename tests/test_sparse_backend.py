@@ -0,0 +1,75 @@
+import copy
+import os
+import pandas as pd
+import pytest
+import src.config_model as m_config
+import src.data_management as dm
+from benchmarks.synthetic_topology import create_synthetic_data
+from src.energyhub import EnergyHub
+from src.energyhub_sparse import EnergyHubSparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def data():
+    """
+    Synthetic topology of two nodes with RES, CONV2 and STOR technologies and a network for three days
+    """
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    fitting = (m_config.fitting.cache, m_config.fitting.resource_cache_path)
+    m_config.fitting.cache, m_config.fitting.resource_cache_path = 0, ''
+    try:
+        data = create_synthetic_data(nr_nodes=2, nr_carriers=3, nr_timesteps=72)
+        data.read_technology_data()
+        data.read_network_data()
+    finally:
+        m_config.fitting.cache, m_config.fitting.resource_cache_path = fitting
+        os.chdir(cwd)
+    return data
+
+
+@pytest.fixture(autouse=True)
+def solver(monkeypatch):
+    """
+    Solves with HiGHS without a persistent solver session
+    """
+    monkeypatch.setattr(m_config.solver, 'solver', 'appsi_highs')
+    monkeypatch.setattr(m_config.solver, 'persistent', 0)
+    monkeypatch.setattr(m_config.storage, 'inter_period_linking', 1)
+
+
+def solve(energyhub_class, data):
+    """
+    Constructs and solves a model with minimal cost
+
+    :param energyhub_class: EnergyHub or EnergyHubSparse
+    :param DataHandle data: data of the model (copied)
+    :return: ResultsHandle
+    """
+    energyhub = energyhub_class(copy.deepcopy(data))
+    energyhub.construct_model()
+    energyhub.construct_balances()
+    energyhub.solve_model()
+    return energyhub.write_results()
+
+
+def assert_equal_results(results, results_sparse):
+    """
+    Asserts equal economics and emissions of both backends
+    """
+    pd.testing.assert_frame_equal(results.economics.reset_index(drop=True),
+                                  results_sparse.economics.reset_index(drop=True), check_dtype=False, rtol=1e-5)
+    pd.testing.assert_frame_equal(results.emissions.reset_index(drop=True),
+                                  results_sparse.emissions.reset_index(drop=True), check_dtype=False, rtol=1e-5,
+                                  atol=1e-6)
+
+
+def test_full_resolution(data):
+    assert_equal_results(solve(EnergyHub, data), solve(EnergyHubSparse, data))
+
+
+def test_clustered_with_inter_period_linking(data):
+    clustered_data = dm.ClusteredDataHandle(data, nr_periods=2, period_length=24, method='kmedoids')
+    assert_equal_results(solve(EnergyHub, clustered_data), solve(EnergyHubSparse, clustered_data))